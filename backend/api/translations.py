@@ -2,15 +2,26 @@
 # ALL API ENDPOINTS FILE
 # ==============================================================================
 import uuid
+import json
+import asyncio
 import logging
 import os
+import shutil
 from pydantic import BaseModel
 from typing import List
-from fastapi import APIRouter, BackgroundTasks
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, BackgroundTasks, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.requests import ClientDisconnect
 
-from utils.zip_and_queue_handler import start_serial_processing, cleanup_zip_file
+from utils.zip_and_queue_handler import (
+    start_serial_processing, start_concurrent_processing, start_upload_processing, cleanup_zip_file
+)
+from utils.upload_spool import PdfUploadSpooler, UploadError, job_spool_dir
 from core import job_state as job_state
+from core import config
+from core import job_events
+from core.job_store import FINISHED_STATUSES
+from core.scheduler import get_scheduler, choose_lane, QueueFullError
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -25,20 +36,139 @@ class FilePathRequest(BaseModel):
 # ENDPOINT TO START THE TRANSLATION TASK FOR EACH PDF
 # ==============================================================================
 @router.post("/start-translation/")
-async def start_translation(background_tasks: BackgroundTasks, request: FilePathRequest):
+async def start_translation(request: FilePathRequest):
 
-    """Endpoint to start the translation job."""
+    """
+    Endpoint to start the translation job. The job is queued and started by
+    the scheduler; small jobs go to the quick lane ahead of large batches.
+    """
 
     logger.info('Translation API has been hit...')
 
+    scheduler = get_scheduler()
+    if not scheduler.has_room():
+        return JSONResponse(status_code=429, content={"status": "error", "error": "The job queue is full, try again later."})
+
+    lane = await asyncio.to_thread(choose_lane, request.paths)
+
     job_id = str(uuid.uuid4())
 
-    background_tasks.add_task(start_serial_processing, request.paths, job_id)
+    # Create the job before responding so the client can subscribe to it right away
+    job_state.create_job(job_id)
+    logger.info(f"Job {job_id}: Created.")
+
+    if config.PARALLEL_FILES > 1 and len(request.paths) > 1:
+        job_fn = start_concurrent_processing
+    else:
+        job_fn = start_serial_processing
+
+    try:
+        scheduler.submit(job_id, lane, job_fn, request.paths, job_id)
+    except QueueFullError as e:
+        job_state.update_job_status(job_id, "error", error=str(e))
+        return JSONResponse(status_code=429, content={"status": "error", "error": str(e)})
     
     return {"job_id": job_id}
 
 
 
+# ==============================================================================
+# ENDPOINT TO UPLOAD PDFS AND TRANSLATE THEM (CLIENTS ON OTHER MACHINES)
+# ==============================================================================
+@router.post("/upload-translation/")
+async def upload_translation(request: Request):
+
+    """
+    Endpoint to start a translation job from uploaded PDFs (multipart/form-data,
+    any number of file parts). The body is streamed to the job's spool folder
+    and hashed on the fly; each file starts processing as soon as its own upload
+    has finished, while the rest of the batch is still arriving.
+    The optional ?project= query parameter names the project the drawings
+    belong to, so revised drawings can reuse the translations of earlier
+    uploads of the same project.
+    """
+
+    logger.info('Upload translation API has been hit...')
+
+    scheduler = get_scheduler()
+    if not scheduler.has_room():
+        return JSONResponse(status_code=429, content={"status": "error", "error": "The job queue is full, try again later."})
+
+    job_id = str(uuid.uuid4())
+    upload_dir = job_spool_dir(job_id)
+    try:
+        spooler = PdfUploadSpooler(
+            request.headers.get("content-type"), upload_dir, config.UPLOAD_MAX_FILE_MB * 1024 * 1024
+        )
+    except UploadError as e:
+        return JSONResponse(status_code=400, content={"status": "error", "error": str(e)})
+
+    job_state.create_job(job_id)
+    job_state.set_job_upload_dir(job_id, upload_dir)
+    if request.query_params.get("project"):
+        job_state.set_job_project(job_id, request.query_params["project"])
+    logger.info(f"Job {job_id}: Created from an upload.")
+
+    # The page count is unknown until the files have arrived, so uploads use the batch lane
+    incoming = asyncio.Queue()
+    scheduler.submit(job_id, "batch", start_upload_processing, job_id, incoming, upload_dir)
+
+    try:
+        async for chunk in request.stream():
+            # Parsing writes to disk, so it runs off the event loop
+            for uploaded_file in await asyncio.to_thread(spooler.feed, chunk):
+                incoming.put_nowait(uploaded_file)
+        spooler.finish()
+    except (UploadError, ClientDisconnect) as e:
+        error = str(e) or "The client disconnected during the upload."
+        logger.warning(f"Job {job_id}: Upload failed. {error}")
+        await asyncio.to_thread(spooler.abort)
+        # Stop the files that already started (or drop the job if it is still queued), then fail it
+        if scheduler.cancel(job_id) == "cancelled":
+            await asyncio.to_thread(shutil.rmtree, upload_dir, True)
+        job_state.update_job_status(job_id, "error", error=error)
+        return JSONResponse(status_code=400, content={"job_id": job_id, "status": "error", "error": error})
+    finally:
+        incoming.put_nowait(None)
+
+    return {
+        "job_id": job_id,
+        "files": [
+            {"file": os.path.basename(path), "sha256": file_hash, "bytes": size}
+            for path, file_hash, size in spooler.files
+        ],
+    }
+
+
+
+# ==============================================================================
+# ENDPOINT TO CANCEL A QUEUED OR RUNNING JOB
+# ==============================================================================
+@router.post("/cancel-translation/{job_id}")
+async def cancel_translation(job_id: str):
+
+    """
+    Endpoint to cancel a job. A queued job is cancelled at once; a running job
+    stops at its next file, stage or page window and its partial zip is removed.
+    """
+
+    job = job_state.get_job(job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"status": "error", "error": "Job not found"})
+    if job["status"] in FINISHED_STATUSES:
+        return JSONResponse(status_code=409, content={"status": job["status"], "error": "Job has already finished"})
+
+    result = get_scheduler().cancel(job_id)
+    if result is None:
+        # Running under another worker process (shared job store): it sees the flag at its next check
+        job_state.request_cancel(job_id)
+        result = "cancelling"
+
+    logger.info(f"Job {job_id}: Cancel requested ({result}).")
+    return {"job_id": job_id, "status": result}
+
+
+
 # ==============================================================================
 # ENDPOINT TO GET THE STATUS OF CURRENT RUNNING JOB
 # ==============================================================================
@@ -51,9 +181,88 @@ async def get_job_status(job_id: str):
     if job is None:
         return JSONResponse(status_code=404, content={"status": "error", "error": "Job not found"})
     
-    logger.info(f"Job {job_id}: Status check requested. Current status: {job['status']}")
+    logger.debug(f"Job {job_id}: Status check requested. Current status: {job['status']}")
+
+    return _job_status_payload(job_id, job)
+
 
-    return {"job_id": job_id, "status": job["status"], "error": job.get("error")}
+def _job_status_payload(job_id: str, job: dict):
+    """The job fields returned to clients, shared by the polling and push endpoints."""
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "error": job.get("error"),
+        "stats": job.get("stats", {}),
+        "files": job.get("files"),
+        "progress": job.get("progress"),
+        "timings": job.get("timings", {}),
+        # Server process high-water mark when the job last reported, not a per-job figure
+        "process_peak_memory_bytes": job.get("process_peak_memory_bytes"),
+        "queue": job.get("queue"),
+        "revisions": job.get("revisions", []),
+        "cancel_requested": job.get("cancel_requested", False),
+    }
+
+
+
+# ==============================================================================
+# ENDPOINT TO STREAM JOB STATUS CHANGES (SERVER-SENT EVENTS)
+# ==============================================================================
+@router.get("/job-events/{job_id}")
+async def stream_job_events(job_id: str, request: Request):
+
+    """
+    Pushes the job status as a Server-Sent Event every time it changes
+    (stage transitions, per-file status, page/segment counters).
+    The stream ends after the job completes, fails or is cancelled.
+    """
+
+    if job_state.get_job(job_id) is None:
+        return JSONResponse(status_code=404, content={"status": "error", "error": "Job not found"})
+
+    logger.info(f"Job {job_id}: Event stream opened.")
+
+    async def event_stream():
+        queue = job_events.subscribe(job_id)
+        try:
+            last_payload = None
+            job = job_state.get_job(job_id)
+            while True:
+                if job is None:
+                    yield _sse({"job_id": job_id, "status": "error", "error": "Job not found"})
+                    break
+
+                payload = _job_status_payload(job_id, job)
+                if payload != last_payload:
+                    yield _sse(payload)
+                    last_payload = payload
+                if job["status"] in FINISHED_STATUSES:
+                    break
+
+                try:
+                    job = await asyncio.wait_for(queue.get(), timeout=config.JOB_EVENTS_REFRESH_SECONDS)
+                    # Only the newest snapshot matters
+                    while not queue.empty():
+                        job = queue.get_nowait()
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Re-read the store: picks up changes made by other worker processes
+                    job = job_state.get_job(job_id)
+                    yield ": keep-alive\n\n"
+        finally:
+            job_events.unsubscribe(job_id, queue)
+            logger.info(f"Job {job_id}: Event stream closed.")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sse(payload: dict):
+    return f"data: {json.dumps(payload)}\n\n"
 
 
 
@@ -88,3 +297,177 @@ async def download_result(job_id: str):
     except Exception as e:
         logger.error(f"Some error occured while downloading the zip file: {e}")
         return JSONResponse(status_code=404, content={"error": "Some error occured while downloading the zip file."})
+
+
+
+# ==============================================================================
+# ENDPOINT TO STREAM THE RESULT ZIP WHILE IT IS BUILT (WITH RANGE RESUME)
+# ==============================================================================
+@router.get("/download-stream/{job_id}")
+async def stream_download(job_id: str, request: Request):
+
+    """
+    Streams the job's result zip. Without a Range header, sending starts
+    right away with the files finished so far and follows the zip as later
+    files are added, ending once the job completes.
+
+    Range requests (bytes=N-, bytes=N-M or bytes=-N) resume a broken download.
+    On a finished zip they are answered as usual. While the job is still
+    running they return the committed bytes from N on, with the total
+    size given as '*'. Unlike /download/, the zip is kept until the job
+    expires so a download can be resumed.
+    """
+
+    job = job_state.get_job(job_id)
+    zip_info = (job or {}).get("zip")
+    if zip_info is None:
+        return JSONResponse(status_code=404, content={"error": "No result for this job (yet)."})
+
+    zip_path = zip_info["path"]
+    filename = os.path.basename(zip_path)
+    headers = {"Accept-Ranges": "bytes", "Content-Disposition": f'attachment; filename="{filename}"'}
+
+    byte_range = _parse_range(request.headers.get("range"))
+    if byte_range is None:
+        if zip_info["finished"]:
+            headers["Content-Length"] = str(zip_info["committed_bytes"])
+        logger.info(f"Job {job_id}: Streaming download started.")
+        return StreamingResponse(_follow_zip(job_id, request), media_type="application/zip", headers=headers)
+
+    start, end = byte_range
+    if start is not None and not zip_info["finished"]:
+        # Resuming past what is written so far: wait for the next file (or the end)
+        zip_info = await _wait_for_zip_bytes(job_id, start)
+        if zip_info is None:
+            return JSONResponse(status_code=404, content={"error": "The result of this job is no longer available."})
+
+    committed = zip_info["committed_bytes"]
+    total = str(committed) if zip_info["finished"] else "*"
+
+    if start is None:
+        # Suffix range (last N bytes) needs the final size
+        if not zip_info["finished"]:
+            return JSONResponse(status_code=416, content={"error": "Suffix ranges need a finished zip."},
+                                headers={"Content-Range": "bytes */*"})
+        start, end = max(0, committed - end), committed - 1
+
+    if start >= committed:
+        return JSONResponse(status_code=416, content={"error": "Requested range not satisfiable."},
+                            headers={"Content-Range": f"bytes */{total}"})
+
+    end = committed - 1 if end is None else min(end, committed - 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{total}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    logger.info(f"Job {job_id}: Range download requested ({headers['Content-Range']}).")
+    return StreamingResponse(
+        _iter_file_range(zip_path, start, end + 1), status_code=206, media_type="application/zip", headers=headers
+    )
+
+
+def _parse_range(range_header: str):
+    """
+    Parse a single 'bytes=' range into (start, end); end is None when open.
+    A suffix range 'bytes=-N' returns (None, N). Returns None when there is no
+    usable single range, in which case the whole file is sent.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            return (None, int(last)) if last else None
+        start = int(first)
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if end is not None and end < start:
+        return None
+    return start, end
+
+
+async def _follow_zip(job_id: str, request: Request):
+    """Yield the zip's committed bytes as they appear, until the zip is finished."""
+    queue = job_events.subscribe(job_id)
+    offset = 0
+    try:
+        job = job_state.get_job(job_id)
+        while True:
+            zip_info = (job or {}).get("zip")
+            if zip_info is None or (job["status"] in ("error", "cancelled") and not zip_info["finished"]):
+                # The job failed or was cancelled and its zip was discarded. The body
+                # simply ends short; clients detect that from the missing bytes
+                logger.warning(f"Job {job_id}: The result zip was discarded during the download, ending the stream.")
+                return
+
+            committed = zip_info["committed_bytes"]
+            if offset < committed:
+                async for chunk in _iter_file_range(zip_info["path"], offset, committed):
+                    yield chunk
+                offset = committed
+                job = job_state.get_job(job_id)
+                continue
+
+            if zip_info["finished"]:
+                break
+
+            job = await _next_job_snapshot(job_id, queue)
+            if job is _TIMED_OUT:
+                if await request.is_disconnected():
+                    break
+                job = job_state.get_job(job_id)
+    finally:
+        job_events.unsubscribe(job_id, queue)
+
+
+async def _wait_for_zip_bytes(job_id: str, offset: int):
+    """Wait until the zip has bytes past offset or is finished; returns its zip info (None if gone)."""
+    queue = job_events.subscribe(job_id)
+    try:
+        job = job_state.get_job(job_id)
+        while True:
+            zip_info = (job or {}).get("zip")
+            if zip_info is None or job["status"] in ("error", "cancelled"):
+                return None
+            if zip_info["finished"] or zip_info["committed_bytes"] > offset:
+                return zip_info
+            job = await _next_job_snapshot(job_id, queue)
+            if job is _TIMED_OUT:
+                # Re-read the store: picks up changes made by other worker processes
+                job = job_state.get_job(job_id)
+    finally:
+        job_events.unsubscribe(job_id, queue)
+
+
+_TIMED_OUT = object()
+
+
+async def _next_job_snapshot(job_id: str, queue: asyncio.Queue):
+    """Newest pushed snapshot of the job, or _TIMED_OUT after JOB_EVENTS_REFRESH_SECONDS."""
+    try:
+        job = await asyncio.wait_for(queue.get(), timeout=config.JOB_EVENTS_REFRESH_SECONDS)
+    except asyncio.TimeoutError:
+        return _TIMED_OUT
+    while not queue.empty():
+        job = queue.get_nowait()
+    return job
+
+
+async def _iter_file_range(path: str, start: int, stop: int):
+    """Read bytes [start, stop) of a file in DOWNLOAD_CHUNK_SIZE chunks off the event loop."""
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        offset = start
+        while offset < stop:
+            chunk = await asyncio.to_thread(_read_at, f, offset, min(config.DOWNLOAD_CHUNK_SIZE, stop - offset))
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+def _read_at(f, offset: int, size: int):
+    f.seek(offset)
+    return f.read(size)
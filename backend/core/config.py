@@ -0,0 +1,217 @@
+# ==============================================================================
+# BACKEND CONFIGURATION FILE
+# ==============================================================================
+import os
+
+APP_NAME = "Chinese-CAD-Translation"
+
+
+def _env_int(name: str, default: int) -> int:
+    """Read an integer setting from the environment, falling back to the default."""
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Read a true/false setting from the environment, falling back to the default."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Per-user folder for persistent data (same location run_app.py uses for the license)
+APP_DATA_DIR = os.getenv(
+    "APP_DATA_DIR",
+    os.path.join(os.environ.get("APPDATA", os.path.expanduser("~")), APP_NAME)
+)
+
+
+# ==============================================================================
+# TRANSLATION ENGINE SETTINGS
+# ==============================================================================
+
+# Maximum number of segments sent to the model in a single generate() call
+TRANSLATION_BATCH_SIZE = _env_int("TRANSLATION_BATCH_SIZE", 32)
+
+# Upper bound on (segments in batch x longest segment in tokens) for one batch.
+# Keeps the padded input tensor small when a few segments are very long.
+TRANSLATION_MAX_BATCH_TOKENS = _env_int("TRANSLATION_MAX_BATCH_TOKENS", 2048)
+
+# Maximum generated sequence length, same as the original per-word call
+TRANSLATION_MAX_LENGTH = _env_int("TRANSLATION_MAX_LENGTH", 512)
+
+# Inference backend: "torch" (fp32, original), "torch-int8" (dynamic int8
+# quantization), "onnx" (needs optimum[onnxruntime]) or "ctranslate2"
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch").strip().lower()
+
+# CPU threads used by the inference backend; 0 keeps the library default
+INFERENCE_THREADS = _env_int("INFERENCE_THREADS", 0)
+
+# Weight type for the CTranslate2 conversion ("int8", "int8_float32", "float32")
+CT2_QUANTIZATION = os.getenv("CT2_QUANTIZATION", "int8")
+
+# How long the inference worker waits for other jobs' segments before running
+# a round, so concurrent files share batches instead of taking turns
+INFERENCE_MAX_WAIT_MS = _env_int("INFERENCE_MAX_WAIT_MS", 20)
+
+# A round starts early once this many segments are queued
+INFERENCE_COALESCE_MAX_SEGMENTS = _env_int("INFERENCE_COALESCE_MAX_SEGMENTS", 512)
+
+
+# ==============================================================================
+# TRANSLATION MEMORY SETTINGS
+# ==============================================================================
+
+TRANSLATION_MEMORY_ENABLED = _env_bool("TRANSLATION_MEMORY_ENABLED", True)
+
+# Number of entries kept in the in-process LRU tier
+TRANSLATION_MEMORY_SIZE = _env_int("TRANSLATION_MEMORY_SIZE", 20000)
+
+# Number of entries kept in the on-disk SQLite tier before the oldest are evicted
+TRANSLATION_MEMORY_DISK_MAX_ENTRIES = _env_int("TRANSLATION_MEMORY_DISK_MAX_ENTRIES", 500000)
+
+TRANSLATION_MEMORY_PATH = os.getenv(
+    "TRANSLATION_MEMORY_PATH",
+    os.path.join(APP_DATA_DIR, "translation_memory.sqlite3")
+)
+
+
+# ==============================================================================
+# RESULT CACHE SETTINGS
+# ==============================================================================
+
+# Serve a resubmitted PDF (same content, model and settings) from the cache
+RESULT_CACHE_ENABLED = _env_bool("RESULT_CACHE_ENABLED", True)
+
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(APP_DATA_DIR, "result_cache"))
+
+# Total size of the cached PDFs; least recently used files are evicted beyond it
+RESULT_CACHE_MAX_MB = _env_int("RESULT_CACHE_MAX_MB", 1024)
+
+
+# ==============================================================================
+# INCREMENTAL RE-TRANSLATION SETTINGS
+# ==============================================================================
+
+# Reuse the previous revision's translations for segments that did not change.
+# Revisions are matched within one folder, or within the ?project= of uploads
+INCREMENTAL_RETRANSLATION = _env_bool("INCREMENTAL_RETRANSLATION", True)
+
+REVISION_MANIFEST_DIR = os.getenv("REVISION_MANIFEST_DIR", os.path.join(APP_DATA_DIR, "revision_manifests"))
+
+# Total size of the stored manifests; least recently used ones are evicted beyond it
+REVISION_MANIFEST_MAX_MB = _env_int("REVISION_MANIFEST_MAX_MB", 256)
+
+# Removed from the end of a file name (case-insensitive) to find earlier
+# revisions of the same drawing. Needs an explicit marker: "_RevB", "-rev.3",
+# " Revision 12", "_R2", "_v2". A bare letter ("PUMP-B") is not a revision,
+# since that usually names a different drawing; sites that do use it can
+# extend the pattern, e.g. with "|[_-][a-z]".
+REVISION_SUFFIX_PATTERN = os.getenv(
+    "REVISION_SUFFIX_PATTERN",
+    r"[\s_.-]+(?:rev(?:ision)?[\s_.-]*[a-z0-9]{1,3}|[rv]\d{1,3})$"
+)
+
+
+# ==============================================================================
+# EXTRACTION SETTINGS
+# ==============================================================================
+
+# Regions (pdfplumber coordinates) searched for table cells on every page.
+# Both tables currently share the same area; the duplicate is skipped at extraction time.
+TABLE_REGIONS = {
+    "bottom_right_table": (665, 665, 1180, 830),
+    "left_side_table": (665, 665, 1180, 830),
+}
+
+# How words are combined into translation segments: "word" (every word on its
+# own, original), "line" (words of one text line) or "block" (also wrapped lines)
+SEGMENT_GROUPING = os.getenv("SEGMENT_GROUPING", "block").strip().lower()
+
+
+# ==============================================================================
+# LEGEND SETTINGS
+# ==============================================================================
+
+# Legend page renderer: "fitz" (draws the table directly with PyMuPDF and
+# flows long legends into extra columns) or "reportlab" (original renderer)
+LEGEND_RENDERER = os.getenv("LEGEND_RENDERER", "fitz").strip().lower()
+
+
+# ==============================================================================
+# MULTI-PDF JOB SETTINGS
+# ==============================================================================
+
+# Number of PDFs of one job processed at the same time. 1 keeps the original
+# serial mode; higher values enable the concurrent mode.
+PARALLEL_FILES = _env_int("PARALLEL_FILES", 1)
+
+# Worker processes used for the extraction and rendering stages in concurrent mode
+PROCESS_POOL_WORKERS = _env_int("PROCESS_POOL_WORKERS", max(1, min(4, (os.cpu_count() or 2) - 1)))
+
+# Jobs processed at the same time; further jobs wait in the queue
+MAX_CONCURRENT_JOBS = _env_int("MAX_CONCURRENT_JOBS", 2)
+
+# Jobs allowed to wait in the queue; new jobs are rejected (HTTP 429) beyond it
+MAX_QUEUED_JOBS = _env_int("MAX_QUEUED_JOBS", 100)
+
+# Jobs with at most this many pages in total go to the "quick" lane, ahead of batches
+QUICK_JOB_MAX_PAGES = _env_int("QUICK_JOB_MAX_PAGES", 5)
+
+# Result zip compression: "stored" (original; translated PDFs are already
+# compressed, so this is the fastest) or "deflated" with ZIP_COMPRESSION_LEVEL (0-9)
+ZIP_COMPRESSION = os.getenv("ZIP_COMPRESSION", "stored").strip().lower()
+ZIP_COMPRESSION_LEVEL = _env_int("ZIP_COMPRESSION_LEVEL", 6)
+
+# Chunk size used when streaming the result zip to the client
+DOWNLOAD_CHUNK_SIZE = _env_int("DOWNLOAD_CHUNK_SIZE", 1024 * 1024)
+
+
+# ==============================================================================
+# UPLOAD SETTINGS
+# ==============================================================================
+
+# PDFs uploaded to /upload-translation/ are written here (one folder per job)
+# and removed once the job has finished
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(APP_DATA_DIR, "uploads"))
+
+# Largest single uploaded PDF accepted; 0 disables the limit
+UPLOAD_MAX_FILE_MB = _env_int("UPLOAD_MAX_FILE_MB", 512)
+
+
+# ==============================================================================
+# STREAMING (PAGE-BY-PAGE) SETTINGS
+# ==============================================================================
+
+# Documents with at least this many pages are extracted page by page and
+# rendered a window at a time instead of all at once. The output is the same
+# as in the normal mode. 0 disables the streaming mode.
+STREAMING_MIN_PAGES = _env_int("STREAMING_MIN_PAGES", 20)
+
+# Pages rendered and written together; bounds peak memory
+STREAMING_PAGE_WINDOW = _env_int("STREAMING_PAGE_WINDOW", 8)
+
+
+# ==============================================================================
+# JOB STORE SETTINGS
+# ==============================================================================
+
+# "memory" keeps jobs in the process (original behaviour); "sqlite" shares them
+# between worker processes and keeps them across restarts
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "memory").strip().lower()
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", os.path.join(APP_DATA_DIR, "jobs.sqlite3"))
+
+# Result zips are written here; at startup, zips of jobs the store no longer
+# knows are deleted
+RESULT_ZIP_DIR = os.getenv("RESULT_ZIP_DIR", os.path.join(APP_DATA_DIR, "result_zips"))
+
+# Finished jobs (and their result zips) are removed this long after they finish
+JOB_TTL_SECONDS = _env_int("JOB_TTL_SECONDS", 24 * 60 * 60)
+
+
+# Seconds between store re-reads / keep-alives on an idle job event stream
+JOB_EVENTS_REFRESH_SECONDS = _env_int("JOB_EVENTS_REFRESH_SECONDS", 5)
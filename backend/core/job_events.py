@@ -0,0 +1,54 @@
+# ==============================================================================
+# JOB EVENT BUS (PUSH NOTIFICATIONS FOR JOB STATUS CHANGES)
+# ==============================================================================
+# Job updates happen on worker threads; listeners (the SSE endpoint) live on
+# the asyncio event loop. publish() hands each new job snapshot to every
+# subscribed queue through loop.call_soon_threadsafe.
+import asyncio
+import threading
+from typing import Any, Dict, Set, Tuple
+
+# Snapshots buffered per listener; when full the oldest is dropped, since
+# every snapshot carries the complete job state anyway
+_QUEUE_SIZE = 100
+
+_subscribers: Dict[str, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+_lock = threading.Lock()
+
+
+def subscribe(job_id: str) -> asyncio.Queue:
+    """Register a listener for job_id. Must be called from the running event loop."""
+    queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+    with _lock:
+        _subscribers.setdefault(job_id, set()).add((asyncio.get_running_loop(), queue))
+    return queue
+
+
+def unsubscribe(job_id: str, queue: asyncio.Queue):
+    with _lock:
+        listeners = _subscribers.get(job_id)
+        if not listeners:
+            return
+        for entry in [entry for entry in listeners if entry[1] is queue]:
+            listeners.discard(entry)
+        if not listeners:
+            del _subscribers[job_id]
+
+
+def publish(job_id: str, job: Dict[str, Any]):
+    """Push a job snapshot to every listener of job_id. Safe to call from any thread."""
+    with _lock:
+        listeners = list(_subscribers.get(job_id, ()))
+
+    for loop, queue in listeners:
+        try:
+            loop.call_soon_threadsafe(_offer, queue, job)
+        except RuntimeError:
+            # The listener's loop has already been closed
+            unsubscribe(job_id, queue)
+
+
+def _offer(queue: asyncio.Queue, job: Dict[str, Any]):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(job)
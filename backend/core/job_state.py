@@ -1,24 +1,243 @@
 # ==============================================================================
 # JOB STATE MANAGEMENT FILE
 # ==============================================================================
-from typing import Dict, Any
+import os
+import shutil
+import logging
+from typing import Dict, Any, Iterable
 
-# This acts as our in-memory "database" to track job statuses
-jobs: Dict[str, Dict[str, Any]] = {}
+from core import config
+from core import job_events
+from core import metrics
+from core.job_store import create_job_store, FINISHED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# The configured backend (in-memory dict or SQLite) that tracks job statuses
+store = create_job_store(config.JOB_STORE_BACKEND, config.JOB_STORE_PATH)
+
+
+class JobCancelledError(Exception):
+    """Raised inside a job's work (between files, stages and page windows) once the job is cancelled."""
 
 def get_job(job_id: str):
-    return jobs.get(job_id)
+    return store.get(job_id)
+
+def _update(job_id: str, mutator):
+    """Apply an update through the store and push the new snapshot to listeners."""
+    job = store.update(job_id, mutator)
+    if job is not None:
+        job_events.publish(job_id, job)
+    return job
 
 def create_job(job_id: str):
-    jobs[job_id] = {"status": "starting", "result_path": None, "error": None}
+    evict_expired_jobs()
+    store.create(job_id, {"status": "starting", "result_path": None, "error": None, "stats": {}})
 
 def update_job_status(job_id: str, status: str, error: str = None):
-    if job_id in jobs:
-        jobs[job_id]["status"] = status
+    """Set the job's status; a finished job (complete, error, cancelled) keeps its final status."""
+    changed = []
+
+    def _mutate(job: Dict[str, Any]):
+        if job["status"] in FINISHED_STATUSES:
+            return
+        job["status"] = status
         if error:
-            jobs[job_id]["error"] = error
+            job["error"] = error
+        changed.append(True)
+    _update(job_id, _mutate)
+    if changed and status == "error":
+        metrics.inc("cad_jobs_finished_total", status="error")
+
+def transition_job_status(job_id: str, from_statuses: Iterable[str], to_status: str) -> bool:
+    """Atomically change the status only if the job is still in one of from_statuses."""
+    moved = store.transition(job_id, tuple(from_statuses), to_status)
+    if moved:
+        job_events.publish(job_id, store.get(job_id))
+    return moved
+
+def update_job_queue(job_id: str, position: int = None, lane: str = None, queued_jobs: int = None):
+    """Record the job's place in the scheduler queue; position None means it has left the queue."""
+    def _mutate(job: Dict[str, Any]):
+        job["queue"] = {"position": position, "lane": lane, "queued_jobs": queued_jobs} if position else None
+    _update(job_id, _mutate)
+
+def request_cancel(job_id: str):
+    """Ask a running job to stop at its next cancellation check."""
+    def _mutate(job: Dict[str, Any]):
+        if job["status"] not in FINISHED_STATUSES:
+            job["cancel_requested"] = True
+    _update(job_id, _mutate)
+
+def is_cancel_requested(job_id: str) -> bool:
+    job = store.get(job_id)
+    return job is not None and bool(job.get("cancel_requested"))
+
+def raise_if_cancelled(job_id: str):
+    """Cancellation check called by the pipeline between files, stages and page windows."""
+    if is_cancel_requested(job_id):
+        raise JobCancelledError(f"Job {job_id} was cancelled.")
+
+def mark_job_cancelled(job_id: str):
+    cancelled = []
+
+    def _mutate(job: Dict[str, Any]):
+        if job["status"] not in FINISHED_STATUSES:
+            job["status"] = "cancelled"
+            job["queue"] = None
+            cancelled.append(True)
+    _update(job_id, _mutate)
+    if cancelled:
+        metrics.inc("cad_jobs_finished_total", status="cancelled")
+
+def update_job_stats(job_id: str, stats: Dict[str, int]):
+    """Add per-file counters (e.g. dedup_saved_calls) to the job's running totals."""
+    def _mutate(job: Dict[str, Any]):
+        job_stats = job.setdefault("stats", {})
+        for key, value in stats.items():
+            job_stats[key] = job_stats.get(key, 0) + value
+    _update(job_id, _mutate)
+
+def update_job_timings(job_id: str, timings: Dict[str, float]):
+    """
+    Add per-stage durations (seconds) to the job's timing breakdown and record
+    the process memory high-water mark reached so far. That peak is for the
+    whole server process since it started (ru_maxrss / peak working set), so
+    it may come from an earlier or concurrent job, not from this one.
+    """
+    peak_memory = metrics.peak_memory_bytes()
+
+    def _mutate(job: Dict[str, Any]):
+        job_timings = job.setdefault("timings", {})
+        for stage, seconds in timings.items():
+            job_timings[stage] = round(job_timings.get(stage, 0.0) + seconds, 4)
+        if peak_memory is not None:
+            job["process_peak_memory_bytes"] = max(job.get("process_peak_memory_bytes") or 0, peak_memory)
+    _update(job_id, _mutate)
+
+def update_job_zip(job_id: str, zip_path: str, committed_bytes: int, entries: int, finished: bool):
+    """
+    Record how far the job's result zip has been written. Bytes before
+    committed_bytes are final and may already be streamed to the client.
+    """
+    def _mutate(job: Dict[str, Any]):
+        job["zip"] = {"path": zip_path, "committed_bytes": committed_bytes, "entries": entries, "finished": finished}
+    _update(job_id, _mutate)
+
+def clear_job_zip(job_id: str):
+    def _mutate(job: Dict[str, Any]):
+        job.pop("zip", None)
+    _update(job_id, _mutate)
+
+def init_file_progress(job_id: str, file_paths):
+    """Create one independent progress entry per input file of the job."""
+    def _mutate(job: Dict[str, Any]):
+        job["files"] = [
+            {"file": os.path.basename(path), "status": "queued", "error": None}
+            for path in file_paths
+        ]
+    _update(job_id, _mutate)
+
+def add_file_progress(job_id: str, file_path: str) -> int:
+    """Append a progress entry for a file that arrived after the job started; returns its index."""
+    index = []
+
+    def _mutate(job: Dict[str, Any]):
+        files = job.setdefault("files", [])
+        files.append({"file": os.path.basename(file_path), "status": "queued", "error": None})
+        index.append(len(files) - 1)
+    _update(job_id, _mutate)
+    return index[0] if index else 0
+
+def add_revision_diff(job_id: str, diff: Dict[str, Any]):
+    """Record how a file differs from the previous revision of its drawing (segments unchanged/changed/added/removed)."""
+    def _mutate(job: Dict[str, Any]):
+        job.setdefault("revisions", []).append(diff)
+    _update(job_id, _mutate)
+
+def set_job_upload_dir(job_id: str, upload_dir: str):
+    """Remember the job's upload spool folder, so eviction can remove whatever was left in it."""
+    def _mutate(job: Dict[str, Any]):
+        job["upload_dir"] = upload_dir
+    _update(job_id, _mutate)
+
+def set_job_project(job_id: str, project: str):
+    """Name the project the job's drawings belong to, for the revision manifests."""
+    def _mutate(job: Dict[str, Any]):
+        job["project"] = project
+    _update(job_id, _mutate)
+
+def update_file_status(job_id: str, file_index: int, status: str, error: str = None):
+    def _mutate(job: Dict[str, Any]):
+        if "files" in job:
+            file_entry = job["files"][file_index]
+            file_entry["status"] = status
+            if error:
+                file_entry["error"] = error
+    _update(job_id, _mutate)
+
+def update_job_progress(job_id: str, **counters: int):
+    """
+    Merge progress counters into the job, e.g. pages_done/pages_total from the
+    streaming pipeline or segments_done/segments_total from the translator.
+    """
+    def _mutate(job: Dict[str, Any]):
+        job.setdefault("progress", {}).update(counters)
+    _update(job_id, _mutate)
 
 def set_job_result(job_id: str, result_path: str):
-    if job_id in jobs:
-        jobs[job_id]["status"] = "complete"
-        jobs[job_id]["result_path"] = result_path
\ No newline at end of file
+    completed = []
+
+    def _mutate(job: Dict[str, Any]):
+        if job["status"] not in FINISHED_STATUSES:
+            job["status"] = "complete"
+            job["result_path"] = result_path
+            completed.append(True)
+    _update(job_id, _mutate)
+    if completed:
+        metrics.inc("cad_jobs_finished_total", status="complete")
+
+def evict_expired_jobs():
+    """Drop jobs past their TTL and delete any result zip or uploaded files they left behind."""
+    try:
+        expired = store.evict_expired(config.JOB_TTL_SECONDS)
+    except Exception:
+        logger.warning("Failed to evict expired jobs.", exc_info=True)
+        return
+
+    for job in expired:
+        # The zip may be left unfinished (and without a result_path) by a crash
+        for result_path in {job.get("result_path"), (job.get("zip") or {}).get("path")}:
+            if result_path and os.path.exists(result_path):
+                try:
+                    os.remove(result_path)
+                except OSError:
+                    logger.warning(f"Could not remove expired result file {result_path}")
+        if job.get("upload_dir"):
+            shutil.rmtree(job["upload_dir"], ignore_errors=True)
+
+    if expired:
+        logger.info(f"Evicted {len(expired)} expired job(s).")
+
+
+def sweep_orphaned_result_zips():
+    """
+    Delete result zips whose job the store no longer knows, e.g. every zip
+    after a restart with the in-memory store. Called once at startup.
+    """
+    if not os.path.isdir(config.RESULT_ZIP_DIR):
+        return
+
+    removed = 0
+    for name in os.listdir(config.RESULT_ZIP_DIR):
+        job_id, ext = os.path.splitext(name)
+        if ext != ".zip" or store.get(job_id) is not None:
+            continue
+        try:
+            os.remove(os.path.join(config.RESULT_ZIP_DIR, name))
+            removed += 1
+        except OSError:
+            logger.warning(f"Could not remove orphaned result zip {name}")
+
+    if removed:
+        logger.info(f"Removed {removed} orphaned result zip(s).")
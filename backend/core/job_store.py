@@ -0,0 +1,225 @@
+# ==============================================================================
+# JOB STORE BACKENDS (IN-MEMORY + SQLITE)
+# ==============================================================================
+import os
+import json
+import time
+import copy
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which a job no longer changes and may be evicted once its TTL has passed
+FINISHED_STATUSES = ("complete", "error", "cancelled")
+
+JobRecord = Dict[str, Any]
+
+
+class JobStore(ABC):
+    """
+    Interface every job store backend implements.
+    Records are plain dicts; callers always get a copy, never the stored object.
+    """
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        ...
+
+    @abstractmethod
+    def create(self, job_id: str, record: JobRecord) -> None:
+        ...
+
+    @abstractmethod
+    def update(self, job_id: str, mutator: Callable[[JobRecord], None]) -> Optional[JobRecord]:
+        """Atomically apply mutator to the stored record. Returns the new record, or None if missing."""
+
+    def transition(self, job_id: str, from_statuses: Iterable[str], to_status: str) -> bool:
+        """Atomically move a job to to_status only if it is currently in one of from_statuses."""
+        moved = []
+
+        def _mutate(record):
+            if record["status"] in from_statuses:
+                record["status"] = to_status
+                moved.append(True)
+
+        self.update(job_id, _mutate)
+        return bool(moved)
+
+    @abstractmethod
+    def evict_expired(self, ttl_seconds: float) -> List[JobRecord]:
+        """
+        Remove finished jobs older than ttl_seconds, and unfinished jobs that
+        have not been touched for that long (left over from a crash/restart).
+        Returns the removed records so the caller can clean up their files.
+        """
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @staticmethod
+    def _stamp(record: JobRecord) -> None:
+        now = time.time()
+        record["updated_at"] = now
+        if record.get("status") in FINISHED_STATUSES:
+            if not record.get("finished_at"):
+                record["finished_at"] = now
+        else:
+            record["finished_at"] = None
+
+
+# ==============================================================================
+# IN-MEMORY BACKEND
+# ==============================================================================
+class InMemoryJobStore(JobStore):
+    """Process-local store, the original behaviour. Lost on restart."""
+
+    def __init__(self):
+        self._jobs: Dict[str, JobRecord] = {}
+        self._lock = threading.RLock()
+
+    def get(self, job_id):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            return copy.deepcopy(record) if record is not None else None
+
+    def create(self, job_id, record):
+        record = copy.deepcopy(record)
+        record.setdefault("created_at", time.time())
+        self._stamp(record)
+        with self._lock:
+            self._jobs[job_id] = record
+
+    def update(self, job_id, mutator):
+        with self._lock:
+            record = self._jobs.get(job_id)
+            if record is None:
+                return None
+            mutator(record)
+            self._stamp(record)
+            return copy.deepcopy(record)
+
+    def evict_expired(self, ttl_seconds):
+        cutoff = time.time() - ttl_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, record in self._jobs.items()
+                if (record.get("finished_at") or record["updated_at"]) < cutoff
+            ]
+            return [self._jobs.pop(job_id) for job_id in expired]
+
+    def count(self):
+        with self._lock:
+            return len(self._jobs)
+
+
+# ==============================================================================
+# SQLITE (WAL) BACKEND
+# ==============================================================================
+class SQLiteJobStore(JobStore):
+    """
+    Store shared by every worker process on the machine and kept across restarts.
+    The record is kept as JSON; status and timestamps are real columns so
+    lookups and eviction use indexes even with many historical jobs.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        conn = self._conn()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                   job_id TEXT PRIMARY KEY,
+                   status TEXT NOT NULL,
+                   data TEXT NOT NULL,
+                   created_at REAL NOT NULL,
+                   updated_at REAL NOT NULL,
+                   finished_at REAL
+               )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs(finished_at)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated_at ON jobs(updated_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; autocommit mode with explicit transactions."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def create(self, job_id, record):
+        record = copy.deepcopy(record)
+        record.setdefault("created_at", time.time())
+        self._stamp(record)
+        self._conn().execute(
+            "INSERT OR REPLACE INTO jobs (job_id, status, data, created_at, updated_at, finished_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, record["status"], json.dumps(record), record["created_at"], record["updated_at"], record["finished_at"])
+        )
+
+    def update(self, job_id, mutator):
+        conn = self._conn()
+        # BEGIN IMMEDIATE takes the write lock up front, so the read-modify-write
+        # cannot interleave with another thread or worker process
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            record = json.loads(row[0])
+            mutator(record)
+            self._stamp(record)
+            conn.execute(
+                "UPDATE jobs SET status = ?, data = ?, updated_at = ?, finished_at = ? WHERE job_id = ?",
+                (record["status"], json.dumps(record), record["updated_at"], record["finished_at"], job_id)
+            )
+            conn.execute("COMMIT")
+            return record
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def evict_expired(self, ttl_seconds):
+        cutoff = time.time() - ttl_seconds
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                """SELECT job_id, data FROM jobs
+                   WHERE finished_at < ?
+                      OR (finished_at IS NULL AND updated_at < ?)""",
+                (cutoff, cutoff)
+            ).fetchall()
+            conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id, _ in rows])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [json.loads(data) for _, data in rows]
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+
+def create_job_store(backend: str, db_path: str = None) -> JobStore:
+    """Build the configured job store backend ('memory' or 'sqlite')."""
+    if backend == "sqlite":
+        logger.info(f"Using SQLite job store at {db_path}")
+        return SQLiteJobStore(db_path)
+    if backend != "memory":
+        logger.warning(f"Unknown job store backend '{backend}', using the in-memory store.")
+    return InMemoryJobStore()
@@ -0,0 +1,218 @@
+# ==============================================================================
+# METRICS (STAGE TIMERS, COUNTERS, HISTOGRAMS, PROMETHEUS EXPOSITION)
+# ==============================================================================
+# A small process-wide registry. The pipeline records stage durations,
+# segment/cache counters, batch sizes and model throughput here; /metrics
+# renders it in the Prometheus text format. Stage timers can also add their
+# durations to a per-job `timings` dict, which ends up in the job status.
+# Stages that run in the process pool are timed by the parent as a whole,
+# since worker processes keep their own (unexported) registry.
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+# Upper bounds (le) of the histogram buckets, per metric family
+_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+_BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+_HELP = {
+    "cad_stage_duration_seconds": ("histogram", "Time spent in each pipeline stage."),
+    "cad_translation_batch_size": ("histogram", "Segments per model generate() call."),
+    "cad_segments_total": ("counter", "Chinese segments handled, by kind."),
+    "cad_translation_memory_lookups_total": ("counter", "Unique segments looked up in the translation memory."),
+    "cad_translation_memory_hits_total": ("counter", "Translation memory lookups answered from the cache."),
+    "cad_translation_memory_hit_ratio": ("gauge", "Share of translation memory lookups that were hits."),
+    "cad_model_input_tokens_total": ("counter", "Source tokens sent to the model."),
+    "cad_model_seconds_total": ("counter", "Time spent inside model generate() calls."),
+    "cad_model_tokens_per_second": ("gauge", "Source tokens per second of the most recent model batch."),
+    "cad_result_cache_lookups_total": ("counter", "Input PDFs looked up in the result cache."),
+    "cad_result_cache_hits_total": ("counter", "Input PDFs served from the result cache."),
+    "cad_words_extracted_total": ("counter", "Vector words extracted from PDF pages."),
+    "cad_segments_reused_total": ("counter", "Segments of a revised drawing that kept the previous revision's translation."),
+    "cad_words_merged_total": ("counter", "Words and lines merged into a neighbouring segment by grouping."),
+    "cad_table_cells_extracted_total": ("counter", "Table cells extracted from the table regions."),
+    "cad_pages_skipped_total": ("counter", "Pages without Chinese text, skipped by extraction and translation."),
+    "cad_pages_rendered_total": ("counter", "Translated pages rendered."),
+    "cad_pages_copied_total": ("counter", "Pages without translations copied to the output unchanged."),
+    "cad_abbreviations_total": ("counter", "Translations shown as a legend abbreviation."),
+    "cad_jobs_finished_total": ("counter", "Jobs finished, by final status."),
+    "cad_peak_memory_bytes": ("gauge", "Peak resident memory of the server process."),
+    "cad_model_ready": ("gauge", "1 once the translation model has loaded."),
+    "cad_jobs_tracked": ("gauge", "Jobs currently held in the job store."),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, LabelKey], float] = {}
+_gauges: Dict[Tuple[str, LabelKey], float] = {}
+_histograms: Dict[Tuple[str, LabelKey], "_Histogram"] = {}
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+def _key(name, labels) -> Tuple[str, LabelKey]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    """Add value to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels):
+    with _lock:
+        _gauges[_key(name, labels)] = value
+
+
+def observe(name: str, value: float, **labels):
+    """Record one value in a histogram."""
+    buckets = _BATCH_SIZE_BUCKETS if name == "cad_translation_batch_size" else _DURATION_BUCKETS
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram(buckets)
+        histogram.observe(value)
+
+
+@contextmanager
+def stage_timer(stage: str, timings: Optional[Dict[str, float]] = None):
+    """
+    Time a pipeline stage. The duration goes to the stage histogram and, if a
+    timings dict is given, is added to timings[stage] (seconds).
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("cad_stage_duration_seconds", elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def record_model_batch(segments: int, tokens: int, seconds: float):
+    """Record one generate() call: batch size, source tokens and throughput."""
+    observe("cad_translation_batch_size", segments)
+    inc("cad_model_input_tokens_total", tokens)
+    inc("cad_model_seconds_total", seconds)
+    if seconds > 0:
+        set_gauge("cad_model_tokens_per_second", tokens / seconds)
+
+
+def peak_memory_bytes() -> Optional[int]:
+    """High-water mark of this process's resident memory, or None if unavailable."""
+    try:
+        if sys.platform == "win32":
+            return _windows_peak_working_set()
+
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return None
+
+
+def _windows_peak_working_set():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+# ==============================================================================
+# PROMETHEUS TEXT FORMAT
+# ==============================================================================
+def render_prometheus() -> str:
+    """Render every metric in the Prometheus text exposition format (0.0.4)."""
+    _refresh_derived_gauges()
+
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        histograms = {key: (h.buckets, list(h.counts), h.sum, h.count) for key, h in _histograms.items()}
+
+    families: Dict[str, list] = {}
+    for (name, labels), value in counters.items():
+        families.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    for (name, labels), value in gauges.items():
+        families.setdefault(name, []).append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    for (name, labels), (buckets, counts, total, count) in histograms.items():
+        lines = families.setdefault(name, [])
+        for bound, bucket_count in zip(buckets, counts):
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {bucket_count}")
+        lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+    output = []
+    for name in sorted(families):
+        kind, help_text = _HELP.get(name, ("untyped", name))
+        output.append(f"# HELP {name} {help_text}")
+        output.append(f"# TYPE {name} {kind}")
+        output.extend(families[name])
+    return "\n".join(output) + "\n"
+
+
+def _refresh_derived_gauges():
+    peak = peak_memory_bytes()
+    if peak is not None:
+        set_gauge("cad_peak_memory_bytes", peak)
+
+    with _lock:
+        lookups = _counters.get(("cad_translation_memory_lookups_total", ()), 0)
+        hits = _counters.get(("cad_translation_memory_hits_total", ()), 0)
+    if lookups:
+        set_gauge("cad_translation_memory_hit_ratio", hits / lookups)
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for k, v in labels:
+        v = v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{k}="{v}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
@@ -0,0 +1,137 @@
+# ==============================================================================
+# JOB SCHEDULER (BOUNDED PRIORITY QUEUE + CONCURRENCY LIMIT + CANCELLATION)
+# ==============================================================================
+# Jobs are queued instead of all starting at once. At most MAX_CONCURRENT_JOBS
+# run at a time; the rest wait in a bounded queue ordered by lane ("quick" jobs
+# with few pages before large "batch" jobs), then by arrival. Each queued job's
+# position is kept up to date in its job record. Runs on the event loop.
+import heapq
+import asyncio
+import logging
+import itertools
+import fitz
+from typing import Awaitable, Callable, Dict
+
+from core import config
+from core import job_state
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+LANE_PRIORITY = {"quick": 0, "batch": 1}
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when the queue already holds MAX_QUEUED_JOBS jobs."""
+
+
+class JobScheduler:
+
+    def __init__(self, max_concurrent: int, max_queued: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queued = max_queued
+
+        self._heap = []
+        self._sequence = itertools.count()
+        # job_id -> (lane, job_fn, args); a job cancelled while queued is removed
+        # here and skipped when it reaches the top of the heap
+        self._queued: Dict[str, tuple] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._published_positions: Dict[str, tuple] = {}
+
+    def submit(self, job_id: str, lane: str, job_fn: Callable[..., Awaitable], *args):
+        """Queue job_fn(*args) to run as job_id in the given lane ("quick" or "batch")."""
+        if not self.has_room():
+            raise QueueFullError(f"The job queue is full ({self.max_queued} jobs waiting).")
+
+        heapq.heappush(self._heap, (LANE_PRIORITY.get(lane, 1), next(self._sequence), job_id))
+        self._queued[job_id] = (lane, job_fn, args)
+        job_state.update_job_status(job_id, "queued")
+        logger.info(f"Job {job_id}: Queued in the {lane} lane.")
+
+        self._dispatch()
+        self._publish_positions()
+
+    def has_room(self) -> bool:
+        return len(self._queued) < self.max_queued
+
+    def cancel(self, job_id: str):
+        """
+        Cancel a job. A queued job is removed at once ("cancelled"); a running
+        job is asked to stop at its next check ("cancelling"). Returns None if
+        the scheduler does not know the job (finished, or never queued here).
+        """
+        if job_id in self._queued:
+            del self._queued[job_id]
+            self._published_positions.pop(job_id, None)
+            job_state.mark_job_cancelled(job_id)
+            logger.info(f"Job {job_id}: Cancelled while queued.")
+            self._publish_positions()
+            return "cancelled"
+
+        if job_id in self._running:
+            job_state.request_cancel(job_id)
+            logger.info(f"Job {job_id}: Cancellation requested.")
+            return "cancelling"
+
+        return None
+
+    def stats(self):
+        return {"running": len(self._running), "queued": len(self._queued)}
+
+    def _dispatch(self):
+        while len(self._running) < self.max_concurrent and self._heap:
+            _, _, job_id = heapq.heappop(self._heap)
+            entry = self._queued.pop(job_id, None)
+            if entry is None:
+                continue
+
+            _, job_fn, args = entry
+            self._published_positions.pop(job_id, None)
+            job_state.update_job_queue(job_id, None)
+            self._running[job_id] = asyncio.create_task(self._run(job_id, job_fn, args))
+
+    async def _run(self, job_id, job_fn, args):
+        try:
+            await job_fn(*args)
+        except Exception:
+            # The job functions record their own failures; this only guards the scheduler
+            logger.error(f"Job {job_id}: Unhandled error in the job task.", exc_info=True)
+        finally:
+            self._running.pop(job_id, None)
+            self._dispatch()
+            self._publish_positions()
+
+    def _publish_positions(self):
+        ordered = sorted(entry for entry in self._heap if entry[2] in self._queued)
+        for position, (_, _, job_id) in enumerate(ordered, start=1):
+            # Only write jobs whose place (or the queue length) actually changed
+            if self._published_positions.get(job_id) != (position, len(ordered)):
+                self._published_positions[job_id] = (position, len(ordered))
+                job_state.update_job_queue(job_id, position, self._queued[job_id][0], len(ordered))
+
+
+def choose_lane(pdf_paths) -> str:
+    """Lane for a job: "quick" if its PDFs have at most QUICK_JOB_MAX_PAGES pages in total, else "batch"."""
+    total_pages = 0
+    for path in pdf_paths:
+        try:
+            with fitz.open(path) as doc:
+                total_pages += doc.page_count
+        except Exception:
+            # The job reports unreadable files itself; they do not count here
+            continue
+        if total_pages > config.QUICK_JOB_MAX_PAGES:
+            return "batch"
+    return "quick"
+
+
+_scheduler = None
+
+
+def get_scheduler() -> JobScheduler:
+    """Return the process-wide scheduler (created on first use, inside the event loop)."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = JobScheduler(config.MAX_CONCURRENT_JOBS, config.MAX_QUEUED_JOBS)
+    return _scheduler
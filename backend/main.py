@@ -3,12 +3,14 @@ import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 
 # File Imports
 from api.translations import router as translations_router
-from model.model import load_model
+from model import model as translation_model
+from core import metrics
+from core import job_state
+from utils.zip_and_queue_handler import shutdown_executors
 
 # ==============================================================================
 # 1. CONFIGURE LOGGING & MODEL
@@ -27,17 +29,17 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
 
-    # Code to run before the server starts accepting any requests
-    try :
-        logger.info("Server starting up: Setting up the translation model...")
-        load_model()
-        logger.info("model loaded successfully. Server is ready")
-    except Exception as e:
-        logger.critical(f"FATAL: Failed to load the translation model. Unable to start the application, {e}", exc_info=True)
-        raise RuntimeError("Failed to load the translation model.") from e
+    # Code to run before the server starts accepting any requests.
+    job_state.sweep_orphaned_result_zips()
+
+    # The model loads in the background; jobs wait for it before translating.
+    logger.info("Server starting up: Loading the translation model in the background...")
+    translation_model.start_background_load()
+    logger.info("Server is accepting requests (model warming up)")
     
     yield
     logger.info("Shutting down the server")
+    shutdown_executors()
 
 # ==============================================================================
 # FASTAPI APP
@@ -67,7 +69,20 @@ app.add_middleware(
 
 @app.get("/health")
 async def health_check():
-    """A simple endpoint to check if the server is up and running."""
-    return {"status": "ready"}
+    """
+    A simple endpoint to check if the server is up and running.
+    status is "warming" while the model loads, "ready" once it can translate
+    and "error" if loading failed.
+    """
+    if translation_model.model_status == "error":
+        return JSONResponse(status_code=503, content={"status": "error", "error": translation_model.model_error})
+    return {"status": "ready" if translation_model.model_status == "ready" else "warming"}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus-style metrics: stage timings, counters, batch sizes, throughput and memory."""
+    metrics.set_gauge("cad_model_ready", 1 if translation_model.model_status == "ready" else 0)
+    metrics.set_gauge("cad_jobs_tracked", job_state.store.count())
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
 
 app.include_router(translations_router, prefix="/translate", tags=["translation"])
\ No newline at end of file
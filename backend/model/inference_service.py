@@ -0,0 +1,179 @@
+# ==============================================================================
+# SHARED INFERENCE SERVICE (SINGLE WORKER THREAD + REQUEST COALESCING)
+# ==============================================================================
+# Every job hands its segments to one long-lived worker thread through a
+# queue instead of calling the model from whatever thread it runs on. The
+# worker waits a few milliseconds for other jobs' requests, merges them into
+# shared batches and resolves each caller's future with its own results.
+# Only this thread runs the model, so torch's intra-op thread pool is never
+# oversubscribed by concurrent jobs.
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCancelledError(Exception):
+    """Set on a request's future when its caller was cancelled before all its segments were translated."""
+
+
+class _Request:
+    """One caller's texts, the future for its results and its progress counters."""
+
+    def __init__(self, texts, on_progress, is_cancelled):
+        self.texts = texts
+        self.on_progress = on_progress
+        self.is_cancelled = is_cancelled
+        self.future = Future()
+        self.total = len(set(texts))
+        self.done = 0
+        self._cancelled = False
+
+    def cancelled(self):
+        """True once the caller's is_cancelled() has returned True (checked again until then)."""
+        if not self._cancelled and self.is_cancelled is not None:
+            try:
+                self._cancelled = bool(self.is_cancelled())
+            except Exception:
+                logger.warning("Cancellation check failed.", exc_info=True)
+        return self._cancelled
+
+
+class InferenceService:
+    """
+    Queue-fed inference worker.
+
+    translate_fn(texts, on_batch, filter_batch) must translate a list of texts
+    and call on_batch(indices) after each model batch with the indices it
+    finished. Before each batch it calls filter_batch(indices), which drops
+    the segments only cancelled requests still need; a batch left empty is
+    skipped. Texts it never translates may be returned as "".
+    """
+
+    def __init__(self, translate_fn, max_wait_seconds, max_segments):
+        self.translate_fn = translate_fn
+        self.max_wait_seconds = max_wait_seconds
+        self.max_segments = max_segments
+
+        self.coalesced_rounds = 0
+        self.coalesced_requests = 0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def translate(self, texts, on_progress=None, is_cancelled=None):
+        """Translate texts on the worker thread and wait for the result."""
+        if not texts:
+            return []
+        return self.submit(texts, on_progress, is_cancelled).result()
+
+    def submit(self, texts, on_progress=None, is_cancelled=None) -> Future:
+        """
+        Queue texts for translation. Returns a future resolving to the list of
+        translations (same order). on_progress(done, total) is called from the
+        worker thread as this request's segments are finished.
+
+        is_cancelled() is checked by the worker before each model batch; once
+        it returns True the request's remaining segments are dropped and the
+        future fails with RequestCancelledError.
+        """
+        self._ensure_started()
+        request = _Request(list(texts), on_progress, is_cancelled)
+        self._queue.put(request)
+        return request.future
+
+    def stop(self):
+        """Ask the worker thread to exit after the requests already queued."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(None)
+            self._thread = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="inference-worker", daemon=True)
+                self._thread.start()
+
+    # ------------------------------------------------------------------
+    # Worker thread
+    # ------------------------------------------------------------------
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+
+            requests = [first]
+            segment_count = len(first.texts)
+            deadline = time.monotonic() + self.max_wait_seconds
+
+            # Coalescing window: gather whatever else arrives shortly after
+            stop_after_round = False
+            while segment_count < self.max_segments:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    request = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if request is None:
+                    stop_after_round = True
+                    break
+                requests.append(request)
+                segment_count += len(request.texts)
+
+            self._process(requests)
+            if stop_after_round:
+                return
+
+    def _process(self, requests):
+        unique_texts = list(dict.fromkeys(text for request in requests for text in request.texts))
+        owners = {text: [] for text in unique_texts}
+        for request in requests:
+            for text in set(request.texts):
+                owners[text].append(request)
+
+        if len(requests) > 1:
+            self.coalesced_rounds += 1
+            self.coalesced_requests += len(requests)
+            logger.debug(f"Coalesced {len(requests)} requests into one round of {len(unique_texts)} segments.")
+
+        def on_batch(indices):
+            touched = {}
+            for index in indices:
+                for request in owners[unique_texts[index]]:
+                    request.done += 1
+                    touched[id(request)] = request
+            for request in touched.values():
+                if request.on_progress is not None:
+                    try:
+                        request.on_progress(request.done, request.total)
+                    except Exception:
+                        logger.warning("Progress callback failed.", exc_info=True)
+
+        def filter_batch(indices):
+            # One check per request and batch; segments shared with a live request are kept
+            active = {id(request) for request in requests if not request.cancelled()}
+            if len(active) == len(requests):
+                return indices
+            return [index for index in indices
+                    if any(id(request) in active for request in owners[unique_texts[index]])]
+
+        try:
+            results = dict(zip(unique_texts, self.translate_fn(unique_texts, on_batch, filter_batch)))
+        except Exception as e:
+            for request in requests:
+                request.future.set_exception(e)
+            return
+
+        for request in requests:
+            if request.cancelled():
+                request.future.set_exception(RequestCancelledError("The request was cancelled."))
+            else:
+                request.future.set_result([results[text] for text in request.texts])
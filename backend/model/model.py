@@ -4,38 +4,292 @@
 import os
 import sys
 import logging
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+import json
+import hashlib
+import threading
+
+from core import config
 
 logger = logging.getLogger(__name__)
 
-# These will be loaded once at startup and reused
+# These will be loaded once at startup and reused.
+# 'backend' runs the actual inference; 'model' is the underlying HF model
+# for the torch/ONNX backends (None for CTranslate2).
 tokenizer = None
 model = None
+backend = None
+
+# Identifies the loaded weights, so cached translations from another model are never reused
+model_id = None
+
+# Loading state reported by /health: "not_loaded" -> "warming" -> "ready" (or "error")
+model_status = "not_loaded"
+model_error = None
+_load_finished = threading.Event()
+# Guards the "not_loaded" -> "warming" step, so only one caller ever starts loading
+_load_lock = threading.Lock()
 
-def load_model():
+
+def start_background_load():
+    """
+    Load the model on a daemon thread so the server can accept requests
+    (and the GUI can show its window) while torch and the weights load.
+    """
+    if not _claim_load():
+        return
+    threading.Thread(target=_load_in_background, name="model-loader", daemon=True).start()
+
+
+def _claim_load():
+    """Mark the model as warming; returns False if loading was already started by someone else."""
+    global model_status
+    with _load_lock:
+        if model_status != "not_loaded":
+            return False
+        model_status = "warming"
+        return True
+
+
+def _load_in_background():
+    try:
+        load_model()
+    except Exception:
+        # load_model already logged the failure and recorded it in model_error
+        pass
+
+
+def wait_until_ready(timeout=None):
+    """
+    Block until the model has finished loading. Jobs call this before their
+    first model call, so anything submitted during warm-up simply waits.
+    If nothing has started loading the model yet, it is loaded right here.
+    """
+    if _claim_load():
+        load_model()
+
+    if not _load_finished.wait(timeout):
+        raise TimeoutError("Timed out waiting for the translation model to load.")
+    if model_status != "ready":
+        raise RuntimeError(f"The translation model failed to load: {model_error}")
+
+
+def load_model(backend_name=None):
     """
     Loads the model, reliably finding the path in both development
     and packaged (PyInstaller) mode.
+
+    backend_name (default: config.INFERENCE_BACKEND) picks the inference
+    backend; an optional backend that cannot be set up falls back to torch.
     """
-    global tokenizer, model
-    
-    if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-        base_path = sys._MEIPASS
-        local_model_path = os.path.join(base_path, "trained_helsinki")
-    else:
-        # Path is relative to this file's location (backend/ml/)
-        base_path = os.path.dirname(os.path.abspath(__file__))
-        local_model_path = os.path.join(base_path, "..", "..", "trained_helsinki")
+    global tokenizer, model, backend, model_id, model_status, model_error
+
+    backend_name = backend_name or config.INFERENCE_BACKEND
+    local_model_path = get_model_path()
     
     logger.info(f"Attempting to load model from path: {local_model_path}")
     
+    model_status = "warming"
     try:
-        tokenizer = AutoTokenizer.from_pretrained(local_model_path)
-        model = AutoModelForSeq2SeqLM.from_pretrained(local_model_path)
+        fingerprint = _fingerprint_model_dir(local_model_path)
+
+        tokenizer, backend = create_backend(backend_name, local_model_path, fingerprint)
+        model = getattr(backend, "model", None)
+        # Only set once the backend is final (it may have fallen back to torch),
+        # so nothing is cached under the id of a backend that was never used
+        model_id = f"{fingerprint}:{backend.name}"
 
-        logger.info("Model loaded successfully.")
+        model_status = "ready"
+        logger.info(f"Model loaded successfully ({backend.name} backend).")
 
     except Exception as e:
+        model_status = "error"
+        model_error = str(e)
         logger.critical(f"FATAL: Failed to load model from {local_model_path}.", exc_info=True)
         
-        raise RuntimeError("Failed to load the translation model.") from e
\ No newline at end of file
+        raise RuntimeError("Failed to load the translation model.") from e
+
+    finally:
+        _load_finished.set()
+
+
+def generate_batch(texts, max_length):
+    """Translate a batch of texts with the loaded backend; returns one string per text."""
+    return backend.generate_batch(texts, max_length)
+
+
+def get_model_path():
+    if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+        base_path = sys._MEIPASS
+        return os.path.join(base_path, "trained_helsinki")
+
+    # Path is relative to this file's location (backend/model/)
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_path, "..", "..", "trained_helsinki")
+
+
+# ==============================================================================
+# INFERENCE BACKENDS
+# ==============================================================================
+def create_backend(backend_name, model_path, fingerprint):
+    """
+    Build (tokenizer, backend) for the requested backend:
+    - "torch":       the original fp32 eager PyTorch model
+    - "torch-int8":  PyTorch with dynamic int8 quantization of the Linear layers
+    - "onnx":        ONNX Runtime through optimum (exported once, then cached)
+    - "ctranslate2": CTranslate2 (converted once, then cached)
+    Optional backends whose packages are missing or fail fall back to "torch".
+    """
+    # Deferred import: pulling in transformers/torch takes several seconds
+    from transformers import AutoTokenizer
+
+    model_tokenizer = AutoTokenizer.from_pretrained(model_path)
+    builders = {
+        "torch": _TorchBackend,
+        "torch-int8": _TorchInt8Backend,
+        "onnx": _OnnxBackend,
+        "ctranslate2": _CTranslate2Backend,
+    }
+
+    builder = builders.get(backend_name)
+    if builder is None:
+        logger.warning(f"Unknown inference backend '{backend_name}', using torch.")
+        builder = _TorchBackend
+
+    try:
+        return model_tokenizer, builder(model_tokenizer, model_path, fingerprint)
+    except Exception:
+        if builder is _TorchBackend:
+            raise
+        logger.warning(f"Could not set up the '{backend_name}' backend, falling back to torch.", exc_info=True)
+        return model_tokenizer, _TorchBackend(model_tokenizer, model_path, fingerprint)
+
+
+def _set_torch_threads():
+    import torch
+    if config.INFERENCE_THREADS > 0:
+        torch.set_num_threads(config.INFERENCE_THREADS)
+    logger.info(f"Torch intra-op threads: {torch.get_num_threads()}")
+
+
+def _cache_dir(kind, fingerprint):
+    """Folder under the app data dir where a converted model is kept."""
+    return os.path.join(config.APP_DATA_DIR, "converted_models", kind, fingerprint.replace(":", "_"))
+
+
+class _TorchBackend:
+    name = "torch"
+
+    def __init__(self, model_tokenizer, model_path, fingerprint):
+        from transformers import AutoModelForSeq2SeqLM
+
+        _set_torch_threads()
+        self.tokenizer = model_tokenizer
+        self.model = self._prepare(AutoModelForSeq2SeqLM.from_pretrained(model_path))
+
+    def _prepare(self, hf_model):
+        hf_model.eval()
+        return hf_model
+
+    def generate_batch(self, texts, max_length):
+        inputs = self.tokenizer(texts, return_tensors="pt", padding=True)
+        translated_ids = self.model.generate(**inputs, max_length=max_length)
+        decoded = self.tokenizer.batch_decode(translated_ids, skip_special_tokens=True)
+        return [text.strip() for text in decoded]
+
+
+class _TorchInt8Backend(_TorchBackend):
+    name = "torch-int8"
+
+    def _prepare(self, hf_model):
+        import torch
+
+        hf_model.eval()
+        return torch.ao.quantization.quantize_dynamic(hf_model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class _OnnxBackend(_TorchBackend):
+    name = "onnx"
+
+    def __init__(self, model_tokenizer, model_path, fingerprint):
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        session_options = onnxruntime.SessionOptions()
+        if config.INFERENCE_THREADS > 0:
+            session_options.intra_op_num_threads = config.INFERENCE_THREADS
+
+        export_dir = _cache_dir("onnx", fingerprint)
+        if os.path.isdir(export_dir):
+            ort_model = ORTModelForSeq2SeqLM.from_pretrained(export_dir, session_options=session_options)
+        else:
+            logger.info(f"Exporting the model to ONNX at {export_dir} (first run only)...")
+            ort_model = ORTModelForSeq2SeqLM.from_pretrained(model_path, export=True, session_options=session_options)
+            ort_model.save_pretrained(export_dir)
+
+        self.tokenizer = model_tokenizer
+        self.model = ort_model
+
+
+class _CTranslate2Backend:
+    name = "ctranslate2"
+
+    def __init__(self, model_tokenizer, model_path, fingerprint):
+        import ctranslate2
+
+        convert_dir = _cache_dir(f"ct2-{config.CT2_QUANTIZATION}", fingerprint)
+        if not os.path.isdir(convert_dir):
+            logger.info(f"Converting the model to CTranslate2 at {convert_dir} (first run only)...")
+            converter = ctranslate2.converters.TransformersConverter(model_path)
+            converter.convert(convert_dir, quantization=config.CT2_QUANTIZATION)
+
+        self.tokenizer = model_tokenizer
+        self.beam_size = _configured_num_beams(model_path)
+        self.translator = ctranslate2.Translator(
+            convert_dir, device="cpu", compute_type=config.CT2_QUANTIZATION,
+            intra_threads=max(0, config.INFERENCE_THREADS)
+        )
+
+    def generate_batch(self, texts, max_length):
+        source_tokens = [self.tokenizer.convert_ids_to_tokens(self.tokenizer.encode(text)) for text in texts]
+        results = self.translator.translate_batch(
+            source_tokens, beam_size=self.beam_size, max_decoding_length=max_length
+        )
+        decoded = [
+            self.tokenizer.decode(self.tokenizer.convert_tokens_to_ids(result.hypotheses[0]), skip_special_tokens=True)
+            for result in results
+        ]
+        return [text.strip() for text in decoded]
+
+
+def _configured_num_beams(model_path):
+    """Beam size the HF model would use, so CTranslate2 output stays comparable."""
+    for file_name in ("generation_config.json", "config.json"):
+        try:
+            with open(os.path.join(model_path, file_name), "r", encoding="utf-8") as f:
+                num_beams = json.load(f).get("num_beams")
+            if num_beams:
+                return int(num_beams)
+        except (OSError, ValueError):
+            continue
+    return 1
+
+
+def _fingerprint_model_dir(model_path):
+    """
+    Build a stable identifier for the model from its folder name, the size of
+    every file in it and the contents of the small config/vocab files.
+    File times are not used because the packaged exe re-extracts the model
+    on every launch.
+    """
+    digest = hashlib.sha1()
+    for root, _, files in os.walk(model_path):
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            size = os.path.getsize(file_path)
+            digest.update(f"{name}:{size}".encode("utf-8"))
+            if size <= 1024 * 1024:
+                with open(file_path, "rb") as f:
+                    digest.update(f.read())
+
+    folder_name = os.path.basename(os.path.normpath(model_path))
+    return f"{folder_name}:{digest.hexdigest()[:16]}"
@@ -9,10 +9,20 @@ import os
 
 # Import isolated modules
 from core import job_state as job_state
+from core import config
+from core import metrics
+from core.metrics import stage_timer
+from model import model as translation_model
 from utils.legends_util import create_legend_pdf_page
-from utils.text_extraction import extract_text_with_location, filter_chinese_text, extract_table_cells, final_extracted_text_list
+from utils.text_extraction import (
+    find_chinese_pages, extract_text_with_location, filter_chinese_text, extract_table_cells, final_extracted_text_list,
+    group_text_segments
+)
 from utils.translation import translate_chinese_to_english
 from utils.output_pdf_handler import prepare_display_data, create_translated_doc_in_memory, assemble_final_pdf
+from utils.result_cache import get_result_cache, hash_file
+from utils.revision_manifest import load_manifest, save_manifest, diff_against_manifest
+from services.streaming_translator import extract_segments_streaming, render_output_streaming
 
 logger = logging.getLogger(__name__)
 
@@ -21,62 +31,226 @@ logger = logging.getLogger(__name__)
 # ==============================================================================
 def run_translation_task(job_id: str, pdf_path: str):
     """The long-running function that will be executed in the background."""
+    timings = {}
+    output_path = pdf_path.replace(".pdf", "_translated.pdf")
     try:
         logger.info(f"Job {job_id}: Starting processing for {pdf_path}")
-        doc = fitz.open(pdf_path)
-        pdf_bytes = doc.tobytes()
-
-        job_state.update_job_status(job_id, "extracting")
-
-        # Extract all text using fitz
-        all_text = extract_text_with_location(doc)
 
-        # Extract bottom right table text using pdfplumber
-        brt = extract_table_cells(pdf_bytes, 665, 665, 1180, 830)
+        # A file translated before (same content, model and settings) is served from the cache
+        cache_hit, file_hash = fetch_cached_result(job_id, pdf_path, output_path)
+        if cache_hit:
+            return output_path
 
-        # Extract extract left side table text using pdfplumber
-        lsd = extract_table_cells(pdf_bytes, 665, 665, 1180, 830)
-
-        # Remove doubly extracted text from the brt table
-        interim_text_list = final_extracted_text_list(brt, all_text)
+        job_state.raise_if_cancelled(job_id)
+        doc = fitz.open(pdf_path)
 
-        # Similarly remove doubly extracted text from the lsd table
-        final_text_list = final_extracted_text_list(lsd, interim_text_list)
+        # Very large documents are extracted page by page and rendered a window at a time
+        streaming = bool(config.STREAMING_MIN_PAGES) and doc.page_count >= config.STREAMING_MIN_PAGES
 
-        # Filter out the Chinese text from it.
-        chinese_text_data = filter_chinese_text(final_text_list)
+        job_state.update_job_status(job_id, "extracting")
+        if streaming:
+            chinese_text_data = extract_segments_streaming(doc, pdf_path, timings=timings)
+        else:
+            chinese_text_data = extract_segments_from_doc(doc, pdf_path, timings=timings)
 
         if not chinese_text_data:
             raise ValueError("No Chinese text found in the document.")
 
+        job_state.raise_if_cancelled(job_id)
         job_state.update_job_status(job_id, "translating")
-        translated_data = translate_chinese_to_english(chinese_text_data)
-        
-        enriched_data, legend_terms = prepare_display_data(translated_data)
+        enriched_data, legend_terms = translate_segments(
+            job_id, pdf_path, chinese_text_data, timings=timings,
+            on_progress=lambda done, total: job_state.update_job_progress(job_id, segments_done=done, segments_total=total)
+        )
 
+        job_state.raise_if_cancelled(job_id)
         job_state.update_job_status(job_id, "creating_pdf")
-        output_path = pdf_path.replace(".pdf", "_translated.pdf")
-        
-        translated_doc = create_translated_doc_in_memory(doc, enriched_data)
 
-        if legend_terms:
-            first_page = translated_doc[0]
-            page_height = first_page.rect.height
-            legend_width = max(180, first_page.rect.width * 0.35)
-            legend_doc = create_legend_pdf_page(legend_terms, page_height=page_height, page_width=legend_width)
-            assemble_final_pdf(translated_doc, legend_doc, output_path)
-            translated_doc.close()
-            legend_doc.close()
+        if streaming:
+            render_output_streaming(job_id, doc, enriched_data, legend_terms, output_path, timings=timings)
         else:
-            translated_doc.save(output_path)
-            translated_doc.close()
-
+            render_output_from_doc(doc, enriched_data, legend_terms, output_path, timings=timings)
+        store_cached_result(file_hash, output_path)
 
         return output_path
 
+    except job_state.JobCancelledError:
+        # Handled by the job runner, which marks the job as cancelled
+        raise
     except Exception as e:
         logger.error(f"Job {job_id}: Task failed.", exc_info=True)
         job_state.update_job_status(job_id, "error", error=str(e))
     finally:
         if 'doc' in locals() and not doc.is_closed:
-            doc.close()
\ No newline at end of file
+            doc.close()
+        if timings:
+            job_state.update_job_timings(job_id, timings)
+
+
+# ==============================================================================
+# PIPELINE STAGES
+# The *_from_doc functions work on an already open document. The path based
+# wrappers open the file themselves and only take/return picklable data, so
+# they can be sent to a process pool by the concurrent job mode.
+# ==============================================================================
+def extract_segments_from_doc(doc, pdf_path, timings=None):
+    """
+    Extract all text (fitz + table cells) and return only the Chinese items.
+    doc must be opened from pdf_path; stage durations are added to timings if given.
+
+    fitz reads the file by path and pdfplumber parses a read-only memory map
+    of the same file, so the PDF is never re-serialized or copied into a
+    bytes object. Pages without any Chinese character are found by a quick
+    scan first and skip word extraction and table detection.
+    """
+    with stage_timer("cjk_scan", timings):
+        chinese_pages = find_chinese_pages(doc)
+
+    if not chinese_pages:
+        return []
+
+    # Extract all text using fitz
+    with stage_timer("extract", timings):
+        all_text = extract_text_with_location(doc, chinese_pages)
+
+    # Extract the table text of every region using a single pdfplumber pass
+    with stage_timer("table_cells", timings):
+        table_cells_by_region = extract_table_cells(pdf_path, config.TABLE_REGIONS, pages=chinese_pages)
+
+    with stage_timer("dedup_filter", timings):
+        # Remove the text extracted doubly from each table region
+        final_text_list = all_text
+        for region_cells in table_cells_by_region.values():
+            final_text_list = final_extracted_text_list(region_cells, final_text_list)
+
+    # Translate split and wrapped labels as whole segments
+    with stage_timer("group", timings):
+        final_text_list = group_text_segments(final_text_list, config.SEGMENT_GROUPING)
+
+    with stage_timer("dedup_filter", timings):
+        # Filter out the Chinese text from it.
+        return filter_chinese_text(final_text_list)
+
+
+def translate_segments(job_id: str, pdf_path: str, chinese_text_data, timings=None, on_progress=None):
+    """
+    Translate the extracted segments and decide how each is displayed.
+    Returns (enriched_data, legend_terms) as prepare_display_data does.
+
+    With INCREMENTAL_RETRANSLATION, a new revision of a drawing translated
+    before only sends its new or changed segments to the model; unchanged
+    segments keep the previous revision's translation, font size and legend
+    code. The diff against the previous revision is added to the job.
+    """
+    # Manifests are per model, and the model id is only final once it has loaded
+    translation_model.wait_until_ready()
+    model_id = translation_model.model_id
+    # Uploads are spooled to a new folder per job, so they name their project instead
+    project = (job_state.get_job(job_id) or {}).get("project")
+    manifest = None
+    if config.INCREMENTAL_RETRANSLATION and model_id is not None:
+        manifest = load_manifest(pdf_path, model_id, project)
+
+    reused, legend_terms, to_translate = [], {}, chinese_text_data
+    if manifest is not None:
+        with stage_timer("revision_diff", timings):
+            reused, legend_terms, to_translate, summary = diff_against_manifest(chinese_text_data, manifest)
+        job_state.add_revision_diff(job_id, {"file": os.path.basename(pdf_path), **summary})
+        metrics.inc("cad_segments_reused_total", len(reused))
+        logger.info(f"Job {job_id}: Revision of {summary['previous_file']}: {summary['unchanged']} segments unchanged, "
+                    f"{summary['changed']} changed, {summary['added']} added, {summary['removed']} removed.")
+
+    translation_stats = {"segments_reused": len(reused)} if manifest is not None else {}
+    translated_data = []
+    if to_translate:
+        with stage_timer("translate", timings):
+            translated_data = translate_chinese_to_english(
+                to_translate, stats=translation_stats, on_progress=on_progress, job_id=job_id
+            )
+        logger.info(f"Job {job_id}: Translated {translation_stats['segments']} segments, "
+                    f"{translation_stats['dedup_saved_calls']} model calls saved by de-duplication.")
+    job_state.update_job_stats(job_id, translation_stats)
+
+    # New abbreviations must not reuse the codes the unchanged segments keep
+    used_codes = {term: code for code, term in legend_terms.items()}
+    with stage_timer("prepare", timings):
+        enriched_data, new_legend_terms = prepare_display_data(translated_data, used_codes=used_codes)
+    legend_terms.update(new_legend_terms)
+    enriched_data = reused + enriched_data
+
+    if config.INCREMENTAL_RETRANSLATION and model_id is not None:
+        save_manifest(pdf_path, model_id, enriched_data, legend_terms, project)
+    return enriched_data, legend_terms
+
+
+def render_output_from_doc(doc, enriched_data, legend_terms, output_path, timings=None):
+    """
+    Overlay the translations, attach the legend (if any) and save to output_path.
+    Stage durations are added to timings if given.
+    """
+    with stage_timer("render", timings):
+        translated_doc = create_translated_doc_in_memory(doc, enriched_data)
+
+    if legend_terms:
+        first_page = translated_doc[0]
+        page_height = first_page.rect.height
+        legend_width = max(180, first_page.rect.width * 0.35)
+        with stage_timer("legend", timings):
+            legend_doc = create_legend_pdf_page(legend_terms, page_height=page_height, page_width=legend_width)
+        with stage_timer("assemble", timings):
+            assemble_final_pdf(translated_doc, legend_doc, output_path)
+        translated_doc.close()
+        legend_doc.close()
+    else:
+        with stage_timer("assemble", timings):
+            translated_doc.save(output_path)
+        translated_doc.close()
+
+    return output_path
+
+
+def fetch_cached_result(job_id: str, pdf_path: str, output_path: str, file_hash: str = None):
+    """
+    Copy the cached translation of pdf_path to output_path if there is one.
+    file_hash skips re-hashing when the caller already has the file's SHA-256.
+    Returns (hit, file_hash); file_hash is None when the result cache is disabled
+    and is passed to store_cached_result once a fresh output has been written.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return False, None
+
+    # Keys are per model, and the model id is only final once it has loaded
+    translation_model.wait_until_ready()
+    with stage_timer("result_cache"):
+        file_hash = file_hash or hash_file(pdf_path)
+        model_id = translation_model.model_id
+        hit = model_id is not None and cache.fetch(cache.make_key(file_hash, model_id), output_path)
+
+    metrics.inc("cad_result_cache_lookups_total")
+    if hit:
+        metrics.inc("cad_result_cache_hits_total")
+        job_state.update_job_stats(job_id, {"result_cache_hits": 1})
+        logger.info(f"Job {job_id}: Served {pdf_path} from the result cache.")
+    return hit, file_hash
+
+
+def store_cached_result(file_hash, output_path: str):
+    """Keep a freshly translated output in the result cache."""
+    cache = get_result_cache()
+    # The model id is read again here: a backend that fell back while loading changes it
+    if cache is None or file_hash is None or translation_model.model_id is None:
+        return
+    cache.store(cache.make_key(file_hash, translation_model.model_id), output_path)
+
+
+def extract_chinese_segments(pdf_path: str):
+    """Process-pool entry point for the extraction stage."""
+    with fitz.open(pdf_path) as doc:
+        return extract_segments_from_doc(doc, pdf_path)
+
+
+def render_translated_pdf(pdf_path: str, enriched_data, legend_terms, output_path: str):
+    """Process-pool entry point for the rendering stage."""
+    with fitz.open(pdf_path) as doc:
+        return render_output_from_doc(doc, enriched_data, legend_terms, output_path)
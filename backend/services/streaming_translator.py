@@ -0,0 +1,206 @@
+# ==============================================================================
+# STREAMING (PAGE-BY-PAGE) TRANSLATION PIPELINE
+# ==============================================================================
+# Large documents (e.g. 200-page specification books) are extracted one page
+# at a time and rendered a window of pages at a time, with every finished
+# window appended to the output file by an incremental save. Only the
+# extracted segments of the whole document (text and bboxes) are held in
+# memory; translation goes through the same translate_segments step as the
+# normal path, so the output (one legend for the document, a legend panel on
+# every page, revision reuse) is the same as for a small document.
+
+
+import logging
+import os
+import fitz
+import pdfplumber
+
+from core import job_state as job_state
+from core import config
+from core import metrics
+from core.metrics import stage_timer
+from utils.legends_util import create_legend_pdf_page
+from utils.text_extraction import (
+    scan_page_for_chinese, extract_page_text_with_location, extract_page_table_cells, unique_table_regions,
+    final_extracted_text_list, group_text_segments, filter_chinese_text, open_pdf_view
+)
+from utils.output_pdf_handler import render_translated_page, copy_untranslated_pages, append_page_with_legend
+
+logger = logging.getLogger(__name__)
+
+
+def extract_segments_streaming(doc, pdf_path: str, timings=None):
+    """
+    Return the Chinese items of doc, extracting one page at a time.
+    Gives the same items, in the same order, as extract_segments_from_doc:
+    the table cells of each region across all pages, then the other text.
+    """
+    with open_pdf_view(pdf_path) as view, pdfplumber.open(view) as plumber_pdf:
+        ranked = [entry for page_entries in _iter_page_segments(doc, plumber_pdf, timings) for entry in page_entries]
+    # Stable, so pages stay in order within each rank
+    ranked.sort(key=lambda entry: entry[0])
+    return [item for _, item in ranked]
+
+
+def render_output_streaming(job_id: str, doc, enriched_data, legend_terms, output_path: str, timings=None):
+    """
+    Render the translations window by window and write the result to output_path,
+    laid out as render_output_from_doc does. Per-page progress is published
+    through job_state as pages are written, and a cancelled job stops after
+    the current window. Stage durations are added to timings if given.
+    """
+    timings = {} if timings is None else timings
+    total_pages = doc.page_count
+    window_size = max(1, config.STREAMING_PAGE_WINDOW)
+    job_state.update_job_progress(job_id, pages_done=0, pages_total=total_pages)
+
+    items_by_page = {}
+    for item in enriched_data:
+        items_by_page.setdefault(item["page"], []).append(item)
+
+    legend_doc = None
+    if legend_terms:
+        # Sized from the first page, like the legend of the normal path
+        first_rect = doc[0].rect
+        with stage_timer("legend", timings):
+            legend_doc = create_legend_pdf_page(
+                legend_terms, page_height=first_rect.height, page_width=max(180, first_rect.width * 0.35)
+            )
+
+    writer = _IncrementalPdfWriter(output_path)
+    try:
+        for window in _iter_windows(range(total_pages), window_size):
+            window_doc = _render_window(doc, window, items_by_page, legend_doc, timings)
+            with stage_timer("assemble", timings):
+                writer.append(window_doc)
+            job_state.update_job_progress(job_id, pages_done=writer.pages_written, pages_total=total_pages)
+            # Stop before the next window is rendered
+            job_state.raise_if_cancelled(job_id)
+    except Exception:
+        writer.discard()
+        raise
+    finally:
+        if legend_doc is not None:
+            legend_doc.close()
+
+    logger.info(f"Job {job_id}: Streamed {total_pages} pages to {output_path}.")
+    return output_path
+
+
+# ==============================================================================
+# PAGE-BY-PAGE EXTRACTION
+# ==============================================================================
+def _iter_page_segments(doc, plumber_pdf, timings):
+    """
+    Yield the Chinese items of every page as (rank, item) pairs, extracting one
+    page at a time. Table cells of the n-th region get rank n and all other
+    text ranks after the regions. Pages without Chinese text yield no items
+    and are never table-scanned.
+    """
+    regions = unique_table_regions(config.TABLE_REGIONS)
+
+    for page_num in range(doc.page_count):
+        page = doc[page_num]
+        with stage_timer("cjk_scan", timings):
+            textpage = scan_page_for_chinese(page)
+        if textpage is None:
+            metrics.inc("cad_pages_skipped_total")
+            yield []
+            continue
+
+        with stage_timer("extract", timings):
+            page_text = extract_page_text_with_location(page, page_num, textpage)
+        with stage_timer("table_cells", timings):
+            page_cells = extract_page_table_cells(plumber_pdf.pages[page_num], page_num, regions)
+
+        with stage_timer("dedup_filter", timings):
+            # Remove the text extracted doubly from each table region
+            for region_cells in page_cells.values():
+                page_text = final_extracted_text_list(region_cells, page_text)
+        with stage_timer("group", timings):
+            page_text = group_text_segments(page_text, config.SEGMENT_GROUPING)
+        with stage_timer("dedup_filter", timings):
+            chinese_items = filter_chinese_text(page_text)
+
+        # Table cells pass through unchanged, so they are recognised by identity
+        rank_of = {id(cell): rank for rank, cells in enumerate(page_cells.values()) for cell in cells}
+        yield [(rank_of.get(id(item), len(page_cells)), item) for item in chinese_items]
+
+
+def _iter_windows(iterable, window_size):
+    """Group an iterable into lists of up to window_size items."""
+    window = []
+    for entry in iterable:
+        window.append(entry)
+        if len(window) >= window_size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+# ==============================================================================
+# RENDERING + INCREMENTAL OUTPUT
+# ==============================================================================
+def _render_window(doc, page_nums, items_by_page, legend_doc, timings):
+    """
+    Render the pages page_nums into a small in-memory document. With a legend,
+    every page gets the legend panel on its right, as assemble_final_pdf does;
+    pages without translations are copied through unchanged.
+    """
+    window_doc = fitz.open()
+
+    for page_num in page_nums:
+        page_items = items_by_page.get(page_num)
+        if legend_doc is None and not page_items:
+            with stage_timer("assemble", timings):
+                copy_untranslated_pages(window_doc, doc, page_num, page_num)
+            continue
+
+        page_doc = fitz.open()
+        if page_items:
+            with stage_timer("render", timings):
+                render_translated_page(page_doc, doc, page_num, page_items)
+        else:
+            with stage_timer("assemble", timings):
+                copy_untranslated_pages(page_doc, doc, page_num, page_num)
+
+        with stage_timer("assemble", timings):
+            if legend_doc is None:
+                window_doc.insert_pdf(page_doc)
+            else:
+                append_page_with_legend(window_doc, page_doc, 0, legend_doc)
+        page_doc.close()
+
+    return window_doc
+
+
+class _IncrementalPdfWriter:
+    """
+    Appends rendered page windows to the output file. The first window creates
+    the file; every later window is added with an incremental save, so the
+    pages already written never have to be held in memory again.
+    """
+
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.pages_written = 0
+
+    def append(self, window_doc):
+        if self.pages_written == 0:
+            window_doc.save(self.output_path)
+        else:
+            output_doc = fitz.open(self.output_path)
+            try:
+                output_doc.insert_pdf(window_doc)
+                output_doc.saveIncr()
+            finally:
+                output_doc.close()
+
+        self.pages_written += window_doc.page_count
+        window_doc.close()
+
+    def discard(self):
+        """Remove a partially written output file."""
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+
+from core import config, job_state
+from model import model as translation_model
+from utils import translation
+
+
+class _Tokenizer:
+    def __call__(self, texts):
+        if isinstance(texts, str):
+            return {"input_ids": list(texts)}
+        return {"input_ids": [list(text) for text in texts]}
+
+
+@pytest.fixture
+def stub_model(monkeypatch):
+    """Deterministic stand-in for the model that records every batch it is given."""
+    batches = []
+
+    def generate_batch(texts, max_length):
+        batches.append(list(texts))
+        return [f"EN {text}" for text in texts]
+
+    monkeypatch.setattr(translation_model, "tokenizer", _Tokenizer())
+    monkeypatch.setattr(translation_model, "generate_batch", generate_batch)
+    monkeypatch.setattr(translation_model, "model_id", "stub")
+    monkeypatch.setattr(translation_model, "model_status", "ready")
+    translation_model._load_finished.set()
+    monkeypatch.setattr(config, "TRANSLATION_MEMORY_ENABLED", False)
+    monkeypatch.setattr(config, "TRANSLATION_BATCH_SIZE", 1)
+    return batches
+
+
+def _items(count):
+    return [{"text": f"文字{i}", "bbox": (0, i, 10, i + 5), "page": 0} for i in range(count)]
+
+
+def test_translation_without_cancellation(stub_model):
+    job_id = uuid.uuid4().hex
+    job_state.create_job(job_id)
+
+    translated = translation.translate_chinese_to_english(_items(4), job_id=job_id)
+
+    assert [item["english_translation"] for item in translated] == [f"EN 文字{i}" for i in range(4)]
+    assert len(stub_model) == 4
+
+
+def test_cancelled_job_skips_remaining_batches(stub_model):
+    job_id = uuid.uuid4().hex
+    job_state.create_job(job_id)
+
+    def on_progress(done, total):
+        # Cancel right after the first model batch has finished
+        if done == 1:
+            job_state.request_cancel(job_id)
+
+    with pytest.raises(job_state.JobCancelledError):
+        translation.translate_chinese_to_english(_items(10), on_progress=on_progress, job_id=job_id)
+
+    assert len(stub_model) == 1
+
+
+def test_cancelled_request_does_not_drop_shared_segments(stub_model):
+    cancelled_job, live_job = uuid.uuid4().hex, uuid.uuid4().hex
+    job_state.create_job(cancelled_job)
+    job_state.create_job(live_job)
+    job_state.request_cancel(cancelled_job)
+
+    service = translation.inference_service
+    texts = [f"文字{i}" for i in range(3)]
+    cancelled = service.submit(texts, is_cancelled=lambda: job_state.is_cancel_requested(cancelled_job))
+    live = service.submit(texts[:1], is_cancelled=lambda: job_state.is_cancel_requested(live_job))
+
+    assert live.result(timeout=10) == ["EN 文字0"]
+    with pytest.raises(translation.RequestCancelledError):
+        cancelled.result(timeout=10)
+    assert ["文字1"] not in stub_model and ["文字2"] not in stub_model
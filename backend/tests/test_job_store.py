@@ -0,0 +1,43 @@
+import pytest
+
+from core.job_store import JobStore, InMemoryJobStore, SQLiteJobStore, FINISHED_STATUSES
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def test_incomplete_backend_fails_when_created():
+    class PartialStore(JobStore):
+        def get(self, job_id):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialStore()
+
+
+def test_update_and_transition(store):
+    store.create("job", {"status": "queued"})
+    store.update("job", lambda record: record.update(status="translating"))
+
+    assert store.transition("job", ("translating",), "complete")
+    assert not store.transition("job", ("translating",), "error")
+    assert store.get("job")["status"] == "complete" and "complete" in FINISHED_STATUSES
+    assert store.count() == 1
+
+
+def test_startup_sweep_removes_only_orphaned_zips(tmp_path, monkeypatch):
+    from core import config, job_state
+
+    monkeypatch.setattr(config, "RESULT_ZIP_DIR", str(tmp_path))
+    monkeypatch.setattr(job_state, "store", InMemoryJobStore())
+    job_state.store.create("known", {"status": "complete"})
+    for name in ("known.zip", "orphan.zip", "notes.txt"):
+        (tmp_path / name).write_bytes(b"x")
+
+    job_state.sweep_orphaned_result_zips()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["known.zip", "notes.txt"]
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from model import model as translation_model
+
+
+def test_concurrent_waiters_load_the_model_once(monkeypatch):
+    loads = []
+
+    def load_model():
+        loads.append(threading.current_thread().name)
+        time.sleep(0.05)
+        monkeypatch.setattr(translation_model, "model_status", "ready")
+        finished.set()
+
+    finished = threading.Event()
+    monkeypatch.setattr(translation_model, "model_status", "not_loaded")
+    monkeypatch.setattr(translation_model, "_load_finished", finished)
+    monkeypatch.setattr(translation_model, "load_model", load_model)
+
+    threads = [threading.Thread(target=translation_model.wait_until_ready, args=(5,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert translation_model.model_status == "ready"
+
+
+def test_result_cache_lookup_waits_for_the_model_id(monkeypatch, tmp_path):
+    from core import job_state
+    from services import pdf_translator
+    from utils.result_cache import ResultCache
+
+    cache = ResultCache(str(tmp_path / "cache"), 10 * 1024 * 1024)
+    source, cached = tmp_path / "drawing.pdf", tmp_path / "cached.pdf"
+    source.write_bytes(b"%PDF drawing")
+    cached.write_bytes(b"%PDF translated")
+    cache.store(cache.make_key("digest", "model-a"), str(cached))
+
+    def load_model():
+        time.sleep(0.05)
+        monkeypatch.setattr(translation_model, "model_id", "model-a")
+        monkeypatch.setattr(translation_model, "model_status", "ready")
+        finished.set()
+
+    finished = threading.Event()
+    monkeypatch.setattr(translation_model, "model_status", "not_loaded")
+    monkeypatch.setattr(translation_model, "model_id", None)
+    monkeypatch.setattr(translation_model, "_load_finished", finished)
+    monkeypatch.setattr(translation_model, "load_model", load_model)
+    monkeypatch.setattr(pdf_translator, "get_result_cache", lambda: cache)
+    job_state.create_job("warm-up")
+
+    output = tmp_path / "out.pdf"
+    hit, _ = pdf_translator.fetch_cached_result("warm-up", str(source), str(output), file_hash="digest")
+
+    assert hit and output.read_bytes() == b"%PDF translated"
@@ -0,0 +1,63 @@
+import os
+import time
+
+import pytest
+
+from core import config
+from utils import revision_manifest
+
+
+@pytest.mark.parametrize("name, key", [
+    ("GA-1001_RevB.pdf", "ga-1001"),
+    ("GA-1001-rev.3.pdf", "ga-1001"),
+    ("GA-1001 Revision 12.pdf", "ga-1001"),
+    ("GA-1001_R2.pdf", "ga-1001"),
+    ("GA-1001_v2.pdf", "ga-1001"),
+    ("PUMP-A.pdf", "pump-a"),
+    ("PUMP-B.pdf", "pump-b"),
+])
+def test_drawing_key(name, key):
+    assert revision_manifest.drawing_key(name) == key
+
+
+def _items(page_count):
+    return [{"page": page, "bbox": (0, 0, 10, 5), "text": "阀门", "english_translation": "Valve",
+             "display_text": "Valve", "font_size": 6} for page in range(page_count)]
+
+
+def test_manifests_are_evicted_least_recently_used_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "REVISION_MANIFEST_DIR", str(tmp_path))
+    revision_manifest.save_manifest("first.pdf", "stub", _items(50), {})
+    manifest_size = os.path.getsize(next(tmp_path.iterdir()))
+    # Room for two manifests
+    monkeypatch.setattr(config, "REVISION_MANIFEST_MAX_MB", (2 * manifest_size + manifest_size // 2) / (1024 * 1024))
+
+    revision_manifest.save_manifest("second.pdf", "stub", _items(50), {})
+    time.sleep(0.01)
+    # Reading the first drawing's manifest makes it the most recently used
+    assert revision_manifest.load_manifest("first.pdf", "stub") is not None
+    time.sleep(0.01)
+    revision_manifest.save_manifest("third.pdf", "stub", _items(50), {})
+
+    assert revision_manifest.load_manifest("first.pdf", "stub") is not None
+    assert revision_manifest.load_manifest("second.pdf", "stub") is None
+    assert revision_manifest.load_manifest("third.pdf", "stub") is not None
+
+
+def test_same_named_drawings_of_other_folders_are_not_reused(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "REVISION_MANIFEST_DIR", str(tmp_path / "manifests"))
+    first, second = tmp_path / "project-a", tmp_path / "project-b"
+
+    revision_manifest.save_manifest(str(first / "GA-1001_RevA.pdf"), "stub", _items(1), {})
+
+    assert revision_manifest.load_manifest(str(first / "GA-1001_RevB.pdf"), "stub") is not None
+    assert revision_manifest.load_manifest(str(second / "GA-1001_RevB.pdf"), "stub") is None
+
+
+def test_project_key_overrides_the_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "REVISION_MANIFEST_DIR", str(tmp_path / "manifests"))
+    # Uploads of one project arrive in a different spool folder for every job
+    revision_manifest.save_manifest(str(tmp_path / "job-1" / "GA-1001_RevA.pdf"), "stub", _items(1), {}, "plant-a")
+
+    assert revision_manifest.load_manifest(str(tmp_path / "job-2" / "GA-1001_RevB.pdf"), "stub", "plant-a") is not None
+    assert revision_manifest.load_manifest(str(tmp_path / "job-2" / "GA-1001_RevB.pdf"), "stub", "plant-b") is None
@@ -0,0 +1,35 @@
+from utils.text_extraction import group_text_segments
+
+
+def _word(text, bbox, block, line):
+    return {"text": text, "bbox": bbox, "page": 0, "block": block, "line": line}
+
+
+def _wrapped_note(*others):
+    return [
+        _word("技术要求", (20.0, 38.0, 70.0, 52.0), 0, 0),
+        _word("未注倒角C1所有焊缝均为连续焊", (8.0, 52.0, 162.0, 66.0), 0, 1),
+        *others,
+    ]
+
+
+def test_wrapped_lines_are_merged():
+    segments = group_text_segments(_wrapped_note(), "block")
+
+    assert [segment["text"] for segment in segments] == ["技术要求未注倒角C1所有焊缝均为连续焊"]
+    assert segments[0]["bbox"] == (8.0, 38.0, 162.0, 66.0)
+
+
+def test_merge_that_would_cover_another_word_is_rejected():
+    # "A" lies inside the union of the two lines, so merging them would blank it out
+    segments = group_text_segments(_wrapped_note(_word("A", (8.0, 37.25, 18.67, 54.99), 1, 0)), "block")
+
+    assert {segment["text"] for segment in segments} == {"A", "技术要求", "未注倒角C1所有焊缝均为连续焊"}
+    merged = [segment["bbox"] for segment in segments if segment["text"] != "A"]
+    assert (8.0, 38.0, 162.0, 66.0) not in merged
+
+
+def test_same_line_words_are_merged():
+    words = [_word("焊缝", (10.0, 10.0, 30.0, 24.0), 0, 0), _word("长度", (32.0, 10.0, 52.0, 24.0), 0, 0)]
+
+    assert [segment["text"] for segment in group_text_segments(words, "line")] == ["焊缝长度"]
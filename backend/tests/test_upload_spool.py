@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from utils.upload_spool import PdfUploadSpooler, UploadError, _safe_pdf_name
+
+BOUNDARY = "testboundary"
+
+
+def _multipart_body(filename, data=b"%PDF-1.7 test"):
+    return (
+        f"--{BOUNDARY}\r\n"
+        f'Content-Disposition: form-data; name="files"; filename="{filename}"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode("utf-8") + data + f"\r\n--{BOUNDARY}--\r\n".encode("utf-8")
+
+
+@pytest.mark.parametrize("filename, expected", [
+    ("C:evil.pdf", "evil.pdf"),
+    ("C:\\Users\\me\\drawing.pdf", "drawing.pdf"),
+    ("\\\\server\\share\\drawing.pdf", "drawing.pdf"),
+    ("/home/me/drawing.PDF", "drawing.pdf"),
+    ("ab:evil.pdf", None),
+    ("drawing?.pdf", None),
+    ("CON.pdf", None),
+    ("..pdf", None),
+    ("drawing.txt", None),
+])
+def test_safe_pdf_name(filename, expected):
+    assert _safe_pdf_name(filename) == expected
+
+
+def test_drive_prefixed_upload_stays_in_spool_dir(tmp_path):
+    spool_dir = tmp_path / "spool"
+    spooler = PdfUploadSpooler(f"multipart/form-data; boundary={BOUNDARY}", str(spool_dir))
+
+    finished = spooler.feed(_multipart_body("C:evil.pdf"))
+    spooler.finish()
+
+    assert [os.path.basename(path) for path, _, _ in finished] == ["evil.pdf"]
+    assert os.listdir(spool_dir) == ["evil.pdf"]
+    assert os.listdir(tmp_path) == ["spool"]
+
+
+def test_reserved_upload_name_is_rejected(tmp_path):
+    spooler = PdfUploadSpooler(f"multipart/form-data; boundary={BOUNDARY}", str(tmp_path))
+    with pytest.raises(UploadError):
+        spooler.feed(_multipart_body("ab:evil.pdf"))
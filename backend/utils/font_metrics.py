@@ -0,0 +1,172 @@
+# ==============================================================================
+# FONT METRICS (TEXT WIDTH + FONT-SIZE FITTING) FILE
+# ==============================================================================
+import functools
+import fitz
+
+# Same tolerance PyMuPDF uses when deciding whether a text box overflowed
+_EPSILON = 1e-5
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(fontname):
+    """Shared fitz.Font for a font name (e.g. for TextWriter); loaded once per process."""
+    return fitz.Font(fontname)
+
+
+@functools.lru_cache(maxsize=None)
+def _font_info(fontname):
+    """
+    Per-font constants at font size 1: line height factor, ascender,
+    descender and whether the font is a simple (single byte) Base-14 font.
+    """
+    font = get_font(fontname)
+    ascender, descender = font.ascender, font.descender
+    line_height = ascender - descender if ascender - descender > 1 else 1.2
+    return {"line_height": line_height, "ascender": ascender, "descender": descender,
+            "simple": fontname in fitz.Base14_fontdict}
+
+
+@functools.lru_cache(maxsize=None)
+def _glyph_width(char, fontname):
+    """Advance width of one character at font size 1 (cached per font)."""
+    return fitz.get_text_length(char, fontname=fontname, fontsize=1)
+
+
+@functools.lru_cache(maxsize=65536)
+def text_width(text, fontname="helv"):
+    """Width of a string at font size 1, built from the cached glyph widths."""
+    if _font_info(fontname)["simple"]:
+        # Simple fonts render characters above 255 as '?', like insert_textbox does
+        text = "".join(c if ord(c) < 256 else "?" for c in text)
+    return sum(_glyph_width(c, fontname) for c in text)
+
+
+def wrapped_line_count(text, max_width, fontname="helv"):
+    """
+    Number of lines the text needs when wrapped into max_width (in units of
+    font size 1), using the same word-wrap rules as Page.insert_textbox:
+    split on spaces, and break a word character by character only when it
+    is wider than a whole line.
+    """
+    space = text_width(" ", fontname)
+    line_count = 0
+
+    for line in text.splitlines() or [""]:
+        line_count += 1
+        rest = max_width
+        line_has_text = False
+
+        for word in line.split(" "):
+            word_width = text_width(word, fontname)
+            if rest >= word_width:
+                rest -= word_width + space
+                line_has_text = True
+                continue
+
+            if line_has_text:
+                line_count += 1
+            if word_width <= max_width:
+                rest = max_width - word_width - space
+                line_has_text = True
+                continue
+
+            # Long word: split it across as many lines as it needs
+            used = 0.0
+            for char in word:
+                char_width = text_width(char, fontname)
+                if used <= max_width - char_width:
+                    used += char_width
+                else:
+                    line_count += 1
+                    used = char_width
+            rest = max_width - used - space
+            line_has_text = True
+
+    return line_count
+
+
+def wrap_text(text, max_width, fontname="helv"):
+    """
+    The lines of text wrapped into max_width (in units of font size 1), by
+    the same rules as wrapped_line_count, for callers that place the lines
+    themselves. len(wrap_text(...)) == wrapped_line_count(...).
+    """
+    space = text_width(" ", fontname)
+    lines = []
+
+    for paragraph in text.splitlines() or [""]:
+        current, used = [], 0.0
+        for word in paragraph.split(" "):
+            word_width = text_width(word, fontname)
+            gap = space if current else 0.0
+            if used + gap + word_width <= max_width:
+                current.append(word)
+                used += gap + word_width
+                continue
+
+            if current:
+                lines.append(" ".join(current))
+            if word_width <= max_width:
+                current, used = [word], word_width
+                continue
+
+            # Long word: split it across as many lines as it needs
+            piece, used = "", 0.0
+            for char in word:
+                char_width = text_width(char, fontname)
+                if used <= max_width - char_width:
+                    piece += char
+                    used += char_width
+                else:
+                    lines.append(piece)
+                    piece, used = char, char_width
+            current = [piece]
+        lines.append(" ".join(current))
+
+    return lines
+
+
+def lines_height(line_count, fontsize, fontname="helv"):
+    """Height insert_textbox needs for line_count lines at fontsize."""
+    info = _font_info(fontname)
+    return fontsize * (info["line_height"] * line_count - info["descender"])
+
+
+def line_metrics(fontsize, fontname="helv"):
+    """(first baseline below the top, distance between baselines) when lines are placed like insert_textbox does."""
+    info = _font_info(fontname)
+    return fontsize * info["ascender"], fontsize * info["line_height"]
+
+
+def text_height(text, width, fontsize, fontname="helv"):
+    """Height insert_textbox needs to place the whole text in a box of the given width."""
+    return lines_height(wrapped_line_count(text, width / fontsize, fontname), fontsize, fontname)
+
+
+def text_fits(rect, text, fontsize, fontname="helv"):
+    """Return True if insert_textbox would place the whole text in rect at fontsize."""
+    if fontsize <= 0 or rect.width <= 0 or rect.height <= 0:
+        return False
+    return text_height(text, rect.width, fontsize, fontname) - rect.height <= _EPSILON
+
+
+def fit_fontsize(rect, text, fontname="helv", max_fontsize=12, min_fontsize=1):
+    """
+    Largest whole font size (up to max_fontsize) at which the text fits in
+    rect, including multi-line wrapping. Found by binary search; returns 0
+    if the text does not fit even at min_fontsize.
+    """
+    rect = fitz.Rect(rect)
+    if not text:
+        return max_fontsize
+
+    low, high, best = min_fontsize, max_fontsize, 0
+    while low <= high:
+        mid = (low + high) // 2
+        if text_fits(rect, text, mid, fontname):
+            best = mid
+            low = mid + 1
+        else:
+            high = mid - 1
+    return best
@@ -3,18 +3,22 @@
 # ==============================================================================
 import fitz  # PyMuPDF
 import re
-from reportlab.pdfgen import canvas
-from reportlab.lib.colors import black, grey, whitesmoke
-from reportlab.platypus import Table, TableStyle, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-import io
 
-# Paragraph style for wrapping
-styles = getSampleStyleSheet()
-styleN = styles["Normal"]
-styleN.fontName = "Helvetica"
-styleN.fontSize = 9
-styleN.wordWrap = 'CJK'
+from core import config
+from utils.font_metrics import get_font, wrap_text, lines_height, line_metrics
+
+# Legend table style, shared by every legend page (same look as the reportlab table)
+LEGEND_FONT_SIZE = 9
+LEGEND_CODE_FONT = "hebo"  # Helvetica-Bold
+LEGEND_MEANING_FONT = "helv"  # Helvetica
+LEGEND_MARGIN = 10
+LEGEND_CODE_COLUMN_WIDTH = 70
+LEGEND_CELL_PADDING = (6, 3, 6, 3)  # left, top, right, bottom
+LEGEND_HEADER_BOTTOM_PADDING = 8
+LEGEND_GRID_WIDTH = 0.5
+_BLACK = (0, 0, 0)
+_GREY = (0.5, 0.5, 0.5)
+_WHITESMOKE = (0.96, 0.96, 0.96)
 
 
 def refine_abbreviation(term, used_codes, max_len=3):
@@ -78,18 +82,6 @@ def refine_abbreviation(term, used_codes, max_len=3):
 #     return max(avg_font_size, min_font_size)
 
 
-def _create_legend_data_from_terms(legend_terms_dict):
-    """
-    Build a 2D list suitable for reportlab's Table from a dict of {code: term}.
-    Wraps long meanings using a Paragraph so they line-break inside the table cell.
-    """
-    data = [["Code", "Meaning"]]
-    for code, term in legend_terms_dict.items():
-        meaning_para = Paragraph(term, styleN)
-        data.append([code, meaning_para])
-    return data
-
-
 def create_legend_pdf_page(legend_terms, page_height, page_width):
     """
     Create a single-page PDF in memory containing ONLY the legend table.
@@ -97,18 +89,117 @@ def create_legend_pdf_page(legend_terms, page_height, page_width):
     Inputs:
     - legend_terms: dict like {'GAD': 'General Arrangement Drawing'}
     - page_height: float
-    - page_width: float
-
-    Logic:
-    - Use reportlab to create a Table from the legend_terms
-    - Style the table via TableStyle
-    - Draw onto an in-memory canvas sized to (page_width x page_height)
+    - page_width: float (width of one legend column)
 
     Output:
-    - Returns a fitz.Document loaded from the in-memory PDF stream
+    - Returns a fitz.Document with one page holding the legend
+
+    LEGEND_RENDERER "fitz" draws the table straight onto a PyMuPDF page. When
+    the table is taller than the page it flows into further columns, each
+    page_width wide, so the returned page is wider than page_width. "reportlab"
+    keeps the original renderer, which cuts off a legend taller than the page.
+    """
+    if config.LEGEND_RENDERER == "reportlab":
+        return _create_legend_pdf_page_reportlab(legend_terms, page_height, page_width)
+
+    rows = _layout_legend_rows(legend_terms, page_width)
+    header = rows[0]
+    available_h = page_height - 2 * LEGEND_MARGIN
+
+    # Flow the rows into columns; every column starts with the header row
+    columns = [[]]
+    used_h = header["height"]
+    for row in rows[1:]:
+        if columns[-1] and used_h + row["height"] > available_h:
+            columns.append([])
+            used_h = header["height"]
+        columns[-1].append(row)
+        used_h += row["height"]
+
+    legend_doc = fitz.open()
+    page = legend_doc.new_page(width=page_width * len(columns), height=page_height)
+    shape = page.new_shape()
+    cells = []
+
+    for index, column_rows in enumerate(columns):
+        x = index * page_width + LEGEND_MARGIN
+        y = LEGEND_MARGIN
+        for row in [header] + column_rows:
+            code_rect = fitz.Rect(x, y, x + LEGEND_CODE_COLUMN_WIDTH, y + row["height"])
+            meaning_rect = fitz.Rect(code_rect.x1, y, x + row["width"], y + row["height"])
+            shape.draw_rect(code_rect)
+            shape.draw_rect(meaning_rect)
+            shape.finish(color=_BLACK, fill=_GREY if row is header else None, width=LEGEND_GRID_WIDTH)
+            cells.append((code_rect, row["code_lines"], LEGEND_CODE_FONT, row is header))
+            cells.append((meaning_rect, row["meaning_lines"], LEGEND_MEANING_FONT, row is header))
+            y += row["height"]
+
+    shape.commit()
+
+    # The lines were wrapped while measuring the rows, so they are placed
+    # directly; all text is written with one TextWriter per colour
+    header_writer = fitz.TextWriter(page.rect, color=_WHITESMOKE)
+    body_writer = fitz.TextWriter(page.rect, color=_BLACK)
+    left, top, _, _ = LEGEND_CELL_PADDING
+    for rect, lines, fontname, is_header in cells:
+        writer = header_writer if is_header else body_writer
+        font = get_font(fontname)
+        first_baseline, line_step = line_metrics(LEGEND_FONT_SIZE, fontname)
+        for line_index, line in enumerate(lines):
+            baseline = rect.y0 + top + first_baseline + line_index * line_step
+            writer.append((rect.x0 + left, baseline), line, font=font, fontsize=LEGEND_FONT_SIZE)
+    header_writer.write_text(page)
+    body_writer.write_text(page)
+
+    return legend_doc
+
+
+def _layout_legend_rows(legend_terms, page_width):
+    """
+    Header row plus one row per legend term: the wrapped lines of both cells
+    and the row height they need, measured with the cached font metrics.
+    """
+    table_width = page_width - 2 * LEGEND_MARGIN
+    left, top, right, bottom = LEGEND_CELL_PADDING
+    code_text_width = (LEGEND_CODE_COLUMN_WIDTH - left - right) / LEGEND_FONT_SIZE
+    meaning_text_width = (table_width - LEGEND_CODE_COLUMN_WIDTH - left - right) / LEGEND_FONT_SIZE
+
+    def _row(code, meaning, bottom_padding):
+        code_lines = wrap_text(code, code_text_width, LEGEND_CODE_FONT)
+        meaning_lines = wrap_text(meaning, meaning_text_width, LEGEND_MEANING_FONT)
+        height = max(
+            lines_height(len(code_lines), LEGEND_FONT_SIZE, LEGEND_CODE_FONT),
+            lines_height(len(meaning_lines), LEGEND_FONT_SIZE, LEGEND_MEANING_FONT),
+        )
+        return {"code_lines": code_lines, "meaning_lines": meaning_lines, "width": table_width,
+                "height": top + height + bottom_padding}
+
+    rows = [_row("Code", "Meaning", LEGEND_HEADER_BOTTOM_PADDING)]
+    rows.extend(_row(str(code), str(term), bottom) for code, term in legend_terms.items())
+    return rows
+
+
+def _create_legend_pdf_page_reportlab(legend_terms, page_height, page_width):
+    """
+    Original legend renderer: a reportlab Table drawn on an in-memory canvas,
+    then re-opened with fitz. reportlab is only imported when this is used.
     """
-    # Prepare table data
-    table_data = _create_legend_data_from_terms(legend_terms)
+    import io
+    from reportlab.pdfgen import canvas
+    from reportlab.lib.colors import black, grey, whitesmoke
+    from reportlab.platypus import Table, TableStyle, Paragraph
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    # Paragraph style for wrapping
+    styleN = getSampleStyleSheet()["Normal"]
+    styleN.fontName = "Helvetica"
+    styleN.fontSize = 9
+    styleN.wordWrap = 'CJK'
+
+    # Prepare table data; long meanings wrap inside their cell as Paragraphs
+    table_data = [["Code", "Meaning"]]
+    for code, term in legend_terms.items():
+        table_data.append([code, Paragraph(term, styleN)])
 
     # Create reportlab table and style
     table = Table(table_data, colWidths=[70, page_width - 90])
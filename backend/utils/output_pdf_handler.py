@@ -4,46 +4,39 @@
 
 
 import fitz
+from core import metrics
 from utils.legends_util import refine_abbreviation
+from utils.font_metrics import fit_fontsize
 
 
-def get_optimal_fontsize(rect, text, fontname="helv", max_fontsize=12, line_height_factor=1.2):
+def get_optimal_fontsize(rect, text, fontname="helv", max_fontsize=12):
     """
     Calculates the optimal font size to fit text within a rectangle,
-    considering BOTH width and height.
+    considering BOTH width and height, with the text wrapped over
+    several lines the same way insert_textbox wraps it.
     """
-    # 1. Calculate optimal size based on width (same as before)
-    width_optimal_size = max_fontsize
-    text_len_at_size_1 = fitz.get_text_length(text, fontname=fontname, fontsize=1)
-    if text_len_at_size_1 > 0:
-        width_optimal_size = rect.width / text_len_at_size_1
+    return fit_fontsize(rect, text, fontname=fontname, max_fontsize=max_fontsize)
 
-    # 2. Calculate optimal size based on height
-    # The rendered height of a line of text is roughly fontsize * 1.2
-    height_optimal_size = rect.height / line_height_factor
 
-    # 3. The true optimal size is the SMALLER of the two constraints
-    optimal_size = min(width_optimal_size, height_optimal_size)
 
-    # 4. Return the final size, capped by the maximum allowed font size
-    return min(int(optimal_size), max_fontsize)
 
 
-
-
-
-def prepare_display_data(translated_data):
+def prepare_display_data(translated_data, used_codes=None):
     """
     Enrich translated items by deciding whether to display full text or an abbreviation,
     and collect legend terms for any abbreviated entries.
 
     Input: translated_data (list of dicts from translate_chinese_to_english)
     Output: (enriched_translated_data, legend_terms)
-    - enriched_translated_data: list with additional 'display_text' per item
+    - enriched_translated_data: list with additional 'display_text' and 'font_size' per item
     - legend_terms: dict mapping {code: full term}
+
+    The font size computed here is carried through to the renderer, so the
+    fit is only calculated once per item. Pass the same used_codes dict on
+    every call to keep abbreviations consistent across calls (e.g. pages).
     """
     legend_terms = {}
-    used_codes = {}
+    used_codes = {} if used_codes is None else used_codes
     enriched = []
 
     for item in translated_data:
@@ -58,7 +51,9 @@ def prepare_display_data(translated_data):
             code = refine_abbreviation(english, used_codes)
             display_text = code
             legend_terms[code] = english
-        enriched.append({**item, "display_text": display_text})
+            metrics.inc("cad_abbreviations_total")
+            max_fontsize_possible = get_optimal_fontsize(original_bbox, display_text)
+        enriched.append({**item, "display_text": display_text, "font_size": max_fontsize_possible})
 
     return enriched, legend_terms
 
@@ -66,41 +61,94 @@ def create_translated_doc_in_memory(doc, enriched_translated_data):
     """
     Build a translated PDF (vector-first) in memory. Instead of writing to disk, return the fitz.Document.
     Uses 'display_text' for overlayed content (may be full term or abbreviation).
+
+    Items are bucketed by page once up front. Each page gets a single Shape:
+    every item adds exactly one white fill and one text insertion to it, and
+    the shape is committed to the page once. Pages with nothing to overlay
+    are copied through instead of being re-stamped.
     """
+    items_by_page = {}
+    for item in enriched_translated_data:
+        items_by_page.setdefault(item["page"], []).append(item)
+
     output_doc = fitz.open()
-    for page_num in range(doc.page_count):
-        page = doc[page_num]
-        output_page = output_doc.new_page(width=page.rect.width, height=page.rect.height)
-        output_page.show_pdf_page(page.rect, doc, page_num)
-        for item in enriched_translated_data:
-            if item["page"] == page_num:
-                original_bbox = fitz.Rect(item["bbox"])
-                display_text = item.get("display_text", item.get("english_translation", ""))
-                if display_text:
-        
-                    best_fsize = get_optimal_fontsize(original_bbox, display_text)
-
-                    leftover = -1
-                    font_size = best_fsize
-
-                    while leftover<0 and font_size >= 4:
-
-                        # Draw the rectangle
-                        output_page.draw_rect(original_bbox, color=(1, 1, 1), fill=(1, 1, 1), overlay=True, )
-
-                        # Insert the text
-                        leftover = output_page.insert_textbox(
-                            original_bbox, display_text, fontsize=font_size, fontname="helv",
-                            color=(0, 0, 0), align=fitz.TEXT_ALIGN_CENTER, overlay=True
-                        )
-
-                        font_size -= 1
-
-                    # print(f"display_text:{display_text}, leftover: {leftover}")
+    page_num = 0
+    while page_num < doc.page_count:
+        if items_by_page.get(page_num):
+            render_translated_page(output_doc, doc, page_num, items_by_page[page_num])
+            page_num += 1
+            continue
+
+        # Copy each run of pages without translations (e.g. English-only sheets) in one go
+        last_page = page_num
+        while last_page + 1 < doc.page_count and not items_by_page.get(last_page + 1):
+            last_page += 1
+        copy_untranslated_pages(output_doc, doc, page_num, last_page)
+        page_num = last_page + 1
                     
     return output_doc
 
 
+def copy_untranslated_pages(output_doc, doc, from_page, to_page):
+    """
+    Append pages from_page..to_page of doc to output_doc unchanged. insert_pdf
+    copies the page objects themselves, which is cheaper than wrapping each
+    page in a Form XObject with show_pdf_page.
+    """
+    output_doc.insert_pdf(doc, from_page=from_page, to_page=to_page)
+    metrics.inc("cad_pages_copied_total", to_page - from_page + 1)
+
+
+def render_translated_page(output_doc, doc, page_num, page_items):
+    """Append page page_num of doc to output_doc with the page's translations overlaid."""
+    page = doc[page_num]
+    output_page = output_doc.new_page(width=page.rect.width, height=page.rect.height)
+    output_page.show_pdf_page(page.rect, doc, page_num)
+    metrics.inc("cad_pages_rendered_total")
+
+    if not page_items:
+        return output_page
+
+    shape = output_page.new_shape()
+    for item in page_items:
+        display_text = item.get("display_text", item.get("english_translation", ""))
+        if display_text:
+            _draw_overlay_item(shape, fitz.Rect(item["bbox"]), display_text, item.get("font_size"))
+    shape.commit(overlay=True)
+    return output_page
+
+
+def _draw_overlay_item(shape, original_bbox, display_text, font_size=None, min_fontsize=4):
+    """
+    Add one white fill and one text box for an item to the page shape.
+
+    font_size is the fit already computed by prepare_display_data, which
+    matches insert_textbox's wrapping, so the first insertion normally fits.
+    Shape.insert_textbox writes nothing when the text does not fit, so the
+    size is only stepped down as a safety net and just the fitting attempt
+    is emitted. As before, nothing is drawn when the starting size is
+    already below min_fontsize.
+    """
+    if font_size is None:
+        font_size = get_optimal_fontsize(original_bbox, display_text)
+    if font_size < min_fontsize:
+        return
+
+    # Draw the rectangle
+    shape.draw_rect(original_bbox)
+    shape.finish(color=(1, 1, 1), fill=(1, 1, 1))
+
+    while font_size >= min_fontsize:
+        # Insert the text
+        leftover = shape.insert_textbox(
+            original_bbox, display_text, fontsize=font_size, fontname="helv",
+            color=(0, 0, 0), align=fitz.TEXT_ALIGN_CENTER
+        )
+        if leftover >= 0:
+            break
+        font_size -= 1
+
+
 def assemble_final_pdf(translated_doc, legend_doc, output_path):
     """
     Assemble each translated page with a corresponding legend page on the right
@@ -108,25 +156,31 @@ def assemble_final_pdf(translated_doc, legend_doc, output_path):
     """
     final_doc = fitz.open()
 
-    # Assume single-page legend reused for each page; size defines legend panel width
-    legend_page = legend_doc[0] if legend_doc and legend_doc.page_count > 0 else None
-
     for i in range(translated_doc.page_count):
-        t_page = translated_doc[i]
-        t_rect = t_page.rect
-        l_rect = legend_page.rect if legend_page else fitz.Rect(0, 0, 0, t_rect.height)
-        new_width = t_rect.width + l_rect.width
-        new_height = max(t_rect.height, l_rect.height)
-        new_page = final_doc.new_page(width=new_width, height=new_height)
-
-        # Stamp translated page at left
-        new_page.show_pdf_page(fitz.Rect(0, 0, t_rect.width, t_rect.height), translated_doc, i)
-
-        # Stamp legend page at right (if exists)
-        if legend_page:
-            new_page.show_pdf_page(
-                fitz.Rect(t_rect.width, 0, t_rect.width + l_rect.width, l_rect.height), legend_doc, 0
-            )
+        append_page_with_legend(final_doc, translated_doc, i, legend_doc)
 
     final_doc.save(output_path)
     final_doc.close()
+
+
+def append_page_with_legend(final_doc, translated_doc, page_index, legend_doc):
+    """Add one translated page to final_doc with the legend panel stamped on its right."""
+    # Assume single-page legend reused for each page; size defines legend panel width
+    legend_page = legend_doc[0] if legend_doc and legend_doc.page_count > 0 else None
+
+    t_page = translated_doc[page_index]
+    t_rect = t_page.rect
+    l_rect = legend_page.rect if legend_page else fitz.Rect(0, 0, 0, t_rect.height)
+    new_width = t_rect.width + l_rect.width
+    new_height = max(t_rect.height, l_rect.height)
+    new_page = final_doc.new_page(width=new_width, height=new_height)
+
+    # Stamp translated page at left
+    new_page.show_pdf_page(fitz.Rect(0, 0, t_rect.width, t_rect.height), translated_doc, page_index)
+
+    # Stamp legend page at right (if exists)
+    if legend_page:
+        new_page.show_pdf_page(
+            fitz.Rect(t_rect.width, 0, t_rect.width + l_rect.width, l_rect.height), legend_doc, 0
+        )
+    return new_page
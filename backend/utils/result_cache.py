@@ -0,0 +1,149 @@
+# ==============================================================================
+# RESULT CACHE (TRANSLATED PDFS KEYED BY INPUT CONTENT HASH)
+# ==============================================================================
+# A resubmitted drawing is served from here instead of being processed again.
+# The key is the SHA-256 of the input file together with the model id and the
+# output-affecting settings, so a different model or configuration never gets
+# a stale result. Entries are plain files; the cache is capped in bytes and
+# the least recently used files are evicted first (mtime is touched on hit).
+import os
+import json
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+
+from core import config
+
+logger = logging.getLogger(__name__)
+
+# Bump when a rendering/extraction change makes earlier cached outputs stale
+RESULT_FORMAT_VERSION = 1
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_version():
+    """Fingerprint of the settings that change the translated output."""
+    settings = {
+        "format": RESULT_FORMAT_VERSION,
+        "table_regions": {name: list(bbox) for name, bbox in config.TABLE_REGIONS.items()},
+        "max_length": config.TRANSLATION_MAX_LENGTH,
+        "segment_grouping": config.SEGMENT_GROUPING,
+        "legend_renderer": config.LEGEND_RENDERER,
+        "streaming_min_pages": config.STREAMING_MIN_PAGES,
+        "streaming_page_window": config.STREAMING_PAGE_WINDOW,
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+class ResultCache:
+    """Size-capped, least-recently-used cache of translated PDF files."""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, file_hash, model_id):
+        """Cache key for an input file (by its hash_file digest) under the given model."""
+        key_source = f"{file_hash}:{model_id}:{config_version()}"
+        return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+    def fetch(self, key, output_path):
+        """Copy the cached result for key to output_path. Returns True on a hit."""
+        cached_path = self._path(key)
+        try:
+            shutil.copyfile(cached_path, output_path)
+            # Mark as recently used for the LRU eviction
+            os.utime(cached_path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key, output_path):
+        """Copy a finished output into the cache, then evict down to the size cap."""
+        cached_path = self._path(key)
+        temp_path = f"{cached_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copyfile(output_path, temp_path)
+            # Atomic, so a concurrent fetch never sees a half-written file
+            os.replace(temp_path, cached_path)
+        except OSError:
+            logger.warning(f"Could not store {output_path} in the result cache.", exc_info=True)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        with self._lock:
+            self._evict()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".pdf"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                evicted += 1
+            except OSError:
+                continue
+
+        if evicted:
+            logger.info(f"Result cache: evicted {evicted} least recently used file(s).")
+
+
+# ==============================================================================
+# SHARED INSTANCE
+# ==============================================================================
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the process-wide result cache, or None if it is disabled in the config."""
+    global _cache
+
+    if not config.RESULT_CACHE_ENABLED:
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = ResultCache(config.RESULT_CACHE_DIR, config.RESULT_CACHE_MAX_MB * 1024 * 1024)
+            except OSError:
+                logger.warning(f"Could not create the result cache at {config.RESULT_CACHE_DIR}.", exc_info=True)
+                return None
+        return _cache
@@ -0,0 +1,220 @@
+# ==============================================================================
+# REVISION MANIFESTS (INCREMENTAL RE-TRANSLATION OF REVISED DRAWINGS)
+# ==============================================================================
+# After a drawing is translated, its segments (page, bbox, text) are stored
+# with their translation and font-fit decision in a manifest keyed by the
+# project and the drawing name without its revision suffix ("GA-1001_RevB.pdf"
+# and "GA-1001_RevC.pdf" of one project share one manifest). The project is
+# the source folder unless the caller names one (uploads are spooled to a new
+# folder per job). When the next revision arrives,
+# its segments are compared against that manifest: unchanged segments reuse
+# the stored result, and only new or changed text goes to the model.
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+
+from core import config
+from utils.result_cache import config_version
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FORMAT_VERSION = 1
+
+_evict_lock = threading.Lock()
+
+@lru_cache(maxsize=4)
+def _revision_suffix(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def drawing_key(pdf_path):
+    """Drawing name of a PDF with the revision suffix removed, e.g. 'GA-1001_RevB.pdf' -> 'ga-1001'."""
+    name = os.path.splitext(os.path.basename(pdf_path))[0]
+    base = _revision_suffix(config.REVISION_SUFFIX_PATTERN).sub("", name).strip(" _-.")
+    return (base or name).lower()
+
+
+def project_key(pdf_path, project=None):
+    """The project a drawing belongs to: project if given, else the PDF's folder."""
+    if project:
+        return f"project:{project.strip()}"
+    return os.path.normcase(os.path.dirname(os.path.abspath(pdf_path)))
+
+
+def load_manifest(pdf_path, model_id, project=None):
+    """
+    The manifest of the previous revision of pdf_path in the same project
+    (see project_key), or None if there is none or it was made by another
+    model or with other output settings.
+    """
+    path = _manifest_path(pdf_path, project)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning(f"Could not read the revision manifest {path}.", exc_info=True)
+        return None
+
+    if (manifest.get("format") != MANIFEST_FORMAT_VERSION or manifest.get("model_id") != model_id
+            or manifest.get("config_version") != config_version()):
+        logger.info(f"Revision manifest for '{manifest.get('drawing')}' is from another model or configuration, ignoring it.")
+        return None
+
+    try:
+        # Mark as recently used for the LRU eviction
+        os.utime(path)
+    except OSError:
+        pass
+    return manifest
+
+
+def save_manifest(pdf_path, model_id, enriched_items, legend_terms, project=None):
+    """Store the translated segments of pdf_path as the manifest for its next revision in the project."""
+    segments = [
+        {
+            "page": item["page"],
+            "bbox": list(item["bbox"]),
+            "text": item["text"],
+            "english_translation": item.get("english_translation", ""),
+            "display_text": item["display_text"],
+            "font_size": item["font_size"],
+            # Abbreviated items show a legend code instead of the translation
+            "abbreviated": item["display_text"] in legend_terms,
+        }
+        for item in enriched_items
+    ]
+    manifest = {
+        "format": MANIFEST_FORMAT_VERSION,
+        "project": project_key(pdf_path, project),
+        "drawing": drawing_key(pdf_path),
+        "source_file": os.path.basename(pdf_path),
+        "model_id": model_id,
+        "config_version": config_version(),
+        "created": time.time(),
+        "segments": segments,
+    }
+
+    path = _manifest_path(pdf_path, project)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        # Atomic, so a file of the same drawing processed concurrently never reads half a manifest
+        os.replace(temp_path, path)
+    except OSError:
+        logger.warning(f"Could not write the revision manifest {path}.", exc_info=True)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return
+
+    with _evict_lock:
+        _evict_manifests(config.REVISION_MANIFEST_MAX_MB * 1024 * 1024)
+
+
+def diff_against_manifest(chinese_items, manifest):
+    """
+    Split the segments of a new revision against the previous revision's manifest.
+
+    Returns (reused, reused_legend_terms, to_translate, summary):
+    - reused: enriched items (display_text/font_size included) for segments
+      with the same page, bbox and text as before
+    - reused_legend_terms: {code: term} for the reused items shown abbreviated
+    - to_translate: the new or changed segments, for the normal pipeline
+    - summary: counts of unchanged / changed / added / removed segments
+    """
+    previous = {}
+    previous_by_place = {}
+    for segment in manifest["segments"]:
+        previous.setdefault(_segment_key(segment), []).append(segment)
+        previous_by_place.setdefault(_place_key(segment), []).append(segment)
+
+    reused, to_translate = [], []
+    reused_legend_terms = {}
+    changed = 0
+    for item in chinese_items:
+        matches = previous.get(_segment_key(item))
+        if matches:
+            segment = matches.pop()
+            previous_by_place[_place_key(segment)].remove(segment)
+            reused.append({
+                **item,
+                "english_translation": segment["english_translation"],
+                "display_text": segment["display_text"],
+                "font_size": segment["font_size"],
+            })
+            if segment["abbreviated"]:
+                reused_legend_terms[segment["display_text"]] = segment["english_translation"].strip()
+            continue
+
+        # Same spot with different text counts as a change, not an add plus a removal
+        same_place = previous_by_place.get(_place_key(item))
+        if same_place:
+            segment = same_place.pop()
+            previous[_segment_key(segment)].remove(segment)
+            changed += 1
+        to_translate.append(item)
+
+    removed = sum(len(segments) for segments in previous.values())
+    summary = {
+        "previous_file": manifest.get("source_file"),
+        "unchanged": len(reused),
+        "changed": changed,
+        "added": len(to_translate) - changed,
+        "removed": removed,
+    }
+    return reused, reused_legend_terms, to_translate, summary
+
+
+def _evict_manifests(max_bytes):
+    """Remove the least recently used manifests until the folder is within max_bytes."""
+    entries = []
+    for entry in os.scandir(config.REVISION_MANIFEST_DIR):
+        if entry.name.endswith(".json"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            evicted += 1
+        except OSError:
+            continue
+
+    if evicted:
+        logger.info(f"Revision manifests: evicted {evicted} least recently used manifest(s).")
+
+
+def _segment_key(item):
+    return (item["page"], item["text"], _rounded_bbox(item["bbox"]))
+
+
+def _place_key(item):
+    return (item["page"], _rounded_bbox(item["bbox"]))
+
+
+def _rounded_bbox(bbox):
+    # Tolerates the float noise of re-exported drawings
+    return tuple(round(v) for v in bbox)
+
+
+def _manifest_path(pdf_path, project=None):
+    key = f"{project_key(pdf_path, project)}\n{drawing_key(pdf_path)}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+    return os.path.join(config.REVISION_MANIFEST_DIR, f"{digest}.json")
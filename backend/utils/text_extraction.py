@@ -3,27 +3,278 @@
 # ==============================================================================
 
 import re
-import pdfplumber
 import io
+import math
+import mmap
+import logging
+import contextlib
+import fitz
+import pdfplumber
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# The characters _is_likely_chinese looks for
+_CHINESE_CHAR = re.compile(r'[\u4e00-\u9fff]')
+
+# Chinese characters plus CJK / full-width punctuation: joined without a space
+_CJK_JOINABLE = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+# Points added on every side of a word's bbox at extraction
+_WORD_BBOX_PADDING = 2
+
+# Segment grouping thresholds, relative to the text height
+_MAX_WORD_GAP = 1.0         # horizontal gap between words of one segment
+_MIN_VERTICAL_OVERLAP = 0.5 # share of the smaller height two words on a line must share
+_MAX_LINE_GAP = 0.6         # vertical gap between wrapped lines of one segment
+_MAX_HEIGHT_RATIO = 1.5     # words/lines of very different font sizes are never merged
+
+# Cell size (points) of the grid used to find the words near a merged segment
+_OBSTACLE_GRID_SIZE = 64
+
 
 # ==============================================================================
-# FUNCTION TO EXTRACT ALL VECTOR TEXT FROM THE DOC
+# FAST PER-PAGE CHINESE PRE-SCAN
 # ==============================================================================
-def extract_text_with_location(doc):
-    # ... (same as your original code)
-    extracted_text_with_location = []
+def scan_page_for_chinese(page):
+    """
+    Parse the text of one fitz page once and check it for any Chinese character.
+    Returns the parsed TextPage when there is Chinese (extract_page_text_with_location
+    reuses it, so the page is not parsed twice), or None for an English-only page.
+    """
+    textpage = page.get_textpage(flags=fitz.TEXTFLAGS_WORDS)
+    if _CHINESE_CHAR.search(page.get_text("text", textpage=textpage)):
+        return textpage
+    return None
+
+
+def find_chinese_pages(doc):
+    """
+    Map page number -> (page, TextPage) for the pages of doc that contain Chinese
+    text. The other pages skip word extraction, table detection and translation,
+    and are copied through to the output unchanged.
+    """
+    chinese_pages = {}
     for page_num in range(doc.page_count):
         page = doc[page_num]
-        words = page.get_text("words")
-        for word in words:
-            extracted_text_with_location.append({
-                "text": word[4],
-                "bbox": (word[0]-2, word[1]-2, word[2]+2, word[3]+2),
-                "page": page_num
-            })
+        textpage = scan_page_for_chinese(page)
+        if textpage is not None:
+            # A TextPage only keeps a weak reference to its page
+            chinese_pages[page_num] = (page, textpage)
+    metrics.inc("cad_pages_skipped_total", doc.page_count - len(chinese_pages))
+    return chinese_pages
+
+
+# ==============================================================================
+# FUNCTION TO EXTRACT ALL VECTOR TEXT FROM THE DOC
+# ==============================================================================
+def extract_text_with_location(doc, chinese_pages=None):
+    """
+    Extract the vector words of every page, or only of the pages in chinese_pages
+    (as returned by find_chinese_pages, whose parsed text is reused).
+    """
+    extracted_text_with_location = []
+    if chinese_pages is None:
+        for page_num in range(doc.page_count):
+            extracted_text_with_location.extend(extract_page_text_with_location(doc[page_num], page_num))
+    else:
+        for page_num, (page, textpage) in chinese_pages.items():
+            extracted_text_with_location.extend(extract_page_text_with_location(page, page_num, textpage))
     return extracted_text_with_location
 
 
+def extract_page_text_with_location(page, page_num, textpage=None):
+    """Extract the vector words of a single fitz page (from textpage if it was already parsed from this page object)."""
+    page_text_with_location = []
+    words = page.get_text("words", textpage=textpage)
+    pad = _WORD_BBOX_PADDING
+    for word in words:
+        page_text_with_location.append({
+            "text": word[4],
+            "bbox": (word[0]-pad, word[1]-pad, word[2]+pad, word[3]+pad),
+            "page": page_num,
+            # PyMuPDF's block and line numbers, used by group_text_segments
+            "block": word[5],
+            "line": word[6],
+        })
+    metrics.inc("cad_words_extracted_total", len(page_text_with_location))
+    return page_text_with_location
+
+
+
+
+# ==============================================================================
+# FUNCTION TO GROUP WORDS INTO LINE / BLOCK SEGMENTS
+# ==============================================================================
+def group_text_segments(extracted_data, mode="block"):
+    """
+    Merge Chinese words that belong together into one segment, so a label
+    split by spaces or wrapped over several lines is translated as one unit.
+
+    - "line": neighbouring Chinese words of the same PyMuPDF line (same block
+      and line number) are merged when they sit on the same baseline and the
+      gap between them is at most about one character height.
+    - "block": additionally, consecutive Chinese lines of the same block are
+      merged when they are stacked closely (a wrapped note) with similar font sizes.
+    - "word": no grouping (the original word-by-word segments).
+
+    Words without Chinese are never merged and break a run, so English text
+    and dimensions next to a label (e.g. bilingual titles) stay untouched.
+    A merged segment gets the joined text and the union of the word bboxes;
+    a merge is skipped when that union would overlap any other text on the
+    page, since the renderer blanks the whole bbox before writing the translation.
+    Items without block/line numbers (table cells) are passed through as is.
+    """
+    if mode not in ("line", "block"):
+        return extracted_data
+
+    segments = []
+    words_by_block = {}
+    obstacles_by_page = {}
+    for index, item in enumerate(extracted_data):
+        obstacles_by_page.setdefault(item["page"], _BBoxGrid()).add(index, _inner_bbox(item))
+        if "block" not in item:
+            segments.append(item)
+            continue
+        words_by_block.setdefault((item["page"], item["block"]), []).append((index, item))
+
+    merged_words = 0
+    for block_words in words_by_block.values():
+        obstacles = obstacles_by_page[block_words[0][1]["page"]]
+        # [segment, bbox of its last word] per line run
+        lines = []
+        for index, item in block_words:
+            chinese = _is_likely_chinese(item["text"])
+            previous = lines[-1] if lines else None
+            if (chinese and previous is not None and previous[0]["chinese"]
+                    and previous[0]["line"] == item["line"] and _continues_line(previous[1], item["bbox"])
+                    and _union_is_clear(previous[0], item["bbox"], {index}, obstacles)):
+                _merge_into(previous[0], item)
+                previous[0]["members"].add(index)
+                previous[1] = item["bbox"]
+                merged_words += 1
+            else:
+                lines.append([dict(item, chinese=chinese, members={index}), item["bbox"]])
+
+        if mode == "block":
+            # [segment, bbox of its last line]
+            blocks = []
+            for segment, _ in lines:
+                line_bbox = segment["bbox"]
+                previous = blocks[-1] if blocks else None
+                if (segment["chinese"] and previous is not None and previous[0]["chinese"]
+                        and _continues_block(previous[1], line_bbox)
+                        and _union_is_clear(previous[0], line_bbox, segment["members"], obstacles)):
+                    _merge_into(previous[0], segment)
+                    previous[0]["members"] |= segment["members"]
+                    previous[1] = line_bbox
+                    merged_words += 1
+                else:
+                    blocks.append([segment, line_bbox])
+            lines = blocks
+
+        for segment, _ in lines:
+            for key in ("block", "line", "chinese", "members"):
+                segment.pop(key, None)
+            segments.append(segment)
+
+    metrics.inc("cad_words_merged_total", merged_words)
+    return segments
+
+
+def _merge_into(segment, item):
+    segment["text"] = _join_segment_text(segment["text"], item["text"])
+    a, b = segment["bbox"], item["bbox"]
+    segment["bbox"] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _union_is_clear(segment, bbox, members, obstacles):
+    """True if the union of segment and bbox overlaps no text outside the segment's and members' words."""
+    a = segment["bbox"]
+    union = _shrink((min(a[0], bbox[0]), min(a[1], bbox[1]), max(a[2], bbox[2]), max(a[3], bbox[3])))
+    own = segment["members"] | members
+    return not any(index not in own for index in obstacles.overlapping(union))
+
+
+def _inner_bbox(item):
+    """The text's own box: extracted words carry _WORD_BBOX_PADDING on every side, table cells do not."""
+    return _shrink(item["bbox"]) if "block" in item else tuple(item["bbox"])
+
+
+def _shrink(bbox):
+    pad = _WORD_BBOX_PADDING
+    return (bbox[0] + pad, bbox[1] + pad, bbox[2] - pad, bbox[3] - pad)
+
+
+class _BBoxGrid:
+    """Uniform grid over one page's text boxes, to find the boxes overlapping a rectangle."""
+
+    def __init__(self):
+        self._cells = {}
+        self._boxes = {}
+
+    def add(self, key, bbox):
+        self._boxes[key] = bbox
+        for cell in self._cells_of(bbox):
+            self._cells.setdefault(cell, []).append(key)
+
+    def overlapping(self, bbox):
+        """Keys of the boxes sharing a positive area with bbox."""
+        found = set()
+        for cell in self._cells_of(bbox):
+            for key in self._cells.get(cell, ()):
+                if key in found:
+                    continue
+                other = self._boxes[key]
+                if min(bbox[2], other[2]) > max(bbox[0], other[0]) and min(bbox[3], other[3]) > max(bbox[1], other[1]):
+                    found.add(key)
+        return found
+
+    @staticmethod
+    def _cells_of(bbox):
+        size = _OBSTACLE_GRID_SIZE
+        for x in range(math.floor(bbox[0] / size), math.floor(bbox[2] / size) + 1):
+            for y in range(math.floor(bbox[1] / size), math.floor(bbox[3] / size) + 1):
+                yield x, y
+
+
+def _join_segment_text(left, right):
+    """Chinese runs are joined directly (Chinese uses no spaces); anything else with one space."""
+    if _CJK_JOINABLE.match(right[:1]) and _CJK_JOINABLE.match(left[-1:]):
+        return left + right
+    return f"{left} {right}"
+
+
+def _text_height(bbox):
+    return max(bbox[3] - bbox[1] - 2 * _WORD_BBOX_PADDING, 0.1)
+
+
+def _similar_height(a, b):
+    ha, hb = _text_height(a), _text_height(b)
+    return max(ha, hb) / min(ha, hb) <= _MAX_HEIGHT_RATIO
+
+
+def _continues_line(previous_bbox, bbox):
+    """bbox is the next word on the same line as previous_bbox and close enough to it."""
+    if not _similar_height(previous_bbox, bbox):
+        return False
+    height = min(_text_height(previous_bbox), _text_height(bbox))
+    overlap = min(previous_bbox[3], bbox[3]) - max(previous_bbox[1], bbox[1]) - 2 * _WORD_BBOX_PADDING
+    if overlap < _MIN_VERTICAL_OVERLAP * height:
+        return False
+    gap = bbox[0] - previous_bbox[2] + 2 * _WORD_BBOX_PADDING
+    return -height <= gap <= _MAX_WORD_GAP * height
+
+
+def _continues_block(previous_bbox, bbox):
+    """bbox is a line wrapped directly below previous_bbox, overlapping it horizontally."""
+    if not _similar_height(previous_bbox, bbox):
+        return False
+    height = min(_text_height(previous_bbox), _text_height(bbox))
+    gap = bbox[1] - previous_bbox[3] + 2 * _WORD_BBOX_PADDING
+    overlaps_horizontally = min(previous_bbox[2], bbox[2]) > max(previous_bbox[0], bbox[0])
+    return overlaps_horizontally and -0.5 * height <= gap <= _MAX_LINE_GAP * height
 
 
 # ==============================================================================
@@ -44,71 +295,160 @@ def filter_chinese_text(extracted_data):
 # ==============================================================================
 def _is_likely_chinese(text):
     # ... (same as your original code)
-    chinese_chars = re.findall(r'[\u4e00-\u9fff]', text)
-    return len(chinese_chars) > 0
+    return _CHINESE_CHAR.search(text) is not None
 
 
 # ==============================================================================
 # FUNCTION TO EXTRACT ALL TABLE CELL TEXT FROM THE PDF
 # ==============================================================================
-def extract_table_cells(pdf_bytes, x1, y1, x2, y2):
-    extracted_cells = []
-    
-    # Open the PDF from bytes
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for page_num, page in enumerate(pdf.pages):
-
-            cropped_page = page.crop((x1, y1, x2, y2))
-
-            tables = cropped_page.find_tables()
-            for table in tables:
-                for row in table.rows:
-                    for cell_bbox in row.cells:
-                        if not cell_bbox:
-                            continue
-                        
-                        # Use the fix from Part 1
-                        cell_crop = page.crop(cell_bbox)
-                        text = cell_crop.extract_text(x_tolerance=2)
-
-                        if text:
-                            extracted_cells.append({
-                                "text": text.strip(),
-                                "bbox": (cell_bbox[0]+2, cell_bbox[1]+2, cell_bbox[2]-2, cell_bbox[3]-2),
-                                "page": page_num # pdfplumber pages are 0-indexed in a list
-                            })
+@contextlib.contextmanager
+def open_pdf_view(pdf_path):
+    """
+    Memory-map the source PDF read-only. The mapping is a seekable file
+    object backed by the OS page cache, so pdfplumber can parse the file
+    without it being read into (or copied around) Python memory.
+    """
+    with open(pdf_path, "rb") as f:
+        view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield view
+        finally:
+            view.close()
+
+
+def extract_table_cells(pdf_source, regions, pages=None):
+    """
+    Extract table cell text from several named regions in a single pdfplumber pass.
+
+    Inputs:
+    - pdf_source: the PDF as a path (memory-mapped), bytes or a readable binary file object
+    - regions: dict like {'bottom_right_table': (x1, y1, x2, y2)}
+    - pages: optional page numbers to search (e.g. the pages with Chinese text);
+      the other pages are never laid out
+
+    Each page is opened and laid out once; every region is cropped from that
+    same parse. Regions with the same bbox as an earlier one are skipped.
+
+    Output:
+    - dict {region_name: [cell dicts]} for every distinct region
+    """
+    unique_regions = unique_table_regions(regions)
+    extracted_cells = {name: [] for name in unique_regions}
+
+    if pages is not None and not pages:
+        return extracted_cells
+
+    if isinstance(pdf_source, str):
+        with open_pdf_view(pdf_source) as view:
+            return extract_table_cells(view, regions, pages)
+
+    if isinstance(pdf_source, (bytes, bytearray)):
+        pdf_source = io.BytesIO(pdf_source)
+
+    with pdfplumber.open(pdf_source) as pdf:
+        page_nums = range(len(pdf.pages)) if pages is None else sorted(pages)
+        for page_num in page_nums:
+            page_cells = extract_page_table_cells(pdf.pages[page_num], page_num, unique_regions)
+            for name, region_cells in page_cells.items():
+                extracted_cells[name].extend(region_cells)
+
     return extracted_cells
 
 
+def extract_page_table_cells(page, page_num, regions):
+    """
+    Extract the table cells of every region from one pdfplumber page.
+    The page is laid out once and its cached layout is released afterwards.
+    regions should already be de-duplicated with unique_table_regions().
+
+    Output:
+    - dict {region_name: [cell dicts]}
+    """
+    page_cells = {}
+    for name, region_bbox in regions.items():
+        page_cells[name] = _extract_region_cells(page, page_num, region_bbox)
+        metrics.inc("cad_table_cells_extracted_total", len(page_cells[name]))
+
+    # Drop this page's parsed layout objects before moving on
+    page.close()
+    return page_cells
+
+
+def unique_table_regions(regions):
+    """Keep the first name for each distinct bbox and drop the duplicates."""
+    unique = {}
+    seen_bboxes = {}
+    for name, region_bbox in regions.items():
+        region_bbox = tuple(region_bbox)
+        if region_bbox in seen_bboxes:
+            logger.info(f"Table region '{name}' is identical to '{seen_bboxes[region_bbox]}', skipping it.")
+            continue
+        seen_bboxes[region_bbox] = name
+        unique[name] = region_bbox
+    return unique
+
+
+def _extract_region_cells(page, page_num, region_bbox):
+    """Find the tables inside one region of an already parsed pdfplumber page."""
+    region_cells = []
+
+    # Clip the region to the page so smaller sheets don't fail the crop
+    x1, y1, x2, y2 = region_bbox
+    p_x0, p_y0, p_x1, p_y1 = page.bbox
+    clipped = (max(x1, p_x0), max(y1, p_y0), min(x2, p_x1), min(y2, p_y1))
+    if clipped[0] >= clipped[2] or clipped[1] >= clipped[3]:
+        return region_cells
+
+    cropped_page = page.crop(clipped)
+
+    tables = cropped_page.find_tables()
+    for table in tables:
+        for row in table.rows:
+            for cell_bbox in row.cells:
+                if not cell_bbox:
+                    continue
+                
+                # Use the fix from Part 1
+                cell_crop = page.crop(cell_bbox)
+                text = cell_crop.extract_text(x_tolerance=2)
+
+                if text:
+                    region_cells.append({
+                        "text": text.strip(),
+                        "bbox": (cell_bbox[0]+2, cell_bbox[1]+2, cell_bbox[2]-2, cell_bbox[3]-2),
+                        "page": page_num # pdfplumber pages are 0-indexed in a list
+                    })
+    return region_cells
+
+
 
 # ========================================================================================
 # FUNCTION TO FILTER OUT DOUBLY EXTRACTED TEXTS AND CREATE THE FINAL EXTRACTED TEXT LIST
 # ========================================================================================
 def final_extracted_text_list(table_text, all_text):
 
-    # 3. Create a lookup for all table cell bboxes by page
-    table_bboxes_by_page = {}
+    # 3. Build a spatial index of all table cell bboxes, one grid per page
+    table_cells_by_page = {}
 
 
     for cell in table_text:
         page_num = cell["page"]
-        if page_num not in table_bboxes_by_page:
-            table_bboxes_by_page[page_num] = []
-        table_bboxes_by_page[page_num].append(cell["bbox"])
+        if page_num not in table_cells_by_page:
+            table_cells_by_page[page_num] = []
+        table_cells_by_page[page_num].append(cell["bbox"])
+
+    cell_index_by_page = {
+        page_num: _CellGridIndex(cell_bboxes)
+        for page_num, cell_bboxes in table_cells_by_page.items()
+    }
 
     # 4. Filter the 'all_words' list
     final_text_list = []
     for word in all_text:
-        page_num = word["page"]
-        word_bbox = word["bbox"]
-        
+        cell_index = cell_index_by_page.get(word["page"])
+
         # Check if this word is inside ANY table cell on its page
-        is_in_table = False
-        if page_num in table_bboxes_by_page:
-            for table_cell_bbox in table_bboxes_by_page[page_num]:
-                if _is_bbox_inside(word_bbox, table_cell_bbox):
-                    is_in_table = True
-                    break
+        is_in_table = cell_index is not None and cell_index.contains(word["bbox"])
                     
         # 5. If the word is NOT in a table, add it to our final list
         if not is_in_table:
@@ -121,6 +461,59 @@ def final_extracted_text_list(table_text, all_text):
 
 
 
+# ========================================================================================
+# PRIVATE UNIFORM-GRID INDEX OVER THE TABLE CELLS OF ONE PAGE
+# ========================================================================================
+class _CellGridIndex:
+    """
+    Buckets cell bboxes into a uniform grid so a word only has to be checked
+    against the few cells near it instead of every cell on the page.
+
+    A word can only be inside a cell if the word's top-left corner lies within
+    the cell (plus tolerance), so each cell is registered in every grid square
+    its (tolerance-expanded) area touches and a lookup reads the single square
+    holding the word's top-left corner. Gives exactly the same answer as
+    checking _is_bbox_inside against every cell.
+    """
+
+    def __init__(self, cell_bboxes, tol=0.1):
+        self.cells = cell_bboxes
+        self.tol = tol
+        self.buckets = {}
+
+        valid = [b for b in cell_bboxes if b[2] - b[0] > -2 * tol and b[3] - b[1] > -2 * tol]
+        if not valid:
+            self.size = 1.0
+            return
+
+        # Size the squares to the average cell so each cell spans only a few of them
+        avg_w = sum(b[2] - b[0] for b in valid) / len(valid)
+        avg_h = sum(b[3] - b[1] for b in valid) / len(valid)
+        self.size = max(avg_w, avg_h, 1.0)
+
+        for cell_num, (x0, y0, x1, y1) in enumerate(cell_bboxes):
+            gx0, gy0 = self._square(x0 - tol, y0 - tol)
+            gx1, gy1 = self._square(x1 + tol, y1 + tol)
+            for gx in range(gx0, gx1 + 1):
+                for gy in range(gy0, gy1 + 1):
+                    self.buckets.setdefault((gx, gy), []).append(cell_num)
+
+    def _square(self, x, y):
+        return int(math.floor(x / self.size)), int(math.floor(y / self.size))
+
+    def contains(self, word_bbox):
+        """Return True if the word bbox lies inside any indexed cell."""
+        # Inverted word boxes break the corner argument; check them the slow way
+        if word_bbox[0] > word_bbox[2] or word_bbox[1] > word_bbox[3]:
+            return any(_is_bbox_inside(word_bbox, cell) for cell in self.cells)
+
+        for cell_num in self.buckets.get(self._square(word_bbox[0], word_bbox[1]), ()):
+            if _is_bbox_inside(word_bbox, self.cells[cell_num]):
+                return True
+        return False
+
+
+
 
 # ========================================================================================
 # PRIVATE FUNCTION TO CHECK IF AN EXTRACTED TEXT IS FROM TABLE TEXT
@@ -3,27 +3,211 @@
 # ==============================================================================
 
 
+import time
 import logging
 from model import model as translation_model
+from model.inference_service import InferenceService, RequestCancelledError
+from core import config
+from core import metrics
+from core import job_state
+from utils.translation_memory import get_translation_memory
 
 logger = logging.getLogger(__name__)
 
 
-def translate_chinese_to_english(chinese_text_data):
+def translate_chinese_to_english(chinese_text_data, stats=None, on_progress=None, job_id=None):
+    """
+    Translate all extracted Chinese items and attach the English text
+    to each original bbox/page entry.
+
+    Identical texts are collapsed into one work item before translation and
+    the result is fanned back out to every bbox/page it came from.
+    If a stats dict is given, the segment and saved-call counters are added to it.
+    on_progress(done, total) is called after every model batch.
+    With a job_id, the job's remaining model batches are dropped once it is
+    cancelled and job_state.JobCancelledError is raised.
+    """
+    unique_texts = list(dict.fromkeys(item["text"] for item in chinese_text_data))
+    english_by_text = dict(zip(unique_texts, translate_texts(unique_texts, stats=stats, on_progress=on_progress,
+                                                             job_id=job_id)))
+
+    metrics.inc("cad_segments_total", len(chinese_text_data), kind="extracted")
+    metrics.inc("cad_segments_total", len(unique_texts), kind="unique")
+
+    if stats is not None:
+        _add_stat(stats, "segments", len(chinese_text_data))
+        _add_stat(stats, "unique_segments", len(unique_texts))
+        _add_stat(stats, "dedup_saved_calls", len(chinese_text_data) - len(unique_texts))
+
     translated_data = []
-    for i, item in enumerate(chinese_text_data):
-        chinese_text = item["text"]
-        try:
-            input_ids = translation_model.tokenizer(chinese_text, return_tensors="pt").input_ids
-            translated_ids = translation_model.model.generate(input_ids, max_length=512)
-            english_text = translation_model.tokenizer.decode(translated_ids[0], skip_special_tokens=True).strip()
-        except Exception as e:
-            logger.error(f"Error translating '{chinese_text}'", exc_info=True)
-            english_text = ""
+    for item in chinese_text_data:
         translated_data.append({
-            "text": chinese_text,
+            "text": item["text"],
             "bbox": item["bbox"],
             "page": item["page"],
-            "english_translation": english_text
+            "english_translation": english_by_text[item["text"]]
         })
-    return translated_data
\ No newline at end of file
+    return translated_data
+
+
+def _add_stat(stats, key, value):
+    stats[key] = stats.get(key, 0) + value
+
+
+# ==============================================================================
+# TRANSLATION MEMORY LOOKUP + BATCHED INFERENCE ENGINE
+# ==============================================================================
+def translate_texts(texts, stats=None, on_progress=None, job_id=None):
+    """
+    Translate a list of strings, returning the English strings in the same order.
+
+    Texts already in the translation memory are answered from the cache;
+    only the misses go to the model, and their results are stored back.
+    The misses are queued on the shared inference service, which may batch
+    them together with other jobs' segments.
+    """
+    if not texts:
+        return []
+
+    # The memory is keyed by model id, which is only final once the model has loaded
+    translation_model.wait_until_ready()
+    memory = get_translation_memory(translation_model.model_id)
+    if memory is None:
+        if stats is not None:
+            _add_stat(stats, "model_segments", len(texts))
+        return _translate_on_service(texts, on_progress, job_id)
+
+    cached = memory.get_many(texts)
+    missing = [text for text in texts if text not in cached]
+    metrics.inc("cad_translation_memory_lookups_total", len(texts))
+    metrics.inc("cad_translation_memory_hits_total", len(texts) - len(missing))
+
+    if stats is not None:
+        _add_stat(stats, "cache_hits", len(texts) - len(missing))
+        _add_stat(stats, "model_segments", len(missing))
+
+    if missing:
+        new_translations = dict(zip(missing, _translate_on_service(missing, on_progress, job_id)))
+        memory.put_many(new_translations)
+        cached.update(new_translations)
+
+    return [cached[text] for text in texts]
+
+
+def _translate_on_service(texts, on_progress, job_id):
+    """Run texts through the inference service, which stops on the job's cancellation."""
+    is_cancelled = (lambda: job_state.is_cancel_requested(job_id)) if job_id else None
+    try:
+        return inference_service.translate(texts, on_progress=on_progress, is_cancelled=is_cancelled)
+    except RequestCancelledError:
+        raise job_state.JobCancelledError(f"Job {job_id} was cancelled.") from None
+
+
+def _translate_batched(texts, on_batch=None, filter_batch=None, batch_size=None, max_batch_tokens=None):
+    """
+    Translate a list of strings with one generate() call per batch.
+
+    Segments are sorted by token length so each padded batch holds similar
+    lengths. Results are returned in the same order as the input. If a batch
+    fails, its segments are retried one by one so a single bad segment only
+    blanks its own translation. on_batch(indices) is called after each batch;
+    filter_batch(indices), if given, can drop indices before a batch runs.
+
+    Runs on the inference service's worker thread.
+    """
+    batch_size = batch_size or config.TRANSLATION_BATCH_SIZE
+    max_batch_tokens = max_batch_tokens or config.TRANSLATION_MAX_BATCH_TOKENS
+
+    results = [""] * len(texts)
+    if not texts:
+        return results
+
+    # Jobs submitted while the model is still warming up wait here
+    translation_model.wait_until_ready()
+
+    lengths = _token_lengths(texts)
+    for batch in _make_batches(lengths, batch_size, max_batch_tokens):
+        if filter_batch is not None:
+            batch = filter_batch(batch)
+            if not batch:
+                continue
+        batch_texts = [texts[i] for i in batch]
+        start = time.perf_counter()
+        try:
+            outputs = _generate_batch(batch_texts)
+        except Exception:
+            logger.warning(f"Batch of {len(batch_texts)} segments failed, retrying one by one.", exc_info=True)
+            outputs = [_translate_single(text) for text in batch_texts]
+        metrics.record_model_batch(len(batch), sum(lengths[i] for i in batch), time.perf_counter() - start)
+
+        for index, english_text in zip(batch, outputs):
+            results[index] = english_text
+
+        if on_batch is not None:
+            on_batch(batch)
+
+    return results
+
+
+def _token_lengths(texts):
+    """Return the tokenized length of every text, used to sort and size batches."""
+    try:
+        encoded = translation_model.tokenizer(texts)["input_ids"]
+        return [len(ids) for ids in encoded]
+    except Exception:
+        logger.warning("Bulk tokenization failed, measuring segments individually.", exc_info=True)
+
+    lengths = []
+    for text in texts:
+        try:
+            lengths.append(len(translation_model.tokenizer(text)["input_ids"]))
+        except Exception:
+            lengths.append(len(text))
+    return lengths
+
+
+def _make_batches(lengths, batch_size, max_batch_tokens):
+    """
+    Group segment indices into batches sorted by length.
+
+    A batch is closed when it reaches batch_size, or when adding the next
+    (longest so far) segment would push the padded size over max_batch_tokens.
+    A segment that alone exceeds the budget still gets a batch of its own.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+
+    batches = []
+    current = []
+    for index in order:
+        padded_size = (len(current) + 1) * lengths[index]
+        if current and (len(current) >= batch_size or padded_size > max_batch_tokens):
+            batches.append(current)
+            current = []
+        current.append(index)
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _generate_batch(batch_texts):
+    """Run a single padded generate() call for a batch of texts."""
+    return translation_model.generate_batch(batch_texts, config.TRANSLATION_MAX_LENGTH)
+
+
+# The single worker that runs the model for every job, merging segments
+# from concurrent jobs into shared batches
+inference_service = InferenceService(
+    _translate_batched,
+    max_wait_seconds=config.INFERENCE_MAX_WAIT_MS / 1000,
+    max_segments=config.INFERENCE_COALESCE_MAX_SEGMENTS,
+)
+
+
+def _translate_single(chinese_text):
+    """Translate one text on its own, blanking it if the model fails."""
+    try:
+        return translation_model.generate_batch([chinese_text], config.TRANSLATION_MAX_LENGTH)[0]
+    except Exception:
+        logger.error(f"Error translating '{chinese_text}'", exc_info=True)
+        return ""
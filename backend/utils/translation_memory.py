@@ -0,0 +1,221 @@
+# ==============================================================================
+# TRANSLATION MEMORY (CACHE) FILE
+# ==============================================================================
+import os
+import re
+import time
+import sqlite3
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from core import config
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_source_text(text):
+    """
+    Normalize a source string for cache lookups: NFKC (full-width to
+    half-width forms), trimmed, with internal whitespace collapsed.
+    """
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+# ==============================================================================
+# TWO-TIER TRANSLATION MEMORY
+# ==============================================================================
+class TranslationMemory:
+    """
+    Translation cache with an in-process LRU tier in front of an on-disk
+    SQLite tier. Entries are keyed by normalized source text and model id,
+    so translations made by a different model are never returned.
+    """
+
+    def __init__(self, model_id, db_path=None, memory_size=None, disk_max_entries=None):
+        self.model_id = model_id or "unknown"
+        self.memory_size = memory_size or config.TRANSLATION_MEMORY_SIZE
+        self.disk_max_entries = disk_max_entries or config.TRANSLATION_MEMORY_DISK_MAX_ENTRIES
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if db_path:
+            try:
+                self._conn = self._open_database(db_path)
+            except Exception:
+                logger.warning(f"Could not open translation memory at {db_path}. Using the in-memory tier only.", exc_info=True)
+                self._conn = None
+
+    @staticmethod
+    def _open_database(db_path):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS translations (
+                   model_id TEXT NOT NULL,
+                   source TEXT NOT NULL,
+                   translation TEXT NOT NULL,
+                   last_used REAL NOT NULL,
+                   PRIMARY KEY (model_id, source)
+               )"""
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations(last_used)")
+        conn.commit()
+        return conn
+
+    def get_many(self, texts):
+        """
+        Look up a list of source texts.
+        Returns a dict {text: translation} containing only the cache hits.
+        """
+        found = {}
+        missing_keys = {}
+
+        with self._lock:
+            for text in texts:
+                key = normalize_source_text(text)
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    found[text] = self._lru[key]
+                    self.memory_hits += 1
+                else:
+                    missing_keys.setdefault(key, []).append(text)
+
+            if missing_keys and self._conn is not None:
+                disk_found = self._read_disk(list(missing_keys))
+                for key, translation in disk_found.items():
+                    self._remember(key, translation)
+                    for text in missing_keys.pop(key):
+                        found[text] = translation
+                        self.disk_hits += 1
+
+            self.misses += sum(len(group) for group in missing_keys.values())
+
+        return found
+
+    def put_many(self, translations):
+        """Store {text: translation} pairs. Blank translations are not cached."""
+        rows = []
+        now = time.time()
+
+        with self._lock:
+            for text, translation in translations.items():
+                if not translation:
+                    continue
+                key = normalize_source_text(text)
+                self._remember(key, translation)
+                rows.append((self.model_id, key, translation, now))
+
+            if rows and self._conn is not None:
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO translations (model_id, source, translation, last_used) VALUES (?, ?, ?, ?)",
+                        rows
+                    )
+                    self._evict_disk()
+                    self._conn.commit()
+                except sqlite3.Error:
+                    logger.warning("Failed to write to the translation memory database.", exc_info=True)
+
+    def stats(self):
+        """Return the hit/miss counters and current tier sizes."""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._lru),
+                "disk_entries": self._count_disk(),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ------------------------------------------------------------------
+    # Private helpers (callers must hold self._lock)
+    # ------------------------------------------------------------------
+    def _remember(self, key, translation):
+        self._lru[key] = translation
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_size:
+            self._lru.popitem(last=False)
+
+    def _read_disk(self, keys):
+        found = {}
+        try:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT source, translation FROM translations WHERE model_id = ? AND source IN ({placeholders})",
+                    [self.model_id, *chunk]
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE translations SET last_used = ? WHERE model_id = ? AND source = ?",
+                    [(now, self.model_id, key) for key in found]
+                )
+                self._conn.commit()
+        except sqlite3.Error:
+            logger.warning("Failed to read from the translation memory database.", exc_info=True)
+        return found
+
+    def _evict_disk(self):
+        excess = self._count_disk() - self.disk_max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM translations WHERE rowid IN (SELECT rowid FROM translations ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+            logger.info(f"Translation memory: evicted {excess} least recently used entries.")
+
+    def _count_disk(self):
+        if self._conn is None:
+            return 0
+        try:
+            return self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+
+# ==============================================================================
+# SHARED INSTANCE
+# ==============================================================================
+_memories = {}
+_memory_lock = threading.Lock()
+
+
+def get_translation_memory(model_id):
+    """
+    Return the process-wide translation memory for the given model, or None
+    if the cache is disabled in the config or the model id is not known yet.
+    """
+    if not config.TRANSLATION_MEMORY_ENABLED or model_id is None:
+        return None
+
+    with _memory_lock:
+        # Memories of other models stay open: another thread may still be reading one
+        memory = _memories.get(model_id)
+        if memory is None:
+            memory = _memories[model_id] = TranslationMemory(model_id, db_path=config.TRANSLATION_MEMORY_PATH)
+        return memory
@@ -0,0 +1,184 @@
+# ==============================================================================
+# UPLOAD SPOOLING (STREAMING MULTIPART -> FILES ON DISK)
+# ==============================================================================
+# Lets clients on other machines send their PDFs instead of local paths.
+# The raw multipart/form-data body is fed to python-multipart's push parser
+# chunk by chunk as it arrives; every file part is written straight to the
+# job's spool directory and hashed (SHA-256) on the way, so no upload is ever
+# held in memory and the hash is ready for the result cache once it ends.
+import os
+import re
+import ntpath
+import hashlib
+import logging
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+
+from core import config
+
+logger = logging.getLogger(__name__)
+
+# Characters Windows does not allow in file names (":" would also select a drive or stream)
+_RESERVED_CHARS = re.compile(r'[<>:"|?*\x00-\x1f]')
+_RESERVED_NAMES = {"con", "prn", "aux", "nul", *(f"com{i}" for i in range(1, 10)), *(f"lpt{i}" for i in range(1, 10))}
+
+
+class UploadError(Exception):
+    """The request body is not a usable multipart upload of PDF files."""
+
+
+class PdfUploadSpooler:
+    """
+    Writes the PDF parts of one multipart/form-data body into spool_dir.
+
+    feed() takes the next chunk of the body and returns the files whose
+    upload finished inside it, as (path, sha256 hex digest, size) tuples,
+    so the caller can start on each file while the rest is still arriving.
+    Parts without a filename (plain form fields) are ignored.
+    """
+
+    def __init__(self, content_type: str, spool_dir: str, max_file_bytes: int = 0):
+        mime_type, options = parse_options_header(content_type or "")
+        boundary = options.get(b"boundary")
+        if mime_type != b"multipart/form-data" or not boundary:
+            raise UploadError("Expected a multipart/form-data upload.")
+
+        self.spool_dir = spool_dir
+        self.max_file_bytes = max_file_bytes
+        self.files = []
+
+        self._finished = []
+        self._used_names = set()
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+        self._file = None
+        self._path = None
+        self._digest = None
+        self._size = 0
+        self._ended = False
+
+        self._parser = MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+            "on_end": self._on_end,
+        })
+
+    def feed(self, chunk: bytes):
+        """Parse the next chunk of the body; returns the files completed by it."""
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            raise UploadError(f"The upload is not valid multipart data: {e}") from e
+        finished, self._finished = self._finished, []
+        return finished
+
+    def finish(self):
+        """Check that the whole body arrived and held at least one PDF."""
+        if not self._ended:
+            raise UploadError("The upload ended before the multipart body was complete.")
+        if not self.files:
+            raise UploadError("The upload did not contain any PDF files.")
+
+    def abort(self):
+        """Close and delete the file being written, e.g. after the client disconnected."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            if os.path.exists(self._path):
+                os.remove(self._path)
+
+    # --- python-multipart callbacks ---
+    def _on_part_begin(self):
+        self._headers = {}
+
+    def _on_header_field(self, data, start, end):
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def _on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        if filename is None:
+            return
+
+        name = _safe_pdf_name(filename.decode("utf-8", "replace"))
+        if name is None:
+            raise UploadError(f"Only PDF files can be uploaded, got {filename.decode('utf-8', 'replace')!r}.")
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._path = os.path.join(self.spool_dir, self._unique_name(name))
+        # Last line of defence: the file must end up directly inside the spool folder
+        spool_dir = os.path.realpath(self.spool_dir)
+        if os.path.dirname(os.path.realpath(self._path)) != spool_dir:
+            raise UploadError(f"Invalid upload file name {filename.decode('utf-8', 'replace')!r}.")
+        self._file = open(self._path, "wb")
+        self._digest = hashlib.sha256()
+        self._size = 0
+
+    def _on_part_data(self, data, start, end):
+        if self._file is None:
+            return
+        chunk = data[start:end]
+        self._size += len(chunk)
+        if self.max_file_bytes and self._size > self.max_file_bytes:
+            raise UploadError(f"{os.path.basename(self._path)} is larger than the "
+                              f"{self.max_file_bytes // (1024 * 1024)} MB upload limit.")
+        self._file.write(chunk)
+        self._digest.update(chunk)
+
+    def _on_part_end(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        entry = (self._path, self._digest.hexdigest(), self._size)
+        self.files.append(entry)
+        self._finished.append(entry)
+        logger.debug(f"Spooled upload {self._path} ({self._size} bytes).")
+
+    def _on_end(self):
+        self._ended = True
+
+    def _unique_name(self, name):
+        # Keep the client's file name (it becomes the zip entry name) unless it repeats
+        base, ext = os.path.splitext(name)
+        candidate, counter = name, 1
+        while candidate.lower() in self._used_names:
+            counter += 1
+            candidate = f"{base}_{counter}{ext}"
+        self._used_names.add(candidate.lower())
+        return candidate
+
+
+def _safe_pdf_name(filename: str):
+    """
+    Base name of a client-supplied file name with a lower-case .pdf extension,
+    or None if it is not a PDF or not a safe Windows file name.
+    """
+    # Clients may send full Windows or POSIX paths, with a drive ("C:evil.pdf") or UNC prefix
+    _, name = ntpath.splitdrive(filename.replace("/", "\\"))
+    name = name.rsplit("\\", 1)[-1].strip()
+    base, ext = os.path.splitext(name)
+    if ext.lower() != ".pdf" or not base or base.strip(" .") == "":
+        return None
+    if _RESERVED_CHARS.search(name) or base.rstrip(" .").split(".")[0].lower() in _RESERVED_NAMES:
+        return None
+    return base + ".pdf"
+
+
+def job_spool_dir(job_id: str) -> str:
+    return os.path.join(config.UPLOAD_SPOOL_DIR, job_id)
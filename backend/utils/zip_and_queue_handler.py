@@ -2,55 +2,75 @@ import logging
 import zipfile
 import asyncio
 import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
 from core import job_state as job_state
-from services.pdf_translator import run_translation_task
+from core import config
+from core.metrics import stage_timer
+from services.pdf_translator import (
+    run_translation_task, extract_chinese_segments, translate_segments, render_translated_pdf, fetch_cached_result,
+    store_cached_result
+)
+from utils.translation import inference_service
 
 logger = logging.getLogger(__name__)
 
+# Shared process pool for the concurrent mode, created on first use.
+# Extraction/rendering run in worker processes; every model call from every
+# file goes through the shared inference service, which batches their segments together.
+_process_pool = None
+
 # Function to handle serial processing of selected PDFs
 async def start_serial_processing(pdf_list: list, job_id: str):
 
     processed_pdf_paths = []
 
-    job_state.create_job(job_id)
+    # The job record is created by the API endpoint before this task starts
     # jobs[job_id] = {"status": "starting", "result_path": None, "error": None}
 
-    logger.info(f"Job {job_id}: Created.")
-
     logger.info("Starting serial translation task...")
 
+    zip_file = result_zip_path(job_id)
+    zip_writer = None
+
     try:
+        # Each translated file is added to the zip as soon as it is done
+        zip_writer = IncrementalZipWriter(job_id, zip_file)
+
         for file_path in pdf_list:
 
+            job_state.raise_if_cancelled(job_id)
             output_path = await asyncio.to_thread(run_translation_task, job_id, file_path)
 
-            processed_pdf_paths.append(output_path)
+            # run_translation_task has already marked the job as failed; the
+            # whole job stops at the first file that could not be translated
+            if output_path is None:
+                job = job_state.get_job(job_id) or {}
+                raise RuntimeError(job.get("error") or f"Translation failed for {file_path}.")
 
-        
-        # ZIP_DIR = "output_zips"
-        # os.makedirs(ZIP_DIR, exist_ok=True)
-        # zip_file_path = os.path.join(ZIP_DIR, f"{job_id}.zip")
-
-        zip_file = f"{job_id}.zip"
-
-        logger.info(f"Job {job_id}: Zipping {len(processed_pdf_paths)} files...")
-
-        with zipfile.ZipFile(zip_file, 'w') as zf:
-            for file_path in processed_pdf_paths:
-
-                file_name = os.path.basename(file_path)
-                zf.write(file_path, arcname=file_name)
+            processed_pdf_paths.append(output_path)
+            await asyncio.to_thread(zip_writer.add, output_path)
 
+        await asyncio.to_thread(zip_writer.close)
 
         logger.info(f"Zip file {zip_file} created successfully")
 
         job_state.set_job_result(job_id, zip_file)
         # logger.info(f"Job {job_id}: Processing complete. Result at {output_path}")
 
+    except job_state.JobCancelledError:
+        logger.info(f"Job {job_id}: Serial processing cancelled.")
+        job_state.mark_job_cancelled(job_id)
+        if zip_writer is not None:
+            zip_writer.discard()
+
     except Exception as e:
         logger.error(f"Job {job_id}: Serial processing FAILED.", exc_info=True)
         job_state.update_job_status(job_id, "error", error=str(e))
+        if zip_writer is not None:
+            zip_writer.discard()
         
     finally:
         # 4. THIS IS THE 'finally' BLOCK YOU NEED
@@ -66,6 +86,261 @@ async def start_serial_processing(pdf_list: list, job_id: str):
 
 
 
+# Function to handle concurrent processing of selected PDFs
+async def start_concurrent_processing(pdf_list: list, job_id: str):
+
+    job_state.init_file_progress(job_id, pdf_list)
+
+    logger.info(f"Starting concurrent translation task ({config.PARALLEL_FILES} files at a time)...")
+
+    async def _files():
+        for index, file_path in enumerate(pdf_list):
+            yield index, file_path, None
+
+    await _run_file_pipelines(job_id, _files())
+
+
+# Function to handle PDFs uploaded to the server, each started as soon as it has arrived
+async def start_upload_processing(job_id: str, incoming: asyncio.Queue, upload_dir: str):
+    """
+    incoming receives a (path, sha256, size) tuple for every uploaded file as
+    its upload finishes, and None once the upload is over. The spool folder
+    (uploads and their translated outputs) is removed when the job ends.
+    """
+    logger.info(f"Starting upload translation task ({config.PARALLEL_FILES} files at a time)...")
+
+    async def _files():
+        while True:
+            item = await incoming.get()
+            if item is None:
+                return
+            file_path, file_hash, _ = item
+            yield job_state.add_file_progress(job_id, file_path), file_path, file_hash
+
+    try:
+        await _run_file_pipelines(job_id, _files())
+    finally:
+        await asyncio.to_thread(shutil.rmtree, upload_dir, True)
+
+
+async def _run_file_pipelines(job_id: str, files):
+    """
+    Run every (index, path, file_hash) from the async iterable files through
+    _process_single_file, PARALLEL_FILES at a time, starting each as soon as
+    it is yielded, then finish the job's zip.
+    """
+    processed_pdf_paths = []
+
+    zip_file = result_zip_path(job_id)
+    zip_writer = None
+
+    try:
+        job_state.update_job_status(job_id, "processing")
+        semaphore = asyncio.Semaphore(max(1, config.PARALLEL_FILES))
+
+        # Files are added to the zip in the order they finish
+        zip_writer = IncrementalZipWriter(job_id, zip_file)
+
+        tasks = []
+        async for index, file_path, file_hash in files:
+            tasks.append(asyncio.create_task(
+                _process_single_file(job_id, index, file_path, semaphore, zip_writer, file_hash)
+            ))
+
+        results = await asyncio.gather(*tasks)
+        processed_pdf_paths = [path for path in results if path]
+        job_state.raise_if_cancelled(job_id)
+
+        if not processed_pdf_paths:
+            raise RuntimeError("None of the selected files could be translated.")
+
+        # Keep the successful files, but surface that some of the package failed
+        failed_count = len(tasks) - len(processed_pdf_paths)
+        job_state.update_job_status(
+            job_id, "zipping",
+            error=f"{failed_count} file(s) failed, see per-file errors." if failed_count else None
+        )
+
+        await asyncio.to_thread(zip_writer.close)
+
+        logger.info(f"Zip file {zip_file} created successfully ({len(processed_pdf_paths)} of {len(tasks)} files)")
+
+        job_state.set_job_result(job_id, zip_file)
+
+    except job_state.JobCancelledError:
+        logger.info(f"Job {job_id}: Concurrent processing cancelled.")
+        job_state.mark_job_cancelled(job_id)
+        if zip_writer is not None:
+            zip_writer.discard()
+
+    except Exception as e:
+        logger.error(f"Job {job_id}: Concurrent processing FAILED.", exc_info=True)
+        job_state.update_job_status(job_id, "error", error=str(e))
+        if zip_writer is not None:
+            zip_writer.discard()
+
+    finally:
+        logger.info(f"Job {job_id}: Cleaning up intermediate files...")
+        for path in processed_pdf_paths:
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                    logger.debug(f"Job {job_id}: Removed {path}")
+                except Exception as e:
+                    logger.error(f"Job {job_id}: Failed to remove {path}. {e}")
+
+
+async def _process_single_file(job_id: str, file_index: int, pdf_path: str, semaphore: asyncio.Semaphore,
+                               zip_writer: "IncrementalZipWriter", file_hash: str = None):
+    """
+    Run one file through extract -> translate -> render and add it to the job's zip.
+    file_hash may carry the file's SHA-256 when it is already known (uploads).
+    Errors are recorded on the file's own progress entry and never raised,
+    so one bad file does not abort the others. Once the job is cancelled,
+    files stop at their next stage boundary and are marked "cancelled".
+    """
+    loop = asyncio.get_running_loop()
+    # Extraction and rendering run in a worker process, so each is timed here as one stage
+    timings = {}
+
+    async with semaphore:
+        try:
+            job_state.raise_if_cancelled(job_id)
+            logger.info(f"Job {job_id}: Starting processing for {pdf_path}")
+            output_path = pdf_path.replace(".pdf", "_translated.pdf")
+
+            cache_hit, file_hash = await asyncio.to_thread(fetch_cached_result, job_id, pdf_path, output_path, file_hash)
+            if cache_hit:
+                await asyncio.to_thread(zip_writer.add, output_path)
+                job_state.update_file_status(job_id, file_index, "cached")
+                return output_path
+
+            job_state.update_file_status(job_id, file_index, "extracting")
+            with stage_timer("extract", timings):
+                chinese_text_data = await loop.run_in_executor(_get_process_pool(), extract_chinese_segments, pdf_path)
+
+            if not chinese_text_data:
+                raise ValueError("No Chinese text found in the document.")
+
+            job_state.raise_if_cancelled(job_id)
+            job_state.update_file_status(job_id, file_index, "translating")
+            enriched_data, legend_terms = await asyncio.to_thread(
+                translate_segments, job_id, pdf_path, chinese_text_data, timings
+            )
+
+            job_state.raise_if_cancelled(job_id)
+            job_state.update_file_status(job_id, file_index, "creating_pdf")
+            with stage_timer("render", timings):
+                await loop.run_in_executor(
+                    _get_process_pool(), render_translated_pdf, pdf_path, enriched_data, legend_terms, output_path
+                )
+
+            await asyncio.to_thread(store_cached_result, file_hash, output_path)
+            await asyncio.to_thread(zip_writer.add, output_path)
+
+            job_state.update_file_status(job_id, file_index, "complete")
+            return output_path
+
+        except job_state.JobCancelledError:
+            # Every check comes before rendering, so there is no output file to remove
+            job_state.update_file_status(job_id, file_index, "cancelled")
+            return None
+
+        except Exception as e:
+            logger.error(f"Job {job_id}: Processing failed for {pdf_path}.", exc_info=True)
+            job_state.update_file_status(job_id, file_index, "error", error=str(e))
+            return None
+
+        finally:
+            if timings:
+                job_state.update_job_timings(job_id, timings)
+
+
+def result_zip_path(job_id: str) -> str:
+    """Where the job's result zip is written (under RESULT_ZIP_DIR)."""
+    os.makedirs(config.RESULT_ZIP_DIR, exist_ok=True)
+    return os.path.join(config.RESULT_ZIP_DIR, f"{job_id}.zip")
+
+
+class IncrementalZipWriter:
+    """
+    Builds a job's result zip one file at a time, as each file finishes.
+
+    zipfile writes every entry (local header + data) in full before returning,
+    so after each add() the bytes up to the current file offset never change.
+    That offset is published as the job's zip committed_bytes, and the
+    streaming download endpoint may send everything before it while later
+    files are still being processed. close() writes the central directory.
+    """
+
+    def __init__(self, job_id: str, zip_path: str):
+        self.job_id = job_id
+        self.zip_path = zip_path
+        self.entries = 0
+        self._lock = threading.Lock()
+        self._timings = {}
+        self._zip = zipfile.ZipFile(zip_path, 'w', **_zip_compression_options())
+        job_state.update_job_zip(job_id, zip_path, committed_bytes=0, entries=0, finished=False)
+
+    def add(self, file_path: str):
+        with self._lock, stage_timer("zip", self._timings):
+            self._zip.write(file_path, arcname=os.path.basename(file_path))
+            self._zip.fp.flush()
+            committed = self._zip.fp.tell()
+            self.entries += 1
+            entries = self.entries
+        job_state.update_job_zip(self.job_id, self.zip_path, committed_bytes=committed, entries=entries, finished=False)
+
+    def close(self):
+        with self._lock, stage_timer("zip", self._timings):
+            self._zip.close()
+        job_state.update_job_timings(self.job_id, self._timings)
+        job_state.update_job_zip(
+            self.job_id, self.zip_path, committed_bytes=os.path.getsize(self.zip_path),
+            entries=self.entries, finished=True
+        )
+
+    def discard(self):
+        """Close and delete a zip whose job failed."""
+        with self._lock:
+            try:
+                self._zip.close()
+            except Exception:
+                pass
+        try:
+            if os.path.exists(self.zip_path):
+                os.remove(self.zip_path)
+            job_state.clear_job_zip(self.job_id)
+        except OSError:
+            # e.g. still open by a streaming download on Windows; removed when the job expires
+            logger.warning(f"Job {self.job_id}: Could not remove the discarded zip {self.zip_path}.")
+
+
+def _zip_compression_options():
+    """zipfile arguments for the configured ZIP_COMPRESSION / ZIP_COMPRESSION_LEVEL."""
+    if config.ZIP_COMPRESSION == "deflated":
+        return {"compression": zipfile.ZIP_DEFLATED, "compresslevel": config.ZIP_COMPRESSION_LEVEL}
+    if config.ZIP_COMPRESSION != "stored":
+        logger.warning(f"Unknown ZIP_COMPRESSION '{config.ZIP_COMPRESSION}', storing files uncompressed.")
+    return {"compression": zipfile.ZIP_STORED}
+
+
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=config.PROCESS_POOL_WORKERS)
+    return _process_pool
+
+
+def shutdown_executors():
+    """Stop the worker pool and the inference worker. Called when the server shuts down."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    inference_service.stop()
+
+
 async def cleanup_zip_file(zip_path: str):
     
     try:
@@ -0,0 +1,288 @@
+# ==============================================================================
+# END-TO-END PIPELINE BENCHMARK ON SYNTHETIC CAD DRAWINGS
+# ==============================================================================
+# Generates CAD-like PDFs (scattered Chinese labels, English notes, dimension
+# numbers and a ruled title-block table), then runs every file through
+# run_translation_task and adds it to the result zip with IncrementalZipWriter,
+# the same code path as a serial job. The per-stage timings are the ones the
+# pipeline itself records in the job:
+#
+#   cjk_scan -> extract -> table_cells -> dedup_filter -> group -> translate -> prepare
+#   -> render -> legend -> assemble -> zip
+#
+# By default the translation model is replaced by a deterministic stub so the
+# benchmark runs offline and measures the pipeline, not the model. Results
+# can be written as JSON and compared between commits.
+#
+# Usage:  python benchmarks/bench_pipeline.py [--pages 4] [--files 2] [--words 400]
+#             [--cjk-ratio 0.6] [--english-pages 0.0] [--page-size A3] [--title-blocks 1] [--real-model] [--json out.json]
+import os
+import sys
+import json
+import time
+import uuid
+import zlib
+import random
+import argparse
+import platform
+import tempfile
+import statistics
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+import fitz
+
+from core import config
+from core import job_state
+from model import model as translation_model
+from services.pdf_translator import run_translation_task
+from utils.zip_and_queue_handler import IncrementalZipWriter
+
+STAGES = ["cjk_scan", "extract", "table_cells", "dedup_filter", "group", "translate", "prepare", "render", "legend", "assemble", "zip"]
+
+# Landscape sizes in points
+PAGE_SIZES = {"A4": (842, 595), "A3": (1191, 842), "A2": (1684, 1191), "A1": (2384, 1684)}
+
+# Labels typical of Chinese engineering drawings; drawings repeat them a lot
+CJK_LABELS = [
+    "材料", "比例", "图号", "重量", "数量", "名称", "备注", "设计", "校对", "审核",
+    "批准", "日期", "版本", "单位", "序号", "代号", "标准件", "外购件", "螺栓", "螺母",
+    "垫圈", "轴承", "法兰", "密封圈", "不锈钢板", "碳钢", "铝合金", "技术要求", "剖视图",
+    "局部放大图", "未注倒角C1", "未注圆角R2", "表面粗糙度Ra3.2", "焊接后去毛刺",
+    "所有焊缝均为连续焊", "未注公差按GB/T1804-m", "表面喷漆 颜色见订单", "安装前清洗干净",
+    "装配时注意轴承方向", "管道试验压力1.5MPa", "本图尺寸单位为毫米", "热处理 调质HB220-250",
+]
+LATIN_LABELS = ["DETAIL", "SECTION", "NOTE", "REV", "SCALE", "QTY", "ITEM", "M12", "Ø25", "R5", "2x45°", "THK"]
+
+# Stub output vocabulary, so stub translations have realistic lengths
+_STUB_WORDS = ["steel", "plate", "bolt", "surface", "treatment", "weld", "bearing", "flange",
+               "assembly", "drawing", "tolerance", "finish", "section", "detail", "seal", "washer"]
+
+
+# ==============================================================================
+# SYNTHETIC DRAWINGS
+# ==============================================================================
+def make_synthetic_pdf(path, rng, pages, page_size, words_per_page, cjk_ratio, title_blocks, english_pages=0.0):
+    """Write a CAD-like PDF to path. A share english_pages of the sheets has no Chinese at all."""
+    width, height = page_size
+    doc = fitz.open()
+
+    for _ in range(pages):
+        english_only = rng.random() < english_pages
+        page = doc.new_page(width=width, height=height)
+        shape = page.new_shape()
+
+        # Drawing frame and a few "geometry" lines
+        shape.draw_rect(fitz.Rect(20, 20, width - 20, height - 20))
+        for _ in range(20):
+            shape.draw_line((rng.uniform(40, width - 40), rng.uniform(40, height - 40)),
+                            (rng.uniform(40, width - 40), rng.uniform(40, height - 40)))
+        shape.finish(color=(0, 0, 0), width=0.5)
+
+        if title_blocks:
+            _draw_title_block(page, rng, config.TABLE_REGIONS, title_blocks, LATIN_LABELS if english_only else CJK_LABELS[:20])
+
+        for _ in range(words_per_page):
+            point = fitz.Point(rng.uniform(40, width - 200), rng.uniform(40, height - 40))
+            if not english_only and rng.random() < cjk_ratio:
+                page.insert_text(point, rng.choice(CJK_LABELS), fontname="china-s", fontsize=rng.choice([3, 5, 7, 10]))
+            elif rng.random() < 0.5:
+                page.insert_text(point, rng.choice(LATIN_LABELS), fontname="helv", fontsize=rng.choice([5, 7, 10]))
+            else:
+                page.insert_text(point, f"{rng.uniform(1, 5000):.1f}", fontname="helv", fontsize=rng.choice([5, 7]))
+
+        shape.commit()
+
+    doc.save(path)
+    doc.close()
+
+
+def _draw_title_block(page, rng, regions, count, labels):
+    """Draw a ruled label/value table in the first `count` distinct table regions."""
+    drawn = set()
+    for region in regions.values():
+        if len(drawn) >= count or region in drawn:
+            continue
+        drawn.add(region)
+
+        rect = fitz.Rect(region) & page.rect
+        rect = fitz.Rect(rect.x0 + 5, rect.y0 + 5, rect.x1 - 5, rect.y1 - 5)
+        if rect.is_empty:
+            continue
+
+        rows, cols = 5, 4
+        cell_w, cell_h = rect.width / cols, rect.height / rows
+        shape = page.new_shape()
+        for r in range(rows + 1):
+            shape.draw_line((rect.x0, rect.y0 + r * cell_h), (rect.x1, rect.y0 + r * cell_h))
+        for c in range(cols + 1):
+            shape.draw_line((rect.x0 + c * cell_w, rect.y0), (rect.x0 + c * cell_w, rect.y1))
+        shape.finish(color=(0, 0, 0), width=0.8)
+        shape.commit()
+
+        for r in range(rows):
+            for c in range(cols):
+                cell = fitz.Rect(rect.x0 + c * cell_w, rect.y0 + r * cell_h,
+                                 rect.x0 + (c + 1) * cell_w, rect.y0 + (r + 1) * cell_h)
+                text = rng.choice(labels) if c % 2 == 0 else f"{rng.randint(1, 999)}"
+                page.insert_text(fitz.Point(cell.x0 + 3, cell.y1 - cell_h / 3), text, fontname="china-s", fontsize=9)
+
+
+# ==============================================================================
+# STUB MODEL
+# ==============================================================================
+class _StubTokenizer:
+    """Roughly one token per character, which is close for Chinese input."""
+
+    def __call__(self, texts):
+        if isinstance(texts, str):
+            return {"input_ids": list(range(len(texts) + 1))}
+        return {"input_ids": [list(range(len(text) + 1)) for text in texts]}
+
+
+def install_stub_model(latency_ms):
+    """
+    Replace the translation model with a deterministic stub. Each batch
+    costs latency_ms, so batching/coalescing effects stay visible.
+    """
+    def generate_batch(texts, max_length):
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+        return [_stub_translation(text) for text in texts]
+
+    translation_model.tokenizer = _StubTokenizer()
+    translation_model.generate_batch = generate_batch
+    translation_model.model_id = "stub"
+    translation_model.model_status = "ready"
+    translation_model._load_finished.set()
+
+
+def _stub_translation(text):
+    seed = zlib.crc32(text.encode("utf-8"))
+    n_words = max(1, len(text) * 2 // 3)
+    return " ".join(_STUB_WORDS[(seed >> i) % len(_STUB_WORDS)] for i in range(n_words)).capitalize()
+
+
+# ==============================================================================
+# TIMED PIPELINE
+# ==============================================================================
+def run_pipeline(pdf_paths, out_dir, run_index):
+    """
+    Run every file through the pipeline as one job; return ({stage: seconds}, counters).
+    The stage timings are the ones run_translation_task and the zip writer record in the job.
+    """
+    job_id = f"bench-{run_index}-{uuid.uuid4().hex[:8]}"
+    job_state.create_job(job_id)
+    pages = 0
+
+    zip_writer = IncrementalZipWriter(job_id, os.path.join(out_dir, f"run{run_index}.zip"))
+    for pdf_path in pdf_paths:
+        with fitz.open(pdf_path) as doc:
+            pages += doc.page_count
+
+        output_path = run_translation_task(job_id, pdf_path)
+        if output_path is None:
+            raise RuntimeError(f"{pdf_path} failed: {job_state.get_job(job_id).get('error')}")
+        zip_writer.add(output_path)
+    zip_writer.close()
+
+    job = job_state.get_job(job_id)
+    timings = dict.fromkeys(STAGES, 0.0)
+    timings.update(job.get("timings", {}))
+    counters = {"pages": pages, **{key: job["stats"].get(key, 0) for key in ("segments", "unique_segments", "model_segments")}}
+    return timings, counters
+
+
+def summarize(runs):
+    """Per-stage min/median over the runs, plus the share of total time."""
+    stages = _stage_names(runs)
+    summary = {}
+    medians = {stage: statistics.median(run.get(stage, 0.0) for run in runs) for stage in stages}
+    total = sum(medians.values()) or 1.0
+    for stage in stages:
+        values = [run.get(stage, 0.0) for run in runs]
+        summary[stage] = {"min_s": min(values), "median_s": medians[stage], "share": medians[stage] / total}
+    summary["total"] = {"min_s": min(sum(run.values()) for run in runs), "median_s": sum(medians.values()), "share": 1.0}
+    return summary
+
+
+def _stage_names(runs):
+    """STAGES in pipeline order, then any other stage the pipeline recorded (e.g. streaming mode)."""
+    extra = sorted({stage for run in runs for stage in run} - set(STAGES))
+    return STAGES + extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every stage of the translation pipeline on synthetic drawings.")
+    parser.add_argument("--pages", type=int, default=4, help="pages per file")
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--words", type=int, default=400, help="text items per page")
+    parser.add_argument("--cjk-ratio", type=float, default=0.6, help="share of text items that are Chinese labels")
+    parser.add_argument("--english-pages", type=float, default=0.0, help="share of sheets without any Chinese text")
+    parser.add_argument("--page-size", default="A3", help="A4/A3/A2/A1 (landscape) or WIDTHxHEIGHT in points")
+    parser.add_argument("--title-blocks", type=int, default=1, help="ruled tables per page, drawn in the TABLE_REGIONS")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--real-model", action="store_true", help="use the real translation model instead of the stub")
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="simulated cost of one stub model batch")
+    parser.add_argument("--translation-memory", action="store_true",
+                        help="keep the translation memory on (a temporary database is used)")
+    parser.add_argument("--json", dest="json_path", help="write the results to this file")
+    args = parser.parse_args()
+
+    if args.page_size.upper() in PAGE_SIZES:
+        page_size = PAGE_SIZES[args.page_size.upper()]
+    else:
+        page_size = tuple(float(v) for v in args.page_size.lower().split("x"))
+
+    with tempfile.TemporaryDirectory(prefix="cad-bench-") as work_dir:
+        config.TRANSLATION_MEMORY_ENABLED = args.translation_memory
+        config.TRANSLATION_MEMORY_PATH = os.path.join(work_dir, "translation_memory.sqlite3")
+        # Every run must do the full work, not serve the previous run's results
+        config.RESULT_CACHE_ENABLED = False
+        config.INCREMENTAL_RETRANSLATION = False
+
+        if args.real_model:
+            translation_model.load_model()
+        else:
+            install_stub_model(args.stub_latency_ms)
+
+        rng = random.Random(args.seed)
+        pdf_paths = []
+        for file_index in range(args.files):
+            path = os.path.join(work_dir, f"drawing_{file_index}.pdf")
+            make_synthetic_pdf(path, rng, args.pages, page_size, args.words, args.cjk_ratio, args.title_blocks,
+                               args.english_pages)
+            pdf_paths.append(path)
+
+        runs = []
+        counters = None
+        for run_index in range(args.repeat):
+            timings, counters = run_pipeline(pdf_paths, work_dir, run_index)
+            runs.append(timings)
+
+    summary = summarize(runs)
+    report = {
+        "params": {**vars(args), "page_size": page_size},
+        "model": translation_model.model_id,
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "pymupdf": fitz.VersionBind},
+        "counters": counters,
+        "stages": summary,
+        "runs": runs,
+    }
+
+    print(f"{args.files} file(s) x {args.pages} page(s), {counters['segments']} Chinese segments "
+          f"({counters['unique_segments']} unique, {counters['model_segments']} sent to the model), "
+          f"model={translation_model.model_id}")
+    for stage in _stage_names(runs) + ["total"]:
+        entry = summary[stage]
+        print(f"{stage:13s} {entry['median_s'] * 1000:9.1f} ms  (min {entry['min_s'] * 1000:8.1f} ms, {entry['share']:6.1%})")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# ==============================================================================
+# MICRO-BENCHMARK: TABLE-CELL DE-DUPLICATION (final_extracted_text_list)
+# ==============================================================================
+# Compares the grid-indexed filter against the original linear scan on
+# synthetic pages and checks that both return exactly the same list.
+#
+# Usage:  python benchmarks/bench_table_filter.py [--words 10000] [--cells 2000] [--pages 1]
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from utils.text_extraction import final_extracted_text_list, _is_bbox_inside
+
+
+def linear_final_extracted_text_list(table_text, all_text):
+    """The original O(words x cells) implementation, kept here as the reference."""
+    table_bboxes_by_page = {}
+    for cell in table_text:
+        table_bboxes_by_page.setdefault(cell["page"], []).append(cell["bbox"])
+
+    final_text_list = []
+    for word in all_text:
+        is_in_table = False
+        for table_cell_bbox in table_bboxes_by_page.get(word["page"], []):
+            if _is_bbox_inside(word["bbox"], table_cell_bbox):
+                is_in_table = True
+                break
+        if not is_in_table:
+            final_text_list.append(word)
+
+    final_text_list.extend(table_text)
+    return final_text_list
+
+
+def make_synthetic_page(rng, page_num, n_words, n_cells, page_w=1190, page_h=842):
+    """
+    Build one A3-landscape-sized page: a table grid of n_cells in the lower right
+    corner (like a title block / BOM) and n_words scattered words, about a third
+    of which are placed inside cells.
+    """
+    cols = max(1, int(n_cells ** 0.5))
+    rows = max(1, -(-n_cells // cols))
+    table_x0, table_y0 = page_w * 0.4, page_h * 0.5
+    cell_w = (page_w - table_x0 - 10) / cols
+    cell_h = (page_h - table_y0 - 10) / rows
+
+    cells = []
+    for n in range(n_cells):
+        r, c = divmod(n, cols)
+        x0 = table_x0 + c * cell_w
+        y0 = table_y0 + r * cell_h
+        cells.append({"text": f"C{n}", "bbox": (x0 + 2, y0 + 2, x0 + cell_w - 2, y0 + cell_h - 2), "page": page_num})
+
+    words = []
+    for n in range(n_words):
+        if rng.random() < 0.33:
+            cx0, cy0, cx1, cy1 = rng.choice(cells)["bbox"]
+            w = rng.uniform(0, max(0.0, cx1 - cx0)) * 1.05
+            h = rng.uniform(0, max(0.0, cy1 - cy0)) * 1.05
+            x0 = rng.uniform(cx0 - 0.2, cx1 - w + 0.2)
+            y0 = rng.uniform(cy0 - 0.2, cy1 - h + 0.2)
+        else:
+            w, h = rng.uniform(5, 60), rng.uniform(4, 12)
+            x0, y0 = rng.uniform(0, page_w - w), rng.uniform(0, page_h - h)
+        words.append({"text": f"W{n}", "bbox": (x0, y0, x0 + w, y0 + h), "page": page_num})
+
+    return words, cells
+
+
+def _time(func, *args, repeat=3):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the table-cell de-duplication filter.")
+    parser.add_argument("--words", type=int, default=10000, help="words per page")
+    parser.add_argument("--cells", type=int, default=2000, help="table cells per page")
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    all_words, all_cells = [], []
+    for page_num in range(args.pages):
+        words, cells = make_synthetic_page(rng, page_num, args.words, args.cells)
+        all_words.extend(words)
+        all_cells.extend(cells)
+
+    linear_time, linear_result = _time(linear_final_extracted_text_list, all_cells, all_words, repeat=1)
+    grid_time, grid_result = _time(final_extracted_text_list, all_cells, all_words)
+
+    if grid_result != linear_result:
+        print("MISMATCH: grid index result differs from the linear scan")
+        sys.exit(1)
+
+    removed = len(all_words) + len(all_cells) - len(grid_result)
+    print(f"pages={args.pages} words/page={args.words} cells/page={args.cells} words removed={removed}")
+    print(f"linear scan : {linear_time * 1000:9.1f} ms")
+    print(f"grid index  : {grid_time * 1000:9.1f} ms")
+    print(f"speed-up    : {linear_time / grid_time:9.1f}x  (results identical)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# ==============================================================================
+# INFERENCE BACKEND PARITY CHECK
+# ==============================================================================
+# Translates a fixed corpus of CAD drawing terms with the fp32 torch baseline
+# and with a candidate backend, then reports how much the output drifts and
+# how much faster the candidate is.
+#
+# Usage:  python benchmarks/inference_parity.py --backend torch-int8 [--threads 8] [--json out.json]
+import os
+import sys
+import json
+import time
+import difflib
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from core import config
+from model import model as translation_model
+
+# Typical title-block, BOM and note strings from Chinese engineering drawings
+PARITY_CORPUS = [
+    "材料", "比例", "图号", "重量", "数量", "名称", "备注", "设计", "校对", "审核",
+    "批准", "日期", "版本", "共 张", "第 张", "单位", "序号", "代号", "标准件", "外购件",
+    "未注倒角C1", "未注圆角R2", "表面粗糙度Ra3.2", "焊接后去毛刺", "热处理 调质HB220-250",
+    "所有焊缝均为连续焊", "未注公差按GB/T1804-m", "表面喷漆 颜色见订单", "安装前清洗干净",
+    "不锈钢板", "碳钢", "铝合金", "螺栓", "螺母", "垫圈", "轴承", "法兰", "密封圈",
+    "总装图", "零件图", "剖视图", "局部放大图", "技术要求", "焊接符号说明",
+    "本图尺寸单位为毫米", "装配时注意轴承方向", "管道试验压力1.5MPa",
+]
+
+
+def _translate_all(texts):
+    outputs = []
+    start = time.perf_counter()
+    for batch_start in range(0, len(texts), config.TRANSLATION_BATCH_SIZE):
+        batch = texts[batch_start:batch_start + config.TRANSLATION_BATCH_SIZE]
+        outputs.extend(translation_model.generate_batch(batch, config.TRANSLATION_MAX_LENGTH))
+    return outputs, time.perf_counter() - start
+
+
+def _load_and_translate(backend_name, texts, repeat):
+    translation_model.load_model(backend_name)
+    loaded_name = translation_model.backend.name
+
+    # First pass warms up caches/allocators and is not timed
+    outputs, _ = _translate_all(texts)
+    best = min(_translate_all(texts)[1] for _ in range(repeat))
+    return loaded_name, outputs, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an inference backend against the fp32 torch baseline.")
+    parser.add_argument("--backend", required=True, help="torch-int8, onnx or ctranslate2")
+    parser.add_argument("--threads", type=int, default=None, help="override INFERENCE_THREADS")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes per backend (best is kept)")
+    parser.add_argument("--json", dest="json_path", help="write the full report to this file")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        config.INFERENCE_THREADS = args.threads
+
+    baseline_name, baseline, baseline_time = _load_and_translate("torch", PARITY_CORPUS, args.repeat)
+    candidate_name, candidate, candidate_time = _load_and_translate(args.backend, PARITY_CORPUS, args.repeat)
+
+    if candidate_name != args.backend:
+        print(f"WARNING: '{args.backend}' could not be loaded, '{candidate_name}' was used instead.")
+
+    items = []
+    for source, expected, actual in zip(PARITY_CORPUS, baseline, candidate):
+        items.append({
+            "source": source,
+            "baseline": expected,
+            "candidate": actual,
+            "similarity": round(difflib.SequenceMatcher(None, expected, actual).ratio(), 4),
+        })
+
+    exact = sum(1 for item in items if item["baseline"] == item["candidate"])
+    report = {
+        "baseline_backend": baseline_name,
+        "candidate_backend": candidate_name,
+        "threads": config.INFERENCE_THREADS,
+        "corpus_size": len(items),
+        "exact_match_rate": exact / len(items),
+        "mean_similarity": sum(item["similarity"] for item in items) / len(items),
+        "baseline_seconds": baseline_time,
+        "candidate_seconds": candidate_time,
+        "speedup": baseline_time / candidate_time if candidate_time else None,
+        "drifted_items": [item for item in items if item["baseline"] != item["candidate"]],
+    }
+
+    print(f"{candidate_name} vs {baseline_name} on {len(items)} strings")
+    print(f"exact match     : {report['exact_match_rate']:.1%}")
+    print(f"mean similarity : {report['mean_similarity']:.3f}")
+    print(f"speed-up        : {report['speedup']:.2f}x ({baseline_time:.2f}s -> {candidate_time:.2f}s)")
+    for item in report["drifted_items"]:
+        print(f"  {item['source']}: '{item['baseline']}' -> '{item['candidate']}' ({item['similarity']:.2f})")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,10 @@ from tkinter import filedialog, messagebox
 import requests
 # import atexit  # No longer needed
 # import sys     # No longer needed
-# import os      # No longer needed
+import os
+import uuid
 import time
+import json
 import threading
 
 # --- Configuration ---
@@ -13,6 +15,14 @@ import threading
 BACKEND_PORT = 8000 
 BASE_URL = f"http://127.0.0.1:{BACKEND_PORT}"
 
+# Set to a shared translation server (e.g. http://cad-server:8000) to send it the
+# PDFs themselves instead of local paths
+REMOTE_BACKEND_URL = os.getenv("CAD_BACKEND_URL", "").rstrip("/")
+if REMOTE_BACKEND_URL:
+    BASE_URL = REMOTE_BACKEND_URL
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
 #
 # NO PROCESS MANAGEMENT CODE - This is correct!
 #
@@ -78,6 +88,17 @@ class App(ctk.CTk):
         self.progressbar.set(0)
         self.progressbar.pack_forget()
 
+        # Shown only while a job is queued or running
+        self.button_cancel = ctk.CTkButton(
+            self.main_frame,
+            text="Cancel",
+            command=self.cancel_translation,
+            font=ctk.CTkFont(size=12),
+            height=28,
+            fg_color="gray"
+        )
+        self.button_cancel.pack_forget()
+
         self.label_status = ctk.CTkLabel(
             self.main_frame, 
             text="Status: Connecting to backend...", 
@@ -96,10 +117,17 @@ class App(ctk.CTk):
         while retries < 20: # Try for 10 seconds
             try:
                 response = requests.get(f"{BASE_URL}/health", timeout=1)
-                if response.status_code == 200 and response.json().get("status") == "ready":
-                    print("Backend is healthy. Enabling UI.")
-                    self.after(0, self.on_backend_ready)
+                status = response.json().get("status")
+                if response.status_code == 200 and status in ("ready", "warming"):
+                    # The server is up; jobs submitted while the model warms up are queued
+                    print(f"Backend is healthy (model {status}). Enabling UI.")
+                    self.after(0, self.on_backend_ready, status)
+                    if status == "warming":
+                        self.wait_for_model_ready()
                     return
+                if status == "error":
+                    print(f"Backend failed to load the model: {response.json().get('error')}")
+                    break
             except requests.exceptions.ConnectionError:
                 print(f"Connection attempt {retries+1} failed...")
             except Exception as e:
@@ -111,11 +139,34 @@ class App(ctk.CTk):
         # Failed to connect
         self.after(0, self.on_backend_failed)
 
-    def on_backend_ready(self):
+    def on_backend_ready(self, model_status="ready"):
         """Callback run on the main thread when the backend is healthy."""
-        self.label_status.configure(text="Status: Idle (Connected)")
+        if model_status == "warming":
+            self.label_status.configure(text="Status: Idle (Connected, loading translation model...)")
+        else:
+            self.label_status.configure(text="Status: Idle (Connected)")
         self.button_select.configure(state="normal")
 
+    def wait_for_model_ready(self):
+        """Keeps polling /health (on the health-check thread) until the model has loaded."""
+        while True:
+            time.sleep(1)
+            try:
+                status = requests.get(f"{BASE_URL}/health", timeout=1).json().get("status")
+            except Exception:
+                continue
+            if status == "ready":
+                self.after(0, self.on_model_ready)
+                return
+            if status == "error":
+                self.after(0, self.on_backend_failed)
+                return
+
+    def on_model_ready(self):
+        """Callback run on the main thread once the translation model is loaded."""
+        if "loading translation model" in self.label_status.cget("text"):
+            self.label_status.configure(text="Status: Idle (Connected)")
+
     def on_backend_failed(self):
         """Callback run on the main thread if the backend can't be reached."""
         self.label_status.configure(text="Status: Backend not found.", text_color="red")
@@ -138,36 +189,106 @@ class App(ctk.CTk):
             self.label_status.configure(text="Status: Ready to translate", text_color="white")
 
     def start_translation(self):
-        """Uploads the file to the backend to start the job."""
+        """Starts the job on a background thread, so a long upload never freezes the window."""
         if not self.selected_file_path or self.is_processing:
             return
 
         self.set_processing_state(True)
         self.label_status.configure(text="Status: Uploading files...")
-        
+        threading.Thread(target=self.submit_job, args=(tuple(self.selected_file_path),), daemon=True).start()
+
+    def submit_job(self, paths):
+        """
+        Runs on a background thread. Uploads the files (or sends their paths) to
+        the backend, then follows the new job's events on this same thread.
+        UI changes are handed to the main thread with after().
+        """
         try:
-            data_to_send = {
-                "paths": self.selected_file_path
-            }
-                
-            response = requests.post(f"{BASE_URL}/translate/start-translation/", json=data_to_send, timeout=30)
-            
-            if response.status_code == 200:
-                self.current_job_id = response.json().get("job_id")
-                self.label_status.configure(text="Status: Processing... (This may take a while)")
-                self.after(2000, self.check_status)
+            if REMOTE_BACKEND_URL:
+                # The server cannot read our paths: stream the files to it instead.
+                # The files' folder names the project, so later revisions reuse their translations
+                boundary = uuid.uuid4().hex
+                response = requests.post(
+                    f"{BASE_URL}/translate/upload-translation/",
+                    params={"project": os.path.dirname(paths[0])},
+                    data=self._iter_multipart_body(paths, boundary),
+                    headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                    timeout=(10, 300)
+                )
             else:
-                self.reset_ui(error=f"Error starting job (Code: {response.status_code}): {response.text}")
+                data_to_send = {
+                    "paths": list(paths)
+                }
+
+                response = requests.post(f"{BASE_URL}/translate/start-translation/", json=data_to_send, timeout=30)
+
+            if response.status_code != 200:
+                self.after(0, self.reset_ui, f"Error starting job (Code: {response.status_code}): {response.text}")
+                return
+            job_id = response.json().get("job_id")
 
         except requests.exceptions.ConnectionError:
-             self.reset_ui(error="Error: Cannot connect to backend server. Is it running?")
+            self.after(0, self.reset_ui, "Error: Cannot connect to backend server. Is it running?")
+            return
         except requests.exceptions.ReadTimeout:
-             self.reset_ui(error="Error: Upload timed out.")
+            self.after(0, self.reset_ui, "Error: Upload timed out.")
+            return
+        except Exception as e:
+            self.after(0, self.reset_ui, f"An unexpected error occurred: {e}")
+            return
+
+        # Queued before any status update, so the job is current when those arrive
+        self.after(0, self.on_job_started, job_id)
+        self.listen_for_events(job_id)
+
+    def on_job_started(self, job_id):
+        """Main thread: the backend accepted the job."""
+        self.current_job_id = job_id
+        self.label_status.configure(text="Status: Processing... (This may take a while)")
+
+    @staticmethod
+    def _iter_multipart_body(paths, boundary):
+        """Yields a multipart/form-data body with one part per PDF, reading each file in chunks."""
+        for path in paths:
+            filename = os.path.basename(path).replace('"', "")
+            yield (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="files"; filename="{filename}"\r\n'
+                f"Content-Type: application/pdf\r\n\r\n"
+            ).encode("utf-8")
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+                    yield chunk
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode("utf-8")
+
+    def listen_for_events(self, job_id):
+        """
+        Runs on a background thread. Follows the backend's Server-Sent Events
+        stream and hands every status update to the main thread as it arrives.
+        Falls back to polling /job-status/ if the stream can't be used.
+        """
+        try:
+            with requests.get(f"{BASE_URL}/translate/job-events/{job_id}", stream=True, timeout=(5, 60)) as response:
+                if response.status_code != 200:
+                    raise RuntimeError(f"Event stream unavailable (Code: {response.status_code})")
+
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue  # blank separators and keep-alive comments
+                    data = json.loads(line[len("data:"):])
+                    self.after(0, self.handle_status_update, job_id, data)
+                    if data.get("status") in ("complete", "error", "cancelled"):
+                        return
+
+            raise RuntimeError("Event stream closed before the job finished")
+
         except Exception as e:
-            self.reset_ui(error=f"An unexpected error occurred: {e}")
+            print(f"Event stream failed ({e}). Falling back to polling.")
+            self.after(0, self.check_status)
 
     def check_status(self):
-        """Polls the backend's /job-status/ endpoint."""
+        """Polls the backend's /job-status/ endpoint (fallback when events are unavailable)."""
         if not self.current_job_id or not self.is_processing:
             return
 
@@ -175,20 +296,7 @@ class App(ctk.CTk):
             response = requests.get(f"{BASE_URL}/translate/job-status/{self.current_job_id}", timeout=5)
             
             if response.status_code == 200:
-                data = response.json()
-                status = data.get("status")
-                
-                if status == "complete":
-                    self.progressbar.stop()
-                    self.progressbar.set(1)
-                    self.label_status.configure(text="Status: Translation Complete!", text_color="green")
-                    self.download_file()
-                
-                elif status == "error":
-                    self.reset_ui(error=f"Translation failed: {data.get('error')}")
-                
-                else:
-                    self.label_status.configure(text=f"Status: {status}...")
+                if not self.handle_status_update(self.current_job_id, response.json()):
                     self.after(2000, self.check_status)
             
             else:
@@ -197,8 +305,82 @@ class App(ctk.CTk):
         except Exception as e:
             self.reset_ui(error=f"Error checking status: {e}")
 
+    def handle_status_update(self, job_id, data):
+        """
+        Applies one job status update to the UI (main thread only).
+        Returns True once the job has finished.
+        """
+        if job_id != self.current_job_id or not self.is_processing:
+            return True
+
+        status = data.get("status")
+
+        if status == "complete":
+            self.progressbar.stop()
+            self.progressbar.set(1)
+            stats = data.get("stats") or {}
+            notes = []
+            if stats.get("result_cache_hits"):
+                notes.append(f"{stats['result_cache_hits']} served from cache")
+            if stats.get("segments_reused"):
+                notes.append(f"{stats['segments_reused']} segments reused from the previous revision")
+            suffix = f" ({', '.join(notes)})" if notes else ""
+            self.label_status.configure(text=f"Status: Translation Complete!{suffix}", text_color="green")
+            self.download_file()
+            return True
+
+        if status == "error":
+            self.reset_ui(error=f"Translation failed: {data.get('error')}")
+            return True
+
+        if status == "cancelled":
+            self.reset_ui()
+            self.label_status.configure(text="Status: Translation cancelled.", text_color="gray")
+            return True
+
+        if data.get("cancel_requested"):
+            status = "cancelling"
+        self.label_status.configure(
+            text=f"Status: {status}{self._format_progress(data.get('progress'), data.get('queue'))}..."
+        )
+        return False
+
+    def cancel_translation(self):
+        """Asks the backend to cancel the current job; the status update ends the job in the UI."""
+        job_id = self.current_job_id
+        if not job_id or not self.is_processing:
+            return
+
+        self.button_cancel.configure(state="disabled")
+        threading.Thread(target=self._send_cancel, args=(job_id,), daemon=True).start()
+
+    def _send_cancel(self, job_id):
+        try:
+            response = requests.post(f"{BASE_URL}/translate/cancel-translation/{job_id}", timeout=10)
+            if response.status_code not in (200, 409):
+                print(f"Cancel request failed (Code: {response.status_code}): {response.text}")
+        except Exception as e:
+            print(f"Cancel request failed: {e}")
+
+    @staticmethod
+    def _format_progress(progress, queue=None):
+        """Short progress suffix like ' (12/200 pages)' or ' (position 3 of 5 in queue)' from the job's counters."""
+        if queue and queue.get("position"):
+            return f" (position {queue['position']} of {queue.get('queued_jobs') or queue['position']} in queue)"
+        if not progress:
+            return ""
+        if progress.get("pages_total"):
+            return f" ({progress.get('pages_done', 0)}/{progress['pages_total']} pages)"
+        if progress.get("segments_total"):
+            return f" ({progress.get('segments_done', 0)}/{progress['segments_total']} segments)"
+        return ""
+
     def download_file(self):
-        """Prompts to save the file, then downloads from the /download/ endpoint."""
+        """
+        Prompts to save the file, then downloads it from the /download-stream/
+        endpoint. A dropped connection is resumed with a Range request from
+        the bytes already saved.
+        """
         save_path = filedialog.asksaveasfilename(
             defaultextension=".zip",
             filetypes=[("Zip files", "*.zip")],
@@ -211,12 +393,7 @@ class App(ctk.CTk):
         self.label_status.configure(text="Status: Downloading...")
         
         try:
-            response = requests.get(f"{BASE_URL}/translate/download/{self.current_job_id}", stream=True, timeout=60)
-            
-            if response.status_code == 200:
-                with open(save_path, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
+            if self._download_with_resume(f"{BASE_URL}/translate/download-stream/{self.current_job_id}", save_path):
                 messagebox.showinfo("Success", f"File saved successfully to:\n{save_path}")
             else:
                 messagebox.showerror("Error", "Could not download file from backend.")
@@ -226,6 +403,39 @@ class App(ctk.CTk):
         except Exception as e:
             self.reset_ui(error=f"Error saving file: {e}")
 
+    @staticmethod
+    def _download_with_resume(url, save_path, max_attempts=3):
+        """Download url to save_path, resuming after connection errors. Returns False on an HTTP error."""
+        written = 0
+        with open(save_path, "wb") as f:
+            for attempt in range(max_attempts):
+                headers = {"Range": f"bytes={written}-"} if written else {}
+                try:
+                    with requests.get(url, headers=headers, stream=True, timeout=60) as response:
+                        if response.status_code == 416:
+                            return True
+                        if response.status_code not in (200, 206):
+                            return False
+                        if response.status_code == 200 and written:
+                            # The server ignored the range: start over
+                            f.seek(0)
+                            f.truncate()
+                            written = 0
+                        for chunk in response.iter_content(chunk_size=65536):
+                            f.write(chunk)
+                            written += len(chunk)
+
+                        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                        if response.status_code == 206 and total in ("", "*"):
+                            # Resumed while the job was still zipping: fetch the rest
+                            continue
+                        return True
+                except requests.RequestException as e:
+                    if attempt == max_attempts - 1:
+                        raise
+                    print(f"Download interrupted ({e}), resuming from byte {written}.")
+        return False
+
     def set_processing_state(self, is_processing: bool):
         """Helper function to lock/unlock the UI."""
         self.is_processing = is_processing
@@ -234,11 +444,14 @@ class App(ctk.CTk):
             self.button_translate.configure(state="disabled")
             self.progressbar.pack(pady=10, fill="x", padx=30)
             self.progressbar.start()
+            self.button_cancel.configure(state="normal")
+            self.button_cancel.pack(pady=(0, 10))
         else:
             self.button_select.configure(state="normal")
             self.button_translate.configure(state="normal" if self.selected_file_path else "disabled")
             self.progressbar.stop()
             self.progressbar.pack_forget()
+            self.button_cancel.pack_forget()
 
     def reset_ui(self, error=None):
         """Resets the UI to the idle state, showing an error if one occurred."""
@@ -1,4 +1,5 @@
 import threading
+import multiprocessing
 import uvicorn
 import sys
 import os
@@ -160,4 +161,6 @@ def activate_or_validate_license():
 
 # --- Entry Point ---
 if __name__ == "__main__":
+    # Required so the packaged exe can start the PDF worker processes
+    multiprocessing.freeze_support()
     activate_or_validate_license()
@@ -20,18 +20,30 @@ a = Analysis(
         'uvicorn.lifespan.on',
         'backend.api',
         'backend.model',
+        'backend.model.inference_service',
         'backend.core',
         'backend.services',
         'backend.utils',
 
         'backend.api.translations',
+        'backend.core.config',
+        'backend.core.job_events',
         'backend.core.job_state',
+        'backend.core.job_store',
+        'backend.core.metrics',
+        'backend.core.scheduler',
         'backend.model.model',
         'backend.services.pdf_translator',
+        'backend.services.streaming_translator',
+        'backend.utils.font_metrics',
         'backend.utils.legends_util',
         'backend.utils.output_pdf_handler',
         'backend.utils.text_extraction',
         'backend.utils.translation',
+        'backend.utils.translation_memory',
+        'backend.utils.result_cache',
+        'backend.utils.upload_spool',
+        'backend.utils.revision_manifest',
         'backend.utils.zip_and_queue_handler',
 
     ],